@@ -1,21 +1,39 @@
-from flask import Flask, request, jsonify, render_template, send_file, redirect, url_for
+from flask import Flask, Response, request, jsonify, render_template, send_file, redirect, url_for, stream_with_context
 from flask_cors import CORS
 from werkzeug.middleware.proxy_fix import ProxyFix
-from sqlalchemy import func
-from models import db, Book, Member, Transaction
-from utils import QRCodeManager, ISBNScanner, generate_member_id, calculate_fine, normalize_vietnamese_text, create_search_variants
+from sqlalchemy import func, case, select
+from sqlalchemy.orm import joinedload
+from models import db, Book, Member, Transaction, Job, InventoryAudit, BOOK_SEARCH_FIELDS, BOOK_FIELDS, BOOK_LIST_FIELDS, OPEN_LOAN_STATUSES
+from utils import QRCodeManager, ISBNScanner, generate_member_id, calculate_fine, normalize_vietnamese_text, canonical_isbn
 from config import config, Config
+from stats import get_library_stats, adjust_library_stats
+from pagination import keyset_requested, keyset_args, keyset_paginate
+from isbn_cache import ISBNMetadataCache
+from bulk_import import parse_import_csv, import_books
+from jobs import enqueue_job
+from circulation import CirculationError, checkout_copy, checkin_copy, checkout_books, checkin_books
+from overdue import overdue_loans_filter
+from http_cache import versioned_etag, compress_response
+from categories import category_filter, category_facets
+from serialization import init_json_provider, rows_to_dicts
+from inventory import start_audit, record_scans, audit_diff, close_audit
+from scan_pipeline import read_image_archive, scan_images, scan_processes, server_timing
+from labels import LABEL_FORMATS, default_layout, label_books_query, label_pages, label_sheet_stream, render_processes
+from search import full_text_filter, substring_filter, search_index_available, trigram_index, trigram_index_available, fuzzy_search_clauses
 import os
 import io
 from datetime import datetime, timedelta
 import json
+import csv
+import time
+import zipfile
 
 # Create Flask app with proper configuration
-def create_app(config_name='default'):
+def create_app(config_name=None):
     app = Flask(__name__)
     
     # Load configuration
-    app.config.from_object(config[config_name])
+    app.config.from_object(config[config_name or os.environ.get('FLASK_ENV', 'default')])
     
     # Configure for reverse proxy (Cloudflare tunnel, nginx, etc.)
     # This middleware handles X-Forwarded-For, X-Forwarded-Proto, etc.
@@ -26,14 +44,26 @@ def create_app(config_name='default'):
     db.init_app(app)
     CORS(app)
     
+    # orjson encodes responses when it is installed
+    init_json_provider(app)
+    
+    # Large JSON responses are compressed for clients on slow links
+    app.after_request(compress_response)
+    
+    # An in-memory database starts out empty, so it needs the schema straight away
+    if app.config['SQLALCHEMY_DATABASE_URI'] == 'sqlite:///:memory:':
+        with app.app_context():
+            db.create_all()
+    
     return app
 
 # Create app instance
-app = create_app(os.environ.get('FLASK_ENV', 'default'))
+app = create_app()
 
 # Initialize utilities
 qr_manager = QRCodeManager()
 isbn_scanner = ISBNScanner()
+isbn_cache = ISBNMetadataCache()
 
 # Routes
 @app.route('/')
@@ -127,48 +157,112 @@ def readiness_check():
 
 # API Routes
 
+@app.route('/api/stats', methods=['GET'])
+def get_stats():
+    """Get dashboard statistics from the maintained counters"""
+    try:
+        stats = get_library_stats(max_age=app.config['STATS_RECONCILE_INTERVAL'])
+        return jsonify({
+            'success': True,
+            'stats': stats.to_dict()
+        })
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'message': f'Error retrieving statistics: {str(e)}'
+        }), 500
+
+def parse_book_fields(value):
+    """Read a ?fields= list of book fields; None means every field"""
+    if not value:
+        return None
+    if value == 'compact':
+        return BOOK_LIST_FIELDS
+    
+    fields = list(dict.fromkeys(field.strip() for field in value.split(',') if field.strip()))
+    unknown = [field for field in fields if field not in BOOK_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown book field(s): {', '.join(unknown)}. Valid fields: {', '.join(BOOK_FIELDS)}")
+    return fields
+
 @app.route('/api/books', methods=['GET'])
+@versioned_etag('books')
 def get_books():
-    """Get all books with pagination and search"""
+    """Get all books with pagination and search
+
+    Supports page/per_page, or cursor pagination with after/limit and an
+    optional include_total. ``fields`` limits each book to the listed fields
+    (or ``compact``). Only those columns are selected, and the rows are
+    serialized without loading Book instances. Each ``category`` narrows the
+    listing to books filed under that category.
+    """
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 10, type=int)
     search = request.args.get('search', '')
     search_type = request.args.get('search_type', 'basic')  # 'basic' or 'smart'
     status = request.args.get('status', '')
     
-    query = Book.query
+    try:
+        fields = parse_book_fields(request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
+    
+    fields = fields or BOOK_FIELDS
+    columns = [getattr(Book, field) for field in fields]
+    # Pagination continues from the id, so it is selected even when not requested
+    query = Book.query.with_entities(*columns, *([] if 'id' in fields else [Book.id]))
     
     # Apply status filter if provided
     if status and status != 'all':
         query = query.filter(Book.status == status)
     
+    for category in request.args.getlist('category'):
+        if category.strip():
+            query = query.filter(category_filter(category))
+    
     if search:
         search = search.strip()
         
         if search_type == 'smart':
-            # Smart search with Vietnamese accent-insensitive support
-            search_variants = create_search_variants(search)
+            # Smart search through the full-text index when it is installed. The index
+            # matches the start of words; matches inside words need a table scan, so
+            # they are only searched for when asked (substring=true) or without the index
+            substring = request.args.get('substring', '').lower() in ('1', 'true', 'yes')
+            search_filter = None
+            if not substring and search_index_available():
+                search_filter = full_text_filter(search)
+            if search_filter is None:
+                search_filter = substring_filter(search)
             
-            # Create conditions for each search variant
-            search_conditions = []
-            for variant in search_variants:
-                variant_lower = variant.lower()
-                search_conditions.extend([
-                    # Search in original fields
-                    func.lower(Book.title).contains(variant_lower),
-                    func.lower(Book.author).contains(variant_lower),
-                    func.lower(Book.isbn).contains(variant_lower),
-                    func.lower(Book.categories).contains(variant_lower),
-                    func.lower(Book.description).contains(variant_lower),
-                    # Search in normalized fields (if they exist)
-                    func.lower(Book.title_normalized).contains(variant_lower),
-                    func.lower(Book.author_normalized).contains(variant_lower)
-                ])
+            if search_filter is not None:
+                query = query.filter(search_filter)
+        elif search_type == 'fuzzy':
+            # Typo-tolerant search ordered by trigram similarity
+            if keyset_requested():
+                return jsonify({
+                    'success': False,
+                    'message': 'Fuzzy search results are ranked; use page and per_page instead of after and limit'
+                }), 400
+            
+            threshold = app.config['FUZZY_SEARCH_THRESHOLD']
             
-            # Combine all conditions with OR
-            if search_conditions:
-                from sqlalchemy import or_
-                query = query.filter(or_(*search_conditions))
+            if trigram_index_available():
+                search_filter, score = fuzzy_search_clauses(search, threshold)
+                query = query.filter(search_filter).order_by(score.desc(), Book.id)
+            else:
+                trigram_index.refresh()
+                ranked = trigram_index.search(search, threshold, app.config['FUZZY_SEARCH_MAX_RESULTS'])
+                ranked_ids = [book_id for book_id, _ in ranked]
+                query = query.filter(Book.id.in_(ranked_ids))
+                if ranked_ids:
+                    query = query.order_by(case(
+                        {book_id: position for position, book_id in enumerate(ranked_ids)},
+                        value=Book.id
+                    ))
         else:
             # Basic search (original behavior)
             search = search.lower()
@@ -178,24 +272,52 @@ def get_books():
                 (func.lower(Book.isbn).contains(search))
             )
     
+    if keyset_requested():
+        after, limit, include_total = keyset_args(app.config['DEFAULT_PAGE_SIZE'], app.config['MAX_PAGE_SIZE'])
+        result = keyset_paginate(query, Book.id, after, limit, include_total)
+        
+        response = {
+            'books': rows_to_dicts(result.items, columns),
+            'next_cursor': result.next_cursor,
+            'has_more': result.has_more
+        }
+        if include_total:
+            response['total'] = result.total
+        return jsonify(response)
+    
     books = query.paginate(
         page=page, per_page=per_page, error_out=False
     )
     
     return jsonify({
-        'books': [book.to_dict() for book in books.items],
+        'books': rows_to_dicts(books.items, columns),
         'total': books.total,
         'pages': books.pages,
         'current_page': page
     })
 
+@app.route('/api/categories', methods=['GET'])
+@versioned_etag('books')
+def get_categories():
+    """Count the books filed under each category, optionally only those with a given status"""
+    status = request.args.get('status', '')
+    limit = request.args.get('limit', type=int)
+    
+    facets = category_facets(status if status != 'all' else None, limit)
+    return jsonify({
+        'success': True,
+        'categories': [{'name': name, 'count': count} for name, count in facets],
+        'total': len(facets)
+    })
+
 @app.route('/api/books', methods=['POST'])
 def add_book():
     """Add a new book or add copies to existing book"""
     data = request.get_json()
     
     try:
-        isbn = data.get('isbn')
+        # Bulk import stores the same form, so both paths find each other's books
+        isbn = canonical_isbn(data.get('isbn'))
         
         # Check if book already exists by ISBN
         existing_book = None
@@ -215,6 +337,7 @@ def add_book():
             if data.get('location') and not existing_book.location:
                 existing_book.location = data.get('location')
             
+            adjust_library_stats(total_copies=copies_to_add, available_copies=available_to_add)
             db.session.commit()
             
             return jsonify({
@@ -244,6 +367,11 @@ def add_book():
             book.update_normalized_fields()
             
             db.session.add(book)
+            adjust_library_stats(
+                total_books=1,
+                total_copies=book.copies_total,
+                available_copies=book.copies_available
+            )
             db.session.commit()
             
             return jsonify({
@@ -259,6 +387,51 @@ def add_book():
             'message': f'Error adding book: {str(e)}'
         }), 400
 
+def read_bulk_import_rows():
+    """Read bulk import rows from a CSV upload or a JSON body, or None if there are none"""
+    upload = request.files.get('file')
+    if upload:
+        rows = parse_import_csv(upload.read().decode('utf-8-sig'))
+    else:
+        data = request.get_json(silent=True) or {}
+        rows = data.get('books') or data.get('isbns') or []
+    
+    return rows if isinstance(rows, list) and rows else None
+
+@app.route('/api/books/bulk', methods=['POST'])
+def bulk_import_books():
+    """Add many books at once from a list of ISBNs or a CSV upload"""
+    try:
+        rows = read_bulk_import_rows()
+        if not rows:
+            return jsonify({
+                'success': False,
+                'message': 'Provide a CSV file, or a JSON body with a "books" or "isbns" list'
+            }), 400
+        
+        max_rows = app.config['BULK_IMPORT_MAX_ROWS']
+        if len(rows) > max_rows:
+            return jsonify({
+                'success': False,
+                'message': f'At most {max_rows} rows can be imported per request; queue larger files with POST /api/jobs/bulk-import'
+            }), 400
+        
+        report = import_books(rows, isbn_scanner, isbn_cache, time_budget=app.config['BULK_IMPORT_TIME_BUDGET'])
+        summary = report['summary']
+        
+        return jsonify({
+            'success': True,
+            'summary': summary,
+            'results': report['results'],
+            'message': f"Created {summary['created']} and updated {summary['updated']} of {summary['total']} rows"
+        })
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'message': f'Error importing books: {str(e)}'
+        }), 400
+
 @app.route('/api/books/<int:book_id>', methods=['GET'])
 def get_book(book_id):
     """Get a specific book"""
@@ -272,15 +445,22 @@ def update_book(book_id):
     data = request.get_json()
     
     try:
+        old_copies_total = book.copies_total
+        old_copies_available = book.copies_available
+        
         for key, value in data.items():
             if hasattr(book, key) and key != 'id':
                 setattr(book, key, value)
         
-        # Update normalized fields for Vietnamese search if title or author changed
-        if 'title' in data or 'author' in data:
+        # Update normalized fields for Vietnamese and full-text search if any searchable field changed
+        if any(field in data for field in BOOK_SEARCH_FIELDS):
             book.update_normalized_fields()
         
         book.last_updated = datetime.utcnow()
+        adjust_library_stats(
+            total_copies=int(book.copies_total) - old_copies_total,
+            available_copies=int(book.copies_available) - old_copies_available
+        )
         db.session.commit()
         
         return jsonify({
@@ -313,6 +493,11 @@ def delete_book(book_id):
             }), 400
         
         # If no transactions, safe to delete
+        adjust_library_stats(
+            total_books=-1,
+            total_copies=-book.copies_total,
+            available_copies=-book.copies_available
+        )
         db.session.delete(book)
         db.session.commit()
         
@@ -331,7 +516,7 @@ def delete_book(book_id):
 def get_book_by_isbn(isbn):
     """Get book information by ISBN from library database"""
     try:
-        book = Book.query.filter_by(isbn=isbn).first()
+        book = Book.query.filter_by(isbn=canonical_isbn(isbn)).first()
         if book:
             return jsonify({
                 'success': True,
@@ -369,6 +554,25 @@ def get_book_by_uuid(uuid):
             'message': f'Error retrieving book: {str(e)}'
         }), 400
 
+def lookup_book_info(clean_isbn, refresh=False):
+    """Look up an ISBN and add what the library already holds (also run by the job worker)"""
+    # Get book info from the metadata cache, falling back to the external providers
+    book_info = isbn_cache.get_book_info(clean_isbn, isbn_scanner.get_book_info_by_isbn, refresh=refresh)
+    
+    if book_info:
+        # Check how many copies we already have in the database
+        existing_book = Book.query.filter_by(isbn=canonical_isbn(clean_isbn)).first()
+        suggested_copies = 1 if not existing_book else existing_book.copies_total + 1
+        
+        # Add suggested copy count to the response
+        book_info['suggested_copies'] = suggested_copies
+        book_info['existing_in_library'] = existing_book is not None
+        
+        if existing_book:
+            book_info['existing_book'] = existing_book.to_dict()
+    
+    return book_info
+
 @app.route('/api/isbn/lookup/<isbn>', methods=['GET'])
 def lookup_isbn_external(isbn):
     """Get book information by ISBN from Google Books API"""
@@ -383,21 +587,10 @@ def lookup_isbn_external(isbn):
                 'message': 'Invalid ISBN format'
             }), 400
         
-        # Get book info from Google Books API
-        book_info = isbn_scanner.get_book_info_by_isbn(clean_isbn)
+        refresh = request.args.get('refresh', '').lower() in ('1', 'true', 'yes')
+        book_info = lookup_book_info(clean_isbn, refresh=refresh)
         
         if book_info:
-            # Check how many copies we already have in the database
-            existing_book = Book.query.filter_by(isbn=clean_isbn).first()
-            suggested_copies = 1 if not existing_book else existing_book.copies_total + 1
-            
-            # Add suggested copy count to the response
-            book_info['suggested_copies'] = suggested_copies
-            book_info['existing_in_library'] = existing_book is not None
-            
-            if existing_book:
-                book_info['existing_book'] = existing_book.to_dict()
-            
             return jsonify({
                 'success': True,
                 'book_info': book_info
@@ -413,6 +606,76 @@ def lookup_isbn_external(isbn):
             'message': f'Error looking up ISBN: {str(e)}'
         }), 400
 
+# Background Job Routes
+
+def job_accepted_response(job):
+    """Respond to a queued job with its id and where to poll for the result"""
+    return jsonify({
+        'success': True,
+        'job': job.to_dict(),
+        'status_url': url_for('get_job', job_id=job.id)
+    }), 202
+
+@app.route('/api/jobs/isbn-lookup', methods=['POST'])
+def queue_isbn_lookup():
+    """Queue an external ISBN lookup to run on the job worker"""
+    data = request.get_json(silent=True) or {}
+    
+    try:
+        import isbnlib
+        clean_isbn = isbnlib.clean(str(data.get('isbn') or ''))
+        
+        if not (isbnlib.is_isbn10(clean_isbn) or isbnlib.is_isbn13(clean_isbn)):
+            return jsonify({
+                'success': False,
+                'message': 'Invalid ISBN format'
+            }), 400
+        
+        job = enqueue_job('isbn_lookup', {'isbn': clean_isbn, 'refresh': bool(data.get('refresh'))})
+        return job_accepted_response(job)
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'message': f'Error queueing ISBN lookup: {str(e)}'
+        }), 400
+
+@app.route('/api/jobs/bulk-import', methods=['POST'])
+def queue_bulk_import():
+    """Queue a bulk import of any size to run on the job worker"""
+    try:
+        rows = read_bulk_import_rows()
+        if not rows:
+            return jsonify({
+                'success': False,
+                'message': 'Provide a CSV file, or a JSON body with a "books" or "isbns" list'
+            }), 400
+        
+        # Imports add copies, so a job that died part way through is not run again
+        job = enqueue_job('bulk_import', {'rows': rows}, max_attempts=1)
+        return job_accepted_response(job)
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'message': f'Error queueing bulk import: {str(e)}'
+        }), 400
+
+@app.route('/api/jobs/<int:job_id>', methods=['GET'])
+def get_job(job_id):
+    """Get the status and, once finished, the result of a background job"""
+    job = db.session.get(Job, job_id)
+    if job is None:
+        return jsonify({
+            'success': False,
+            'message': 'Job not found'
+        }), 404
+    
+    return jsonify({
+        'success': True,
+        'job': job.to_dict()
+    })
+
 # QR Code Routes
 
 @app.route('/api/qr/<int:book_id>', methods=['GET'])
@@ -421,10 +684,12 @@ def generate_qr_code(book_id):
     book = Book.query.get_or_404(book_id)
     
     try:
-        qr_code_data = qr_manager.generate_qr_code(book.uuid)
+        deterministic = request.args.get('deterministic', '').lower() in ('1', 'true', 'yes')
+        qr_code_data = qr_manager.generate_qr_code(book.uuid, deterministic=deterministic)
         return jsonify({
             'success': True,
             'qr_code': qr_code_data,
+            'image_url': url_for('get_qr_image', book_uuid=book.uuid, image_format='png'),
             'book': book.to_dict()
         })
     except Exception as e:
@@ -433,6 +698,130 @@ def generate_qr_code(book_id):
             'message': f'Error generating QR code: {str(e)}'
         }), 400
 
+QR_IMAGE_MIMETYPES = {
+    'png': 'image/png',
+    'svg': 'image/svg+xml'
+}
+
+@app.route('/api/qr/<book_uuid>.<image_format>', methods=['GET'])
+def get_qr_image(book_uuid, image_format):
+    """Serve a book's QR code as a cacheable PNG or SVG image"""
+    if image_format not in QR_IMAGE_MIMETYPES:
+        return jsonify({
+            'success': False,
+            'message': 'Unsupported image format, use png or svg'
+        }), 404
+    
+    if db.session.query(Book.id).filter_by(uuid=book_uuid).first() is None:
+        return jsonify({
+            'success': False,
+            'message': 'Book not found'
+        }), 404
+    
+    try:
+        image_bytes, content_hash = qr_manager.get_qr_image(book_uuid, image_format)
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Error generating QR code: {str(e)}'
+        }), 400
+    
+    # The image only depends on the book UUID and the render settings, so
+    # clients revalidate with the content hash and get a 304 when it is unchanged
+    response = Response(image_bytes, mimetype=QR_IMAGE_MIMETYPES[image_format])
+    response.set_etag(content_hash)
+    response.cache_control.public = True
+    response.cache_control.max_age = app.config['QR_IMAGE_MAX_AGE']
+    return response.make_conditional(request)
+
+def parse_label_filters(args):
+    """Read the book filters for a label run from request arguments"""
+    filters = {'location': args.get('location') or None}
+    
+    if args.get('added_from'):
+        filters['added_from'] = datetime.strptime(args['added_from'], '%Y-%m-%d')
+    if args.get('added_to'):
+        # The end date is inclusive
+        filters['added_to'] = datetime.strptime(args['added_to'], '%Y-%m-%d') + timedelta(days=1)
+    if args.get('ids'):
+        filters['ids'] = [int(book_id) for book_id in args['ids'].split(',') if book_id.strip()]
+    
+    return filters
+
+@app.route('/api/labels/books', methods=['GET'])
+def generate_book_labels():
+    """Stream print-ready QR label sheets for a filtered set of books"""
+    output_format = request.args.get('format', 'pdf').lower()
+    if output_format not in LABEL_FORMATS:
+        return jsonify({
+            'success': False,
+            'message': 'Unsupported format, use pdf or png'
+        }), 400
+    
+    try:
+        filters = parse_label_filters(request.args)
+        layout = default_layout(app.config)
+        layout['columns'] = request.args.get('columns', layout['columns'], type=int)
+        layout['rows'] = request.args.get('rows', layout['rows'], type=int)
+        if not (1 <= layout['columns'] <= 10 and 1 <= layout['rows'] <= 20):
+            raise ValueError('columns must be between 1 and 10 and rows between 1 and 20')
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'message': f'Invalid label filters: {str(e)}'
+        }), 400
+    
+    statement = label_books_query(**filters)
+    book_count = db.session.scalar(select(func.count()).select_from(statement.subquery()))
+    if not book_count:
+        return jsonify({
+            'success': False,
+            'message': 'No books match these filters'
+        }), 404
+    
+    max_books = app.config['LABEL_MAX_BOOKS']
+    if book_count > max_books:
+        return jsonify({
+            'success': False,
+            'message': f'{book_count} books match; at most {max_books} can be labelled per request. '
+                       'Narrow the filters or use scripts/generate_book_labels.py'
+        }), 400
+    
+    labels_per_page = layout['columns'] * layout['rows']
+    page_count = -(-book_count // labels_per_page)
+    pages = label_pages(
+        statement, labels_per_page,
+        lambda book_uuid: qr_manager.build_payload(book_uuid, deterministic=True)
+    )
+    stream = label_sheet_stream(layout, pages, output_format, render_processes(app.config, page_count))
+    
+    filename = f"book-labels-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}.{'zip' if output_format == 'png' else 'pdf'}"
+    return Response(
+        stream_with_context(stream),
+        mimetype=LABEL_FORMATS[output_format],
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
+def resolve_qr_results(qr_results):
+    """Look up the books and members named by scanned QR codes, one query each"""
+    uuids = list(dict.fromkeys(r['uuid'] for r in qr_results if r.get('uuid')))
+    employee_codes = list(dict.fromkeys(r['employee_code'] for r in qr_results if r.get('employee_code')))
+    
+    books_by_uuid = {}
+    if uuids:
+        books_by_uuid = {book.uuid: book for book in Book.query.filter(Book.uuid.in_(uuids))}
+    members_by_code = {}
+    if employee_codes:
+        members_by_code = {
+            member.employee_code: member
+            for member in Member.query.filter(Member.employee_code.in_(employee_codes))
+        }
+    
+    # In the order the codes were scanned
+    books = [books_by_uuid[uuid].to_dict() for uuid in uuids if uuid in books_by_uuid]
+    members = [members_by_code[code].to_dict() for code in employee_codes if code in members_by_code]
+    return books, members
+
 @app.route('/api/scan/qr', methods=['POST'])
 def scan_qr_code():
     """Scan QR code from uploaded image"""
@@ -454,34 +843,29 @@ def scan_qr_code():
         image_data = file.read()
         
         # Scan QR code
-        qr_results = qr_manager.scan_qr_code(image_data)
+        qr_results, scan_report = qr_manager.scan_qr_code_with_report(image_data)
         
         if qr_results:
-            books = []
-            members = []
-            for qr_result in qr_results:
-                if 'uuid' in qr_result:
-                    # Look up book by UUID
-                    book = Book.query.filter_by(uuid=qr_result['uuid']).first()
-                    if book:
-                        books.append(book.to_dict())
-                elif 'employee_code' in qr_result:
-                    # Look up member by employee code
-                    member = Member.query.filter_by(employee_code=qr_result['employee_code']).first()
-                    if member:
-                        members.append(member.to_dict())
+            books, members = resolve_qr_results(qr_results)
             
-            return jsonify({
+            response = jsonify({
                 'success': True,
                 'qr_results': qr_results,
                 'books': books,
-                'members': members
+                'members': members,
+                'scan': scan_report
             })
         else:
-            return jsonify({
+            response = jsonify({
                 'success': False,
-                'message': 'No QR codes found in image'
-            }), 404
+                'message': 'No QR codes found in image',
+                'scan': scan_report
+            })
+            response.status_code = 404
+        
+        if scan_report:
+            response.headers['Server-Timing'] = server_timing(scan_report)
+        return response
             
     except Exception as e:
         return jsonify({
@@ -489,6 +873,107 @@ def scan_qr_code():
             'message': f'Error scanning QR code: {str(e)}'
         }), 400
 
+def read_scan_uploads():
+    """Read the images of a batch scan as (filename, bytes) pairs, expanding ZIP uploads"""
+    max_images = app.config['SCAN_BATCH_MAX_IMAGES']
+    images = []
+    for upload in request.files.getlist('images') + request.files.getlist('archive'):
+        data = upload.read()
+        if not data:
+            continue
+        if zipfile.is_zipfile(io.BytesIO(data)):
+            images.extend(read_image_archive(data, max_images, app.config['SCAN_BATCH_MAX_BYTES']))
+        else:
+            images.append((upload.filename, data))
+        if len(images) > max_images:
+            raise ValueError(f"At most {max_images} images can be scanned per request")
+    return images
+
+@app.route('/api/scan/qr/batch', methods=['POST'])
+def scan_qr_code_batch():
+    """Scan QR codes in many images at once (multipart files and/or ZIP archives)"""
+    try:
+        try:
+            images = read_scan_uploads()
+        except (ValueError, zipfile.BadZipFile) as e:
+            return jsonify({
+                'success': False,
+                'message': f'Invalid upload: {str(e)}'
+            }), 400
+        
+        if not images:
+            return jsonify({
+                'success': False,
+                'message': 'Provide one or more "images" files or a ZIP "archive"'
+            }), 400
+        
+        # Frames from a shelf audit can be recorded into the audit as they are scanned
+        audit = None
+        if request.form.get('audit_id'):
+            audit = db.session.get(InventoryAudit, request.form.get('audit_id', type=int))
+            if audit is None:
+                return audit_not_found()
+            if audit.status != 'open':
+                return jsonify({
+                    'success': False,
+                    'message': 'Audit is not open'
+                }), 409
+        
+        started = time.perf_counter()
+        processes = scan_processes(app.config, len(images))
+        scans = scan_images(
+            [data for _, data in images], processes,
+            max_dimension=app.config['SCAN_MAX_DIMENSION']
+        )
+        
+        results = []
+        all_qr_results = []
+        for (filename, _), (decoded, scan_report, error) in zip(images, scans):
+            qr_results = [r for r in map(qr_manager.parse_qr_symbol, decoded) if r is not None]
+            all_qr_results.extend(qr_results)
+            results.append({
+                'filename': filename,
+                'qr_results': qr_results,
+                'scan': scan_report,
+                'error': error
+            })
+        
+        audit_scans = None
+        if audit is not None:
+            accepted, _ = record_scans(audit.id, [r['uuid'] for r in all_qr_results if r.get('uuid')])
+            audit_scans = {'audit_id': audit.id, 'accepted': accepted}
+        
+        books, members = resolve_qr_results(all_qr_results)
+        found_uuids = {book['uuid'] for book in books}
+        unknown_uuids = list(dict.fromkeys(
+            r['uuid'] for r in all_qr_results if r.get('uuid') and r['uuid'] not in found_uuids
+        ))
+        
+        elapsed = time.perf_counter() - started
+        
+        return jsonify({
+            'success': True,
+            'images': results,
+            'books': books,
+            'members': members,
+            'unknown_uuids': unknown_uuids,
+            'audit': audit_scans,
+            'summary': {
+                'images': len(images),
+                'images_with_codes': sum(1 for result in results if result['qr_results']),
+                'failed_images': sum(1 for result in results if result['error']),
+                'codes': len(all_qr_results),
+                'books': len(books),
+                'members': len(members),
+                'elapsed_ms': round(elapsed * 1000, 1)
+            }
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Error scanning images: {str(e)}'
+        }), 400
+
 @app.route('/api/scan/member-qr', methods=['POST'])
 def scan_member_qr_code():
     """Scan member QR code from uploaded image or data"""
@@ -553,6 +1038,127 @@ def scan_member_qr_code():
             'message': f'Error scanning member QR code: {str(e)}'
         }), 400
 
+# Inventory Audit Routes
+
+def audit_not_found():
+    return jsonify({
+        'success': False,
+        'message': 'Audit not found'
+    }), 404
+
+@app.route('/api/audits', methods=['POST'])
+def create_audit():
+    """Start an inventory audit of a shelf location"""
+    data = request.get_json(silent=True) or {}
+    location = str(data.get('location') or '').strip()
+    if not location:
+        return jsonify({
+            'success': False,
+            'message': 'A shelf location is required'
+        }), 400
+    
+    try:
+        audit = start_audit(location)
+        return jsonify({
+            'success': True,
+            'audit': audit.to_dict(),
+            'message': f'Audit started for {location} with {audit.expected_books} books expected'
+        }), 201
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'message': f'Error starting audit: {str(e)}'
+        }), 400
+
+@app.route('/api/audits/<int:audit_id>', methods=['GET'])
+def get_audit(audit_id):
+    """Get an audit, with its final diff once it is closed"""
+    audit = db.session.get(InventoryAudit, audit_id)
+    if audit is None:
+        return audit_not_found()
+    return jsonify({
+        'success': True,
+        'audit': audit.to_dict(),
+        'diff': json.loads(audit.result) if audit.result else None
+    })
+
+@app.route('/api/audits/<int:audit_id>/scans', methods=['POST'])
+def add_audit_scans(audit_id):
+    """Record scanned book UUIDs, QR payloads or ISBNs for an open audit"""
+    data = request.get_json(silent=True) or {}
+    codes = data.get('codes')
+    if not isinstance(codes, list) or not codes:
+        return jsonify({
+            'success': False,
+            'message': 'Provide a JSON body with a "codes" list'
+        }), 400
+    
+    max_codes = app.config['AUDIT_MAX_CODES_PER_REQUEST']
+    if len(codes) > max_codes:
+        return jsonify({
+            'success': False,
+            'message': f'At most {max_codes} codes can be recorded per request'
+        }), 400
+    
+    audit = db.session.get(InventoryAudit, audit_id)
+    if audit is None:
+        return audit_not_found()
+    try:
+        accepted, invalid = record_scans(audit.id, codes)
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 409
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'message': f'Error recording scans: {str(e)}'
+        }), 400
+    
+    db.session.refresh(audit)
+    return jsonify({
+        'success': True,
+        'accepted': accepted,
+        'invalid': invalid,
+        'scan_count': audit.scan_count
+    })
+
+@app.route('/api/audits/<int:audit_id>/diff', methods=['GET'])
+def get_audit_diff(audit_id):
+    """Compare the codes scanned so far with the books expected at the location"""
+    audit = db.session.get(InventoryAudit, audit_id)
+    if audit is None:
+        return audit_not_found()
+    diff = json.loads(audit.result) if audit.result else audit_diff(audit)
+    return jsonify({
+        'success': True,
+        'audit': audit.to_dict(),
+        'diff': diff
+    })
+
+@app.route('/api/audits/<int:audit_id>/close', methods=['POST'])
+def close_audit_session(audit_id):
+    """Close an audit, storing its final diff"""
+    audit = db.session.get(InventoryAudit, audit_id)
+    if audit is None:
+        return audit_not_found()
+    try:
+        diff = close_audit(audit)
+        return jsonify({
+            'success': True,
+            'audit': audit.to_dict(),
+            'diff': diff
+        })
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'message': f'Error closing audit: {str(e)}'
+        }), 400
+
 # Circulation Management Endpoints
 @app.route('/api/circulation/checkout', methods=['POST'])
 def checkout_book():
@@ -577,65 +1183,18 @@ def checkout_book():
                 'message': 'Book not found'
             }), 404
         
-        # Check if book is available for checkout
-        if book.copies_available <= 0:
-            return jsonify({
-                'success': False,
-                'message': 'No copies available for checkout'
-            }), 400
-            
-        # Check if book status allows checkout
-        unavailable_statuses = ['unavailable', 'damaged', 'lost', 'maintenance', 'archived']
-        if book.status in unavailable_statuses:
-            status_messages = {
-                'unavailable': 'This book is temporarily unavailable for checkout',
-                'damaged': 'This book is damaged and cannot be checked out',
-                'lost': 'This book is marked as lost and cannot be checked out',
-                'maintenance': 'This book is under maintenance and cannot be checked out',
-                'archived': 'This book is archived and cannot be checked out'
-            }
-            return jsonify({
-                'success': False,
-                'message': status_messages.get(book.status, f'Book status "{book.status}" does not allow checkout')
-            }), 400
-        
         # Find the member
-        member = Member.query.get(member_id)
+        member = db.session.get(Member, member_id)
         if not member:
             return jsonify({
                 'success': False,
                 'message': 'Member not found'
             }), 404
         
-        # Check if member has reached borrowing limit
-        active_loans = Transaction.query.filter_by(
-            member_id=member_id,
-            transaction_type='borrow',
-            status='active'
-        ).count()
-        
-        if active_loans >= member.max_books:
-            return jsonify({
-                'success': False,
-                'message': f'Member has reached maximum borrowing limit ({member.max_books} books)'
-            }), 400
-        
-        # Create checkout transaction
+        # Availability, book status and the borrowing limit are checked by the
+        # database as the copy is taken, so concurrent checkouts cannot overdraw
         due_date = datetime.utcnow() + timedelta(days=due_days)
-        transaction = Transaction(
-            book_id=book.id,
-            member_id=member.id,
-            transaction_type='borrow',
-            due_date=due_date,
-            status='active'
-        )
-        
-        # Update book availability
-        book.copies_available -= 1
-        if book.copies_available == 0:
-            book.status = 'borrowed'
-        
-        db.session.add(transaction)
+        transaction = checkout_copy(book.id, member.id, due_date)
         db.session.commit()
         
         return jsonify({
@@ -647,6 +1206,12 @@ def checkout_book():
             'due_date': due_date.isoformat()
         })
         
+    except CirculationError as e:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'message': e.message
+        }), e.status_code
     except Exception as e:
         db.session.rollback()
         return jsonify({
@@ -699,10 +1264,10 @@ def checkin_book():
             }), 404
         
         # Find active transaction for this book
-        transaction_query = Transaction.query.filter_by(
-            book_id=book.id,
-            transaction_type='borrow',
-            status='active'
+        transaction_query = Transaction.query.filter(
+            Transaction.book_id == book.id,
+            Transaction.transaction_type == 'borrow',
+            Transaction.status.in_(OPEN_LOAN_STATUSES)
         )
         
         if member_id:
@@ -721,8 +1286,7 @@ def checkin_book():
         fine_amount = 0.0
         
         if return_date > transaction.due_date:
-            days_overdue = (return_date - transaction.due_date).days
-            fine_amount = calculate_fine(transaction.due_date, return_date)
+            fine_amount = calculate_fine(transaction.due_date, return_date, app.config['FINE_PER_DAY'])
         
         # Use custom condition fee if provided, otherwise use default fees
         if condition_fee == 0.0:  # Only apply default if no custom fee was provided
@@ -731,27 +1295,18 @@ def checkin_book():
             elif condition == 'lost':
                 condition_fee = 50.0  # $50 default replacement fee
         
-        # Update transaction
-        transaction.return_date = return_date
-        transaction.fine_amount = fine_amount
-        transaction.condition_fee = condition_fee
-        transaction.return_condition = condition
-        transaction.condition_notes = condition_notes
-        transaction.status = 'completed'
-        
-        # Update book availability and status
-        book.copies_available += 1
-        if book.copies_available > 0 and condition in ['good', 'fair']:
-            book.status = 'available'
-        elif condition in ['damaged', 'lost']:
-            # For damaged/lost books, don't make them available
-            book.copies_available -= 1
-            if condition == 'lost':
-                book.copies_total -= 1  # Remove lost books from total count
-        
+        # Close the loan and update book availability; damaged and lost copies
+        # are not made available again
+        checkin_copy(
+            transaction, return_date,
+            fine_amount=fine_amount,
+            condition=condition,
+            condition_notes=condition_notes,
+            condition_fee=condition_fee
+        )
         db.session.commit()
         
-        member = Member.query.get(transaction.member_id)
+        member = transaction.member
         
         return jsonify({
             'success': True,
@@ -766,6 +1321,12 @@ def checkin_book():
             'condition_notes': condition_notes
         })
         
+    except CirculationError as e:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'message': e.message
+        }), e.status_code
     except Exception as e:
         db.session.rollback()
         return jsonify({
@@ -773,6 +1334,174 @@ def checkin_book():
             'message': f'Error during checkin: {str(e)}'
         }), 400
 
+@app.route('/api/circulation/batch', methods=['POST'])
+def circulation_batch():
+    """Check out or check in a member's whole stack of books in one transaction"""
+    action = 'checkout'
+    try:
+        data = request.get_json(silent=True) or {}
+        if not isinstance(data, dict):
+            return jsonify({
+                'success': False,
+                'message': 'Request body must be a JSON object'
+            }), 400
+        
+        action = data.get('action', 'checkout')
+        member_id = data.get('member_id')
+        book_uuids = data.get('book_uuids')
+        due_days = data.get('due_days', 14)  # Default 14 days
+        all_or_nothing = bool(data.get('all_or_nothing', False))
+        
+        if action not in ['checkout', 'checkin']:
+            return jsonify({
+                'success': False,
+                'message': 'Action must be "checkout" or "checkin"'
+            }), 400
+        
+        if not member_id or not isinstance(book_uuids, list) or not book_uuids:
+            return jsonify({
+                'success': False,
+                'message': 'Member ID and a list of book UUIDs are required'
+            }), 400
+        
+        max_books = app.config['CIRCULATION_BATCH_MAX_BOOKS']
+        if len(book_uuids) > max_books:
+            return jsonify({
+                'success': False,
+                'message': f'At most {max_books} books can be handled per request'
+            }), 400
+        
+        member = db.session.get(Member, member_id)
+        if not member:
+            return jsonify({
+                'success': False,
+                'message': 'Member not found'
+            }), 404
+        
+        # Every book in one query; repeated scans of a book are reported, not lent twice
+        unique_uuids = list(dict.fromkeys(str(book_uuid) for book_uuid in book_uuids))
+        books_by_uuid = {book.uuid: book for book in Book.query.filter(Book.uuid.in_(unique_uuids))}
+        book_ids = [books_by_uuid[book_uuid].id for book_uuid in unique_uuids if book_uuid in books_by_uuid]
+        
+        now = datetime.utcnow()
+        if action == 'checkout':
+            loans, failures = checkout_books(book_ids, member.id, now + timedelta(days=due_days))
+        else:
+            fine_per_day = app.config['FINE_PER_DAY']
+            loans, failures = checkin_books(
+                book_ids, member.id, now,
+                lambda due_date, return_date: calculate_fine(due_date, return_date, fine_per_day)
+            )
+        
+        rolled_back = all_or_nothing and len(loans) < len(unique_uuids)
+        if rolled_back:
+            db.session.rollback()
+        else:
+            db.session.commit()
+            # Reload the changed books and loans in one query each rather than one per item
+            Book.query.filter(Book.id.in_(list(loans))).all()
+            Transaction.query.filter(Transaction.id.in_([loan.id for loan in loans.values()])).all()
+        
+        results = []
+        seen = set()
+        for book_uuid in map(str, book_uuids):
+            book = books_by_uuid.get(book_uuid)
+            result = {'book_uuid': book_uuid}
+            if book_uuid in seen:
+                result.update(status='duplicate', message='Book was already in this batch')
+            elif book is None:
+                result.update(status='not_found', message='Book not found')
+            elif book.id in failures:
+                result.update(status='failed', message=failures[book.id].message)
+            elif rolled_back:
+                result.update(status='rolled_back', message='Not applied because another book in the batch failed')
+            else:
+                loan = loans[book.id]
+                result.update(
+                    status='checked_out' if action == 'checkout' else 'returned',
+                    transaction=loan.to_dict(),
+                    book=book.to_dict()
+                )
+            seen.add(book_uuid)
+            results.append(result)
+        
+        completed = 0 if rolled_back else len(loans)
+        duplicates = len(book_uuids) - len(unique_uuids)
+        summary = {
+            'requested': len(book_uuids),
+            'completed': completed,
+            'duplicates': duplicates,
+            'failed': len(book_uuids) - completed - duplicates
+        }
+        if action == 'checkin' and not rolled_back:
+            summary['fines'] = sum(loan.fine_amount for loan in loans.values())
+        
+        return jsonify({
+            'success': not rolled_back,
+            'action': action,
+            'member': member.to_dict(),
+            'results': results,
+            'summary': summary
+        }), 409 if rolled_back else 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'message': f'Error during batch {action}: {str(e)}'
+        }), 400
+
+@app.route('/api/circulation/overdue')
+def get_overdue_loans():
+    """List loans past their due date, longest overdue first"""
+    try:
+        limit = request.args.get('limit', app.config['DEFAULT_PAGE_SIZE'], type=int)
+        limit = max(1, min(limit, app.config['MAX_PAGE_SIZE']))
+        member_id = request.args.get('member_id', type=int)
+        
+        # Loans the last sweep has not reached yet are included, so the list
+        # does not depend on how recently the sweep ran
+        now = datetime.utcnow()
+        overdue_filter = list(overdue_loans_filter(now))
+        if member_id:
+            overdue_filter.append(Transaction.member_id == member_id)
+        
+        total, fines_accrued = db.session.query(
+            func.count(Transaction.id),
+            func.coalesce(func.sum(Transaction.fine_amount), 0.0)
+        ).filter(*overdue_filter).one()
+        
+        loans = Transaction.query.options(
+            joinedload(Transaction.book),
+            joinedload(Transaction.member)
+        ).filter(*overdue_filter).order_by(
+            Transaction.due_date, Transaction.id
+        ).limit(limit).all()
+        
+        fine_per_day = app.config['FINE_PER_DAY']
+        loans_data = []
+        for loan in loans:
+            loan_dict = loan.to_dict()
+            loan_dict['book'] = loan.book.to_dict() if loan.book else None
+            loan_dict['member'] = loan.member.to_dict() if loan.member else None
+            loan_dict['days_overdue'] = (now - loan.due_date).days
+            loan_dict['fine_to_date'] = calculate_fine(loan.due_date, now, fine_per_day)
+            loans_data.append(loan_dict)
+        
+        return jsonify({
+            'success': True,
+            'loans': loans_data,
+            'count': len(loans_data),
+            'total': total,
+            'fines_accrued': round(float(fines_accrued), 2)
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Error fetching overdue loans: {str(e)}'
+        }), 400
+
 @app.route('/api/circulation/status/<book_uuid>')
 def get_circulation_status(book_uuid):
     """Get circulation status of a book"""
@@ -784,16 +1513,18 @@ def get_circulation_status(book_uuid):
                 'message': 'Book not found'
             }), 404
         
-        # Get active transactions
-        active_transactions = Transaction.query.filter_by(
-            book_id=book.id,
-            transaction_type='borrow',
-            status='active'
+        # Get active transactions with their members in a single query
+        active_transactions = Transaction.query.options(
+            joinedload(Transaction.member)
+        ).filter(
+            Transaction.book_id == book.id,
+            Transaction.transaction_type == 'borrow',
+            Transaction.status.in_(OPEN_LOAN_STATUSES)
         ).all()
         
         transactions_data = []
         for trans in active_transactions:
-            member = Member.query.get(trans.member_id)
+            member = trans.member
             trans_dict = trans.to_dict()
             trans_dict['member'] = member.to_dict() if member else None
             trans_dict['is_overdue'] = datetime.utcnow() > trans.due_date
@@ -814,9 +1545,24 @@ def get_circulation_status(book_uuid):
 
 # Member Management Endpoints
 @app.route('/api/members', methods=['GET'])
+@versioned_etag('members')
 def get_members():
-    """Get all members"""
+    """Get all members, or one page of them with after/limit"""
     try:
+        if keyset_requested():
+            after, limit, include_total = keyset_args(app.config['DEFAULT_PAGE_SIZE'], app.config['MAX_PAGE_SIZE'])
+            result = keyset_paginate(Member.query, Member.id, after, limit, include_total)
+            
+            response = {
+                'success': True,
+                'members': [member.to_dict() for member in result.items],
+                'next_cursor': result.next_cursor,
+                'has_more': result.has_more
+            }
+            if include_total:
+                response['total'] = result.total
+            return jsonify(response)
+        
         members = Member.query.all()
         return jsonify({
             'success': True,
@@ -874,6 +1620,7 @@ def add_member():
         )
         
         db.session.add(member)
+        adjust_library_stats(active_members=1)
         db.session.commit()
         
         return jsonify({
@@ -955,7 +1702,7 @@ def update_member(member_id):
 def get_member(member_id):
     """Get a specific member by ID"""
     try:
-        member = Member.query.get(member_id)
+        member = db.session.get(Member, member_id)
         
         if not member:
             return jsonify({
@@ -1008,19 +1755,16 @@ def delete_member(member_id):
                 'message': 'Member not found'
             }), 404
         
-        # Check if member has active transactions
-        active_transactions = Transaction.query.filter_by(
-            member_id=member_id,
-            status='active'
-        ).first()
-        
-        if active_transactions:
+        # Check if member has active loans
+        if member.active_loans > 0:
             return jsonify({
                 'success': False,
                 'message': 'Cannot delete member with active book loans. Please return all books first.'
             }), 400
         
         # Delete the member
+        if member.status == 'active':
+            adjust_library_stats(active_members=-1)
         db.session.delete(member)
         db.session.commit()
         
@@ -1040,10 +1784,95 @@ def delete_member(member_id):
 
 @app.route('/api/transactions', methods=['GET'])
 def get_transactions():
-    """Get all transactions"""
+    """Get all transactions, or one page of them (newest first) with after/limit"""
+    if keyset_requested():
+        after, limit, include_total = keyset_args(app.config['DEFAULT_PAGE_SIZE'], app.config['MAX_PAGE_SIZE'])
+        result = keyset_paginate(Transaction.query, Transaction.id, after, limit, include_total, descending=True)
+        
+        response = {
+            'success': True,
+            'transactions': [trans.to_dict() for trans in result.items],
+            'next_cursor': result.next_cursor,
+            'has_more': result.has_more
+        }
+        if include_total:
+            response['total'] = result.total
+        return jsonify(response)
+    
     transactions = Transaction.query.order_by(Transaction.transaction_date.desc()).all()
     return jsonify([trans.to_dict() for trans in transactions])
 
+@app.route('/api/transactions/export', methods=['GET'])
+def export_transactions():
+    """Stream the transaction log as NDJSON or CSV"""
+    export_format = request.args.get('format', 'ndjson').lower()
+    since = request.args.get('since')
+    
+    if export_format not in ['ndjson', 'csv']:
+        return jsonify({
+            'success': False,
+            'message': 'Format must be ndjson or csv'
+        }), 400
+    
+    statement = select(Transaction)
+    if since:
+        try:
+            statement = statement.where(Transaction.transaction_date >= datetime.fromisoformat(since))
+        except ValueError:
+            return jsonify({
+                'success': False,
+                'message': 'Invalid since date, expected ISO format (e.g. 2025-07-01 or 2025-07-01T08:00:00)'
+            }), 400
+    
+    # Stream rows from a server-side cursor in batches so memory stays flat
+    statement = statement.order_by(Transaction.id).execution_options(yield_per=app.config['EXPORT_BATCH_SIZE'])
+    
+    # Flush output in chunks rather than per row to keep the response efficient
+    chunk_size = 64 * 1024
+    
+    def generate_ndjson():
+        # Encoded by the app's JSON provider (orjson when installed), keeping column order
+        dumps = app.json.dumps
+        lines = []
+        size = 0
+        for trans in db.session.scalars(statement):
+            line = dumps(trans.to_dict(), sort_keys=False) + '\n'
+            lines.append(line)
+            size += len(line)
+            if size >= chunk_size:
+                yield ''.join(lines)
+                lines = []
+                size = 0
+        if lines:
+            yield ''.join(lines)
+    
+    def generate_csv():
+        buffer = io.StringIO()
+        fieldnames = [column.name for column in Transaction.__table__.columns]
+        writer = csv.DictWriter(buffer, fieldnames=fieldnames, extrasaction='ignore')
+        writer.writeheader()
+        for trans in db.session.scalars(statement):
+            writer.writerow(trans.to_dict())
+            if buffer.tell() >= chunk_size:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate(0)
+        yield buffer.getvalue()
+    
+    timestamp = datetime.utcnow().strftime('%Y%m%d%H%M%S')
+    if export_format == 'csv':
+        generator = generate_csv()
+        mimetype = 'text/csv'
+    else:
+        generator = generate_ndjson()
+        mimetype = 'application/x-ndjson'
+    
+    return Response(
+        stream_with_context(generator),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename=transactions-{timestamp}.{export_format}'}
+    )
+
 @app.route('/api/borrow', methods=['POST'])
 def borrow_book():
     """Borrow a book"""
@@ -1054,42 +1883,13 @@ def borrow_book():
     book = Book.query.get_or_404(book_id)
     member = Member.query.get_or_404(member_id)
     
-    if book.copies_available <= 0:
-        return jsonify({
-            'success': False,
-            'message': 'No copies available'
-        }), 400
-        
-    # Check if book status allows checkout
-    unavailable_statuses = ['unavailable', 'damaged', 'lost', 'maintenance', 'archived']
-    if book.status in unavailable_statuses:
-        status_messages = {
-            'unavailable': 'This book is temporarily unavailable for checkout',
-            'damaged': 'This book is damaged and cannot be checked out',
-            'lost': 'This book is marked as lost and cannot be checked out',
-            'maintenance': 'This book is under maintenance and cannot be checked out',
-            'archived': 'This book is archived and cannot be checked out'
-        }
-        return jsonify({
-            'success': False,
-            'message': status_messages.get(book.status, f'Book status "{book.status}" does not allow checkout')
-        }), 400
-    
     try:
-        # Create transaction
-        transaction = Transaction(
-            book_id=book_id,
-            member_id=member_id,
-            transaction_type='borrow',
-            due_date=datetime.utcnow() + timedelta(days=14)  # 2 weeks loan period
+        # This endpoint has never applied the member's borrowing limit
+        transaction = checkout_copy(
+            book.id, member.id,
+            datetime.utcnow() + timedelta(days=14),  # 2 weeks loan period
+            enforce_limit=False
         )
-        
-        # Update book availability
-        book.copies_available -= 1
-        if book.copies_available == 0:
-            book.status = 'borrowed'
-        
-        db.session.add(transaction)
         db.session.commit()
         
         return jsonify({
@@ -1097,6 +1897,12 @@ def borrow_book():
             'transaction': transaction.to_dict(),
             'message': 'Book borrowed successfully'
         })
+    except CirculationError as e:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'message': e.message
+        }), e.status_code
     except Exception as e:
         db.session.rollback()
         return jsonify({
@@ -1111,23 +1917,14 @@ def return_book():
     transaction_id = data['transaction_id']
     
     transaction = Transaction.query.get_or_404(transaction_id)
-    book = Book.query.get(transaction.book_id)
     
     try:
-        # Update transaction
-        transaction.return_date = datetime.utcnow()
-        transaction.status = 'completed'
+        return_date = datetime.utcnow()
         
         # Calculate fine if overdue
-        if transaction.return_date > transaction.due_date:
-            days_overdue = (transaction.return_date - transaction.due_date).days
-            transaction.fine_amount = days_overdue * 1.0  # $1 per day
-        
-        # Update book availability
-        book.copies_available += 1
-        if book.copies_available > 0:
-            book.status = 'available'
+        fine_amount = calculate_fine(transaction.due_date, return_date, app.config['FINE_PER_DAY'])
         
+        checkin_copy(transaction, return_date, fine_amount=fine_amount)
         db.session.commit()
         
         return jsonify({
@@ -1136,6 +1933,12 @@ def return_book():
             'fine_amount': transaction.fine_amount,
             'message': 'Book returned successfully'
         })
+    except CirculationError as e:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'message': e.message
+        }), e.status_code
     except Exception as e:
         db.session.rollback()
         return jsonify({
@@ -1155,11 +1958,13 @@ def generate_qr_code_by_uuid(book_uuid):
             }), 404
         
         # Generate QR code
-        qr_code_data = qr_manager.generate_qr_code(book_uuid)
+        deterministic = request.args.get('deterministic', '').lower() in ('1', 'true', 'yes')
+        qr_code_data = qr_manager.generate_qr_code(book_uuid, deterministic=deterministic)
         
         return jsonify({
             'success': True,
             'qr_code': qr_code_data,
+            'image_url': url_for('get_qr_image', book_uuid=book_uuid, image_format='png'),
             'book': book.to_dict()
         })
         
@@ -1217,8 +2022,12 @@ def get_recent_transactions():
     try:
         limit = request.args.get('limit', 10, type=int)
         
-        # Get recent transactions (both checkout and checkin)
-        recent_transactions = Transaction.query.filter(
+        # Get recent transactions (both checkout and checkin) with their
+        # books and members loaded in the same query
+        recent_transactions = Transaction.query.options(
+            joinedload(Transaction.book),
+            joinedload(Transaction.member)
+        ).filter(
             Transaction.transaction_type == 'borrow'
         ).order_by(
             Transaction.transaction_date.desc()
@@ -1227,8 +2036,8 @@ def get_recent_transactions():
         transactions_data = []
         for trans in recent_transactions:
             # Get related data
-            book = Book.query.get(trans.book_id)
-            member = Member.query.get(trans.member_id)
+            book = trans.book
+            member = trans.member
             
             trans_dict = trans.to_dict()
             trans_dict['book'] = book.to_dict() if book else None
@@ -1238,7 +2047,7 @@ def get_recent_transactions():
             trans_dict['is_overdue'] = False
             trans_dict['is_completed'] = trans.status == 'completed'
             
-            if trans.status == 'active' and trans.due_date:
+            if trans.status in OPEN_LOAN_STATUSES and trans.due_date:
                 trans_dict['is_overdue'] = datetime.utcnow() > trans.due_date
                 trans_dict['days_until_due'] = (trans.due_date - datetime.utcnow()).days
             
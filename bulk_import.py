@@ -0,0 +1,283 @@
+"""
+Bulk ISBN import for onboarding large collections
+
+Rows come from a CSV file or a JSON list. Each row names an ISBN and may
+override the copy count, shelf location or the title and author. Import
+happens in two phases:
+
+1. Resolve metadata for ISBNs the library does not have yet, several at a
+   time through the ISBN cache and the scanner's rate-limited providers.
+2. Upsert the books in batches of ``BULK_IMPORT_BATCH_SIZE``, one
+   transaction per batch. Existing books gain copies, new books are created.
+   If a batch fails, its rows are retried one by one so a single bad row
+   only fails itself.
+
+Every row gets a result entry, so the caller can report exactly what
+happened to each line of the file.
+"""
+
+import csv
+import io
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime
+import isbnlib
+from flask import current_app
+from models import db, Book
+from stats import adjust_library_stats
+from isbn_cache import NOT_FOUND_SOURCES, UNCACHEABLE_SOURCES
+from utils import canonical_isbn
+
+RESULT_STATUSES = ['created', 'updated', 'not_found', 'lookup_failed', 'pending', 'invalid', 'error']
+
+# Optional CSV columns copied onto new books when present
+OVERRIDE_FIELDS = ['title', 'author', 'publisher', 'categories', 'description', 'language', 'location']
+
+def parse_import_csv(text):
+    """Parse import rows from CSV text
+
+    A header row with an ``isbn`` column allows the optional ``copies`` and
+    override columns. Without a header, the first column of each line is
+    read as the ISBN.
+    """
+    lines = [line for line in text.splitlines() if line.strip()]
+    if not lines:
+        return []
+
+    header = [name.strip().lower() for name in next(csv.reader([lines[0]]))]
+    if 'isbn' in header:
+        reader = csv.DictReader(io.StringIO('\n'.join(lines[1:])), fieldnames=header)
+        return [
+            {key: (value or '').strip() for key, value in row.items() if key}
+            for row in reader
+        ]
+
+    return [{'isbn': row[0].strip()} for row in csv.reader(lines) if row]
+
+def _prepare_row(number, raw):
+    """Validate one raw row, returning (row, None) or (None, error result)"""
+    if isinstance(raw, str):
+        raw = {'isbn': raw}
+    if not isinstance(raw, dict):
+        return None, {'row': number, 'isbn': None, 'status': 'invalid', 'message': 'Row must be an ISBN or an object'}
+
+    # Stored in the same form as POST /api/books, so either path finds books the other added
+    isbn = canonical_isbn(raw.get('isbn')) or ''
+    if not (isbnlib.is_isbn10(isbn) or isbnlib.is_isbn13(isbn)):
+        return None, {'row': number, 'isbn': raw.get('isbn'), 'status': 'invalid', 'message': 'Invalid ISBN format'}
+
+    try:
+        copies = int(raw.get('copies') or 1)
+    except (TypeError, ValueError):
+        copies = 0
+    if copies < 1:
+        return None, {'row': number, 'isbn': isbn, 'status': 'invalid', 'message': 'Copies must be a positive number'}
+
+    row = {'row': number, 'isbn': isbn, 'copies': copies}
+    for field in OVERRIDE_FIELDS:
+        if raw.get(field):
+            row[field] = raw[field]
+    return row, None
+
+def _existing_isbns(isbns, batch_size):
+    """Return the subset of ISBNs that are already in the catalogue"""
+    isbns = list(isbns)
+    existing = set()
+    for start in range(0, len(isbns), batch_size):
+        chunk = isbns[start:start + batch_size]
+        existing.update(isbn for (isbn,) in db.session.query(Book.isbn).filter(Book.isbn.in_(chunk)))
+    return existing
+
+def _resolve_metadata(isbns, scanner, cache, concurrency, lookup_deadline, time_budget, progress):
+    """Look up metadata for ISBNs concurrently, stopping at the time budget
+
+    Returns a dict of ISBN -> book info. ISBNs still unresolved when the time
+    budget runs out are missing from the dict. Lookups already running then
+    finish within their deadline and land in the cache for the next attempt;
+    lookups that have not started are cancelled.
+    """
+    app = current_app._get_current_object()
+
+    def lookup(isbn):
+        return scanner.get_book_info_by_isbn(isbn, deadline=lookup_deadline)
+
+    def resolve(isbn):
+        # The cache needs the database, so each thread has its own app context
+        with app.app_context():
+            return cache.get_book_info(isbn, lookup)
+
+    resolved = {}
+    if not isbns:
+        return resolved
+
+    ends_at = time.monotonic() + time_budget if time_budget else None
+    executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='bulk-import')
+    try:
+        futures = {executor.submit(resolve, isbn): isbn for isbn in isbns}
+        pending = set(futures)
+        while pending:
+            remaining = ends_at - time.monotonic() if ends_at else None
+            if remaining is not None and remaining <= 0:
+                break
+
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                isbn = futures[future]
+                try:
+                    resolved[isbn] = future.result()
+                except Exception as e:
+                    print(f"❌ Metadata lookup failed for {isbn}: {e}")
+                    resolved[isbn] = None
+            if progress:
+                progress(len(resolved), len(futures))
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    return resolved
+
+def _book_from_metadata(row, info):
+    """Build a new Book from looked-up metadata and the row's overrides"""
+    info = info or {}
+    categories = row.get('categories') or info.get('categories')
+    if isinstance(categories, list):
+        categories = ', '.join(categories)
+
+    book = Book(
+        isbn=row['isbn'],
+        title=row.get('title') or info.get('title'),
+        author=row.get('author') or info.get('author'),
+        publisher=row.get('publisher') or info.get('publisher'),
+        categories=categories or None,
+        description=row.get('description') or info.get('description'),
+        language=row.get('language') or info.get('language') or 'English',
+        pages=info.get('pages'),
+        thumbnail_url=info.get('cover_url'),
+        location=row.get('location'),
+        copies_total=row['copies'],
+        copies_available=row['copies']
+    )
+    book.update_normalized_fields()
+    return book
+
+def _apply_rows(rows, metadata):
+    """Stage the given rows in the current session and return (results, stats deltas)"""
+    books = {
+        book.isbn: book
+        for book in Book.query.filter(Book.isbn.in_({row['isbn'] for row in rows}))
+    }
+    results = []
+    deltas = {'total_books': 0, 'total_copies': 0, 'available_copies': 0}
+
+    for row in rows:
+        result = {'row': row['row'], 'isbn': row['isbn']}
+        book = books.get(row['isbn'])
+
+        if book is not None:
+            book.copies_total += row['copies']
+            book.copies_available += row['copies']
+            book.last_updated = datetime.utcnow()
+            if row.get('location') and not book.location:
+                book.location = row['location']
+            result.update(status='updated', book=book, message=f"Added {row['copies']} copies")
+        else:
+            info = metadata.get(row['isbn'])
+            source = info.get('source') if info else None
+            found = info is not None and source not in NOT_FOUND_SOURCES + UNCACHEABLE_SOURCES
+
+            if not found and not (row.get('title') and row.get('author')):
+                if source in NOT_FOUND_SOURCES:
+                    result.update(status='not_found', message='No provider knows this ISBN; add title and author to import it')
+                else:
+                    result.update(status='lookup_failed', message='Metadata lookup failed; retry the row later')
+                results.append(result)
+                continue
+
+            book = _book_from_metadata(row, info if found else None)
+            db.session.add(book)
+            books[book.isbn] = book
+            deltas['total_books'] += 1
+            result.update(status='created', book=book, message='New book added')
+
+        deltas['total_copies'] += row['copies']
+        deltas['available_copies'] += row['copies']
+        results.append(result)
+
+    return results, deltas
+
+def _commit_rows(rows, metadata):
+    """Write rows in one transaction, returning their results"""
+    results, deltas = _apply_rows(rows, metadata)
+    adjust_library_stats(**deltas)
+    db.session.commit()
+
+    # Ids are only assigned on flush, so results refer to books once committed
+    for result in results:
+        book = result.pop('book', None)
+        if book is not None:
+            result['book_id'] = book.id
+    return results
+
+def _write_batch(rows, metadata):
+    """Write a batch in one transaction, retrying row by row if it fails"""
+    try:
+        return _commit_rows(rows, metadata)
+    except Exception as e:
+        db.session.rollback()
+        print(f"⚠️  Batch of {len(rows)} rows failed ({e}), retrying rows individually")
+
+    results = []
+    for row in rows:
+        try:
+            results.extend(_commit_rows([row], metadata))
+        except Exception as e:
+            db.session.rollback()
+            results.append({'row': row['row'], 'isbn': row['isbn'], 'status': 'error', 'message': str(e)})
+    return results
+
+def import_books(raw_rows, scanner, cache, concurrency=None, batch_size=None,
+                 lookup_deadline=None, time_budget=None, progress=None):
+    """Import books from raw rows (ISBN strings or dicts) and report per-row results
+
+    ``time_budget`` bounds the metadata phase in seconds; rows whose ISBN is
+    not resolved in time are reported as ``pending`` and can be resubmitted.
+    Must be called inside an application context.
+    """
+    config = current_app.config
+    concurrency = concurrency or config['BULK_IMPORT_CONCURRENCY']
+    batch_size = batch_size or config['BULK_IMPORT_BATCH_SIZE']
+    lookup_deadline = lookup_deadline or config['BULK_IMPORT_LOOKUP_DEADLINE']
+
+    results = []
+    rows = []
+    for number, raw in enumerate(raw_rows, start=1):
+        row, error = _prepare_row(number, raw)
+        if error:
+            results.append(error)
+        else:
+            rows.append(row)
+
+    # Only ISBNs missing from the catalogue need metadata
+    existing = _existing_isbns({row['isbn'] for row in rows}, batch_size)
+    to_resolve = list(dict.fromkeys(row['isbn'] for row in rows if row['isbn'] not in existing))
+    metadata = _resolve_metadata(to_resolve, scanner, cache, concurrency, lookup_deadline, time_budget, progress)
+
+    ready = []
+    for row in rows:
+        if row['isbn'] in existing or row['isbn'] in metadata:
+            ready.append(row)
+        else:
+            results.append({
+                'row': row['row'], 'isbn': row['isbn'], 'status': 'pending',
+                'message': 'Metadata not resolved within the time limit; resubmit this row'
+            })
+
+    for start in range(0, len(ready), batch_size):
+        results.extend(_write_batch(ready[start:start + batch_size], metadata))
+
+    results.sort(key=lambda result: result['row'])
+    summary = {status: 0 for status in RESULT_STATUSES}
+    for result in results:
+        summary[result['status']] += 1
+    summary['total'] = len(results)
+
+    return {'summary': summary, 'results': results}
@@ -0,0 +1,106 @@
+"""
+Normalized book categories
+
+``Book.categories`` stays the comma-separated text that the API and the book
+forms read and write, but filtering on it meant a substring scan that also
+matched "Science" inside "Science Fiction". Each category now has a row in
+``categories`` and each book is linked to its categories through
+``book_categories``:
+
+- Whenever a book's ``categories`` text changes, the flush splits it, creates
+  any new categories and replaces the book's links, however the book is
+  written. New names are inserted with ``ON CONFLICT DO NOTHING``, so workers
+  filing books under the same new category at once do not collide.
+- ``category_filter`` restricts a book query to one category through the
+  ``(category_id, book_id)`` index, for ``/api/books?category=``.
+- ``category_facets`` counts books per category for ``/api/categories``.
+
+Categories are matched case-insensitively and with whitespace collapsed;
+the first spelling seen is the one displayed. ``scripts/migrate_add_categories.py``
+links the books that existed before the tables did.
+"""
+
+from sqlalchemy import event, inspect, insert, select, func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from models import db, Book, Category, book_categories
+
+NAME_LENGTH = Category.__table__.c.name.type.length
+
+def split_categories(text):
+    """Category names in a comma-separated string, without blanks or repeats"""
+    names = {}
+    for part in (text or '').split(','):
+        name = ' '.join(part.split())[:NAME_LENGTH]
+        if name:
+            names.setdefault(category_key(name), name)
+    return list(names.values())
+
+def category_key(name):
+    """The key a category name is matched on"""
+    return ' '.join(name.split()).casefold()[:NAME_LENGTH]
+
+def _insert_missing_categories(session, names):
+    """Insert categories for ``names`` that do not exist yet, ignoring ones other writers add first"""
+    rows = [{'name': name, 'key': category_key(name)} for name in names]
+    dialect = session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        statement = postgresql.insert(Category.__table__).on_conflict_do_nothing(index_elements=['key'])
+    elif dialect == 'sqlite':
+        statement = sqlite.insert(Category.__table__).on_conflict_do_nothing(index_elements=['key'])
+    else:
+        statement = insert(Category.__table__)
+    session.execute(statement, rows)
+
+def link_categories(session, books):
+    """Point each book's ``category_set`` at the categories named in its ``categories`` text"""
+    names = {book: split_categories(book.categories) for book in books}
+    wanted = {}
+    for book_names in names.values():
+        for name in book_names:
+            wanted.setdefault(category_key(name), name)
+
+    with session.no_autoflush:
+        categories = {}
+        if wanted:
+            lookup = select(Category).where(Category.key.in_(list(wanted)))
+            categories = {category.key: category for category in session.scalars(lookup)}
+            missing = [name for key, name in wanted.items() if key not in categories]
+            if missing:
+                _insert_missing_categories(session, missing)
+                categories = {category.key: category for category in session.scalars(lookup)}
+
+        for book, book_names in names.items():
+            book.category_set = {categories[category_key(name)] for name in book_names}
+
+@event.listens_for(Session, 'before_flush')
+def _sync_book_categories(session, flush_context, instances):
+    books = [
+        instance for instance in list(session.new) + list(session.dirty)
+        if isinstance(instance, Book) and inspect(instance).attrs.categories.history.has_changes()
+    ]
+    if books:
+        link_categories(session, books)
+
+def category_filter(name):
+    """Filter for books filed under the category ``name``"""
+    return Book.id.in_(
+        select(book_categories.c.book_id)
+        .join(Category, Category.id == book_categories.c.category_id)
+        .where(Category.key == category_key(name))
+    )
+
+def category_facets(status=None, limit=None):
+    """(name, book count) of every category in use, most books first"""
+    count = func.count().label('count')
+    query = (
+        select(Category.name, count)
+        .join(book_categories, book_categories.c.category_id == Category.id)
+        .group_by(Category.id, Category.name)
+        .order_by(count.desc(), Category.name)
+    )
+    if status:
+        query = query.join(Book, Book.id == book_categories.c.book_id).where(Book.status == status)
+    if limit:
+        query = query.limit(limit)
+    return db.session.execute(query).all()
@@ -0,0 +1,354 @@
+"""
+Atomic checkout and checkin
+
+Availability and loan limits used to be checked in Python and written back
+afterwards, so two requests racing for the last copy could both succeed and
+leave ``copies_available`` negative. Every change here is a conditional
+UPDATE whose WHERE clause carries the check (``copies_available > 0``,
+``status IN ('active', 'overdue')``), so the database decides which request wins:
+
+- A checkout first takes a copy with a conditional UPDATE. Being the first
+  write, it also takes the book's row lock on PostgreSQL and the database
+  write lock on SQLite before anything else is read.
+- The member's ``active_loans`` counter is then incremented with
+  ``WHERE active_loans < max_books``, so two checkouts for one member cannot
+  both pass the borrowing limit and no transactions are counted.
+- A checkin closes the loan only while it is open, so a loan is only ever
+  returned once, and decrements the member's counter and adds the fines to
+  the member's ``fines_outstanding`` in the same transaction. Fines already
+  accrued by the overdue sweep (see overdue.py) are not added twice.
+
+``checkout_books`` and ``checkin_books`` handle a member's whole stack of
+books in one transaction: the loans are found with one query, the member is
+locked and checked once, and every item gets its own outcome.
+
+``reconcile_member_counters`` recomputes the member counters from the
+transactions table and reports any drift (``scripts/reconcile_member_counters.py``).
+
+The functions work inside the caller's transaction and raise
+``CirculationError`` when a check fails; the caller rolls back (which puts a
+taken copy back) or commits.
+"""
+
+from sqlalchemy import select, update, case, func, or_
+from models import db, Book, Member, Transaction, OPEN_LOAN_STATUSES
+from stats import adjust_library_stats, release_overdue_loan
+
+# Book statuses that never allow a checkout, with the reason given to staff
+UNAVAILABLE_STATUSES = {
+    'unavailable': 'This book is temporarily unavailable for checkout',
+    'damaged': 'This book is damaged and cannot be checked out',
+    'lost': 'This book is marked as lost and cannot be checked out',
+    'maintenance': 'This book is under maintenance and cannot be checked out',
+    'archived': 'This book is archived and cannot be checked out'
+}
+
+class CirculationError(Exception):
+    """A checkout or checkin that cannot go ahead, with the HTTP status to answer with"""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+def take_copy(book_id):
+    """Decrement a book's available copies if one is free and its status allows checkout"""
+    taken = db.session.execute(
+        update(Book)
+        .where(
+            Book.id == book_id,
+            Book.copies_available > 0,
+            Book.status.notin_(list(UNAVAILABLE_STATUSES))
+        )
+        .values(
+            copies_available=Book.copies_available - 1,
+            # SET expressions see the row before the update
+            status=case((Book.copies_available == 1, 'borrowed'), else_=Book.status)
+        )
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if taken:
+        return
+
+    book = db.session.execute(
+        select(Book.copies_available, Book.status).where(Book.id == book_id)
+    ).first()
+    if book is None:
+        raise CirculationError('Book not found', 404)
+    if book.copies_available <= 0:
+        raise CirculationError('No copies available for checkout')
+    raise CirculationError(UNAVAILABLE_STATUSES.get(book.status, f'Book status "{book.status}" does not allow checkout'))
+
+def put_back_copy(book_id):
+    """Undo ``take_copy`` within the same transaction"""
+    db.session.execute(
+        update(Book)
+        .where(Book.id == book_id)
+        .values(
+            copies_available=Book.copies_available + 1,
+            status=case((Book.status == 'borrowed', 'available'), else_=Book.status)
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+def remaining_loans(member_id):
+    """Lock the member row and return how many more books the member may borrow"""
+    member = db.session.execute(
+        select(Member.max_books, Member.active_loans).where(Member.id == member_id).with_for_update()
+    ).first()
+    if member is None:
+        raise CirculationError('Member not found', 404)
+    return max(0, member.max_books - member.active_loans), member.max_books
+
+def adjust_member_counters(member_id, loans=0, fines=0.0):
+    """Apply loan and fine deltas to a member's counters as part of the current transaction"""
+    values = {}
+    if loans:
+        # Floored at zero so a counter that has drifted cannot lift the limit
+        values['active_loans'] = case(
+            (Member.active_loans + loans > 0, Member.active_loans + loans), else_=0
+        )
+    if fines:
+        values['fines_outstanding'] = Member.fines_outstanding + fines
+    if not values:
+        return
+    db.session.execute(
+        update(Member)
+        .where(Member.id == member_id)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+
+def check_loan_limit(member_id):
+    """Count a new loan against the member's borrowing limit, if it is not reached"""
+    counted = db.session.execute(
+        update(Member)
+        .where(Member.id == member_id, Member.active_loans < Member.max_books)
+        .values(active_loans=Member.active_loans + 1)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if counted:
+        return
+
+    max_books = db.session.execute(select(Member.max_books).where(Member.id == member_id)).scalar()
+    if max_books is None:
+        raise CirculationError('Member not found', 404)
+    raise CirculationError(f'Member has reached maximum borrowing limit ({max_books} books)')
+
+def checkout_copy(book_id, member_id, due_date, enforce_limit=True):
+    """Lend one copy of a book to a member as part of the current transaction
+
+    Returns the new loan. Raises CirculationError if no copy is free, the
+    book's status forbids checkout or the member is at their limit.
+    """
+    take_copy(book_id)
+    if enforce_limit:
+        check_loan_limit(member_id)
+    else:
+        adjust_member_counters(member_id, loans=1)
+
+    transaction = Transaction(
+        book_id=book_id,
+        member_id=member_id,
+        transaction_type='borrow',
+        due_date=due_date,
+        status='active'
+    )
+    db.session.add(transaction)
+    adjust_library_stats(available_copies=-1)
+    db.session.flush()
+    return transaction
+
+def checkin_copy(transaction, return_date, fine_amount=0.0, condition='good', condition_notes='', condition_fee=0.0):
+    """Close a loan and put the copy back as part of the current transaction
+
+    Damaged copies are not made available again and lost copies leave the
+    collection. Raises CirculationError if the loan was already returned.
+    """
+    closed = db.session.execute(
+        update(Transaction)
+        .where(Transaction.id == transaction.id, Transaction.status.in_(OPEN_LOAN_STATUSES))
+        .values(
+            status='completed',
+            return_date=return_date,
+            condition_fee=condition_fee,
+            return_condition=condition,
+            condition_notes=condition_notes
+        )
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if not closed:
+        raise CirculationError('This loan has already been returned', 409)
+
+    # Read once the loan is closed, so the overdue sweep can no longer change it
+    accrued = db.session.execute(
+        select(Transaction.fine_amount).where(Transaction.id == transaction.id)
+    ).scalar()
+    if fine_amount != accrued:
+        db.session.execute(
+            update(Transaction)
+            .where(Transaction.id == transaction.id)
+            .values(fine_amount=fine_amount)
+            .execution_options(synchronize_session=False)
+        )
+    new_fines = fine_amount - accrued + condition_fee
+
+    available_delta = 1 if condition in ['good', 'fair'] else 0
+    total_delta = -1 if condition == 'lost' else 0
+    values = {
+        'copies_available': Book.copies_available + available_delta,
+        'copies_total': Book.copies_total + total_delta
+    }
+    if available_delta:
+        values['status'] = 'available'
+    db.session.execute(
+        update(Book)
+        .where(Book.id == transaction.book_id)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+
+    adjust_member_counters(transaction.member_id, loans=-1, fines=new_fines)
+    adjust_library_stats(
+        total_copies=total_delta,
+        available_copies=available_delta,
+        fines_outstanding=new_fines
+    )
+    release_overdue_loan(transaction.due_date)
+
+def checkout_books(book_ids, member_id, due_date):
+    """Lend several books to a member as part of the current transaction
+
+    Returns (loans, failures): the new loan for each book lent, and a
+    CirculationError for each book that was not, both keyed by book id.
+    Books are taken in the given order until the member's limit is reached.
+    """
+    failures = {}
+    taken = []
+    for book_id in book_ids:
+        try:
+            take_copy(book_id)
+            taken.append(book_id)
+        except CirculationError as e:
+            failures[book_id] = e
+
+    loans = {}
+    if not taken:
+        return loans, failures
+
+    # Checked once the copies are held, with the member locked until commit
+    remaining, max_books = remaining_loans(member_id)
+    for book_id in taken[remaining:]:
+        put_back_copy(book_id)
+        failures[book_id] = CirculationError(f'Member has reached maximum borrowing limit ({max_books} books)')
+
+    for book_id in taken[:remaining]:
+        loans[book_id] = Transaction(
+            book_id=book_id,
+            member_id=member_id,
+            transaction_type='borrow',
+            due_date=due_date,
+            status='active'
+        )
+    db.session.add_all(loans.values())
+    adjust_member_counters(member_id, loans=len(loans))
+    adjust_library_stats(available_copies=-len(loans))
+    db.session.flush()
+    return loans, failures
+
+def checkin_books(book_ids, member_id, return_date, fine_for):
+    """Return several of a member's loans as part of the current transaction
+
+    ``fine_for(due_date, return_date)`` computes the overdue fine. Returns
+    (loans, failures) keyed by book id, like ``checkout_books``.
+    """
+    # The member's oldest active loan of each book, in one query
+    active = db.session.execute(
+        select(Transaction)
+        .where(
+            Transaction.book_id.in_(book_ids),
+            Transaction.member_id == member_id,
+            Transaction.transaction_type == 'borrow',
+            Transaction.status.in_(OPEN_LOAN_STATUSES)
+        )
+        .order_by(Transaction.transaction_date.desc(), Transaction.id.desc())
+    ).scalars().all()
+    loans_by_book = {loan.book_id: loan for loan in active}
+
+    loans = {}
+    failures = {}
+    for book_id in book_ids:
+        loan = loans_by_book.get(book_id)
+        if loan is None:
+            failures[book_id] = CirculationError('No active checkout found for this book and member', 404)
+            continue
+        try:
+            checkin_copy(loan, return_date, fine_amount=fine_for(loan.due_date, return_date))
+            loans[book_id] = loan
+        except CirculationError as e:
+            failures[book_id] = e
+    return loans, failures
+
+def _member_counter_columns():
+    """Correlated subqueries computing a member's counters from the transactions table"""
+    active_loans = (
+        select(func.count(Transaction.id))
+        .where(
+            Transaction.member_id == Member.id,
+            Transaction.transaction_type == 'borrow',
+            Transaction.status.in_(OPEN_LOAN_STATUSES)
+        )
+        .scalar_subquery()
+    )
+    fines_outstanding = (
+        select(func.coalesce(func.sum(Transaction.fine_amount + Transaction.condition_fee), 0.0))
+        .where(Transaction.member_id == Member.id)
+        .scalar_subquery()
+    )
+    return active_loans, fines_outstanding
+
+def reconcile_member_counters():
+    """Rebuild drifted member counters from the transactions table
+
+    Returns {library card number: {counter: {'stored', 'actual'}}} for every
+    member whose counters were corrected.
+    """
+    active_loans, fines_outstanding = _member_counter_columns()
+    drifted = db.session.execute(
+        select(Member.id, Member.member_id, Member.active_loans, Member.fines_outstanding)
+        .where(or_(
+            Member.active_loans != active_loans,
+            func.abs(Member.fines_outstanding - fines_outstanding) >= 0.005
+        ))
+        .order_by(Member.id)
+    ).all()
+
+    drift = {}
+    for chunk in [drifted[i:i + 500] for i in range(0, len(drifted), 500)]:
+        member_ids = [member.id for member in chunk]
+        # Lock the members first on PostgreSQL, so loans in flight have committed
+        # before the recount; the recount is a single statement, so no loan can
+        # land between counting and storing
+        db.session.execute(select(Member.id).where(Member.id.in_(member_ids)).with_for_update())
+        db.session.execute(
+            update(Member)
+            .where(Member.id.in_(member_ids))
+            .values(active_loans=active_loans, fines_outstanding=fines_outstanding)
+            .execution_options(synchronize_session=False)
+        )
+        actual = {
+            member.id: member for member in db.session.execute(
+                select(Member.id, Member.active_loans, Member.fines_outstanding)
+                .where(Member.id.in_(member_ids))
+            )
+        }
+        for member in chunk:
+            changes = {}
+            for name in ('active_loans', 'fines_outstanding'):
+                stored, recounted = getattr(member, name), getattr(actual[member.id], name)
+                if round(stored - recounted, 2) != 0:
+                    changes[name] = {'stored': stored, 'actual': round(recounted, 2)}
+            if changes:
+                drift[member.member_id] = changes
+    db.session.commit()
+    return drift
@@ -15,13 +15,81 @@ class Config:
     DEFAULT_LOAN_PERIOD = 14  # days
     FINE_PER_DAY = 1.0  # dollars
     MAX_BOOKS_PER_MEMBER = 5
+    OVERDUE_SWEEP_INTERVAL = int(os.environ.get('OVERDUE_SWEEP_INTERVAL', 0)) or None  # seconds between overdue sweeps run by main.py; unset to sweep from cron with scripts/sweep_overdue.py
+    
+    # Dashboard statistics settings
+    STATS_RECONCILE_INTERVAL = 300  # seconds between full recounts of the dashboard counters
+    
+    # Pagination settings
+    DEFAULT_PAGE_SIZE = 50  # rows per page for cursor pagination
+    MAX_PAGE_SIZE = 1000
+    EXPORT_BATCH_SIZE = 1000  # rows fetched per round trip by streaming exports
+    
+    # Response settings (see http_cache.py)
+    COMPRESS_MIN_SIZE = 1024  # bytes; smaller JSON responses are sent uncompressed
+    COMPRESS_LEVEL = 6  # gzip level, 1 (fastest) to 9 (smallest)
+    COMPRESS_BROTLI_QUALITY = 5  # Brotli quality when the brotli package is installed, 0 to 11
+    JSON_ENCODER = os.environ.get('JSON_ENCODER', 'auto')  # auto (orjson when installed), orjson or stdlib; see serialization.py
+    
+    # Search settings
+    FUZZY_SEARCH_THRESHOLD = 0.3  # minimum trigram word similarity for fuzzy matches
+    FUZZY_SEARCH_MAX_RESULTS = 1000  # ranked candidates considered by the in-process index
     
     # QR Code settings
     QR_CODE_SIZE = 10
     QR_CODE_BORDER = 4
+    QR_IMAGE_CACHE_SIZE = 2048  # rendered QR images kept in memory per worker
+    QR_IMAGE_MAX_AGE = 86400  # seconds browsers and the CDN may reuse a QR image before revalidating
+    SCAN_MAX_DIMENSION = 1280  # longest side, in pixels, of the first (downscaled) scan pass
+    SCAN_BATCH_MAX_IMAGES = 100  # images per batch scan request
+    SCAN_BATCH_MAX_BYTES = 64 * 1024 * 1024  # uncompressed images accepted from one ZIP upload
+    SCAN_PROCESSES = None  # scan processes per batch; defaults to the CPU count
+    AUDIT_MAX_CODES_PER_REQUEST = 5000  # scanned codes accepted per inventory audit request
+    CIRCULATION_BATCH_MAX_BOOKS = 50  # books per batch checkout or checkin request
+    
+    # Label sheet settings (see labels.py)
+    LABEL_PAGE_SIZE = 'a4'  # a4 or letter
+    LABEL_DPI = 300
+    LABEL_COLUMNS = 3
+    LABEL_ROWS = 7
+    LABEL_MARGIN_MM = 8
+    LABEL_FONT_PATH = os.environ.get('LABEL_FONT_PATH')  # TrueType font for titles; Pillow's default font if unset
+    LABEL_PROCESSES = None  # render processes per run; defaults to the CPU count
+    LABEL_MAX_BOOKS = 2000  # books per HTTP request; larger runs go through the CLI
     
     # ISBN API settings
     ISBN_SERVICES = ['goob', 'openl', 'worldcat']
+    ISBN_LOOKUP_DEADLINE = 8  # seconds to wait for providers before answering with what has arrived
+    ISBN_LOOKUP_WORKERS = 16  # threads shared by concurrent provider requests
+    ISBN_PROVIDER_RATE_LIMITS = {  # requests per second to each metadata provider
+        'goob': 5,
+        'openl': 5,
+        'worldcat': 2,
+        'default': 5,
+        'cover': 5,
+        'google_books': 5,
+        'open_library': 5
+    }
+    
+    # Bulk import settings
+    BULK_IMPORT_MAX_ROWS = 500  # rows accepted by POST /api/books/bulk; larger files go through the CLI
+    BULK_IMPORT_TIME_BUDGET = 20  # seconds POST /api/books/bulk spends resolving metadata, below the gunicorn timeout
+    BULK_IMPORT_CONCURRENCY = 4  # ISBNs resolved at the same time
+    BULK_IMPORT_BATCH_SIZE = 100  # books written per transaction
+    BULK_IMPORT_LOOKUP_DEADLINE = 15  # seconds per ISBN lookup during an import; shorter than BULK_IMPORT_TIME_BUDGET
+    
+    # Background job settings (see jobs.py)
+    JOB_POLL_INTERVAL = 2  # seconds an idle worker waits before checking the queue again
+    JOB_MAX_ATTEMPTS = 3
+    JOB_RETRY_DELAY = 30  # seconds before the first retry, doubling on each attempt
+    JOB_STALE_TIMEOUT = 3600  # seconds after which a running job is assumed abandoned by its worker
+    JOB_RETENTION_DAYS = 7  # finished jobs are deleted after this many days
+    
+    # ISBN metadata cache settings
+    ISBN_CACHE_TTL = 30 * 24 * 3600  # seconds to keep metadata found by a provider
+    ISBN_CACHE_NEGATIVE_TTL = 24 * 3600  # seconds to remember ISBNs no provider knows
+    ISBN_CACHE_MAX_ENTRIES = 50000  # shared cache size before least recently used entries are evicted
+    ISBN_CACHE_LOCAL_SIZE = 1000  # per-worker in-memory entries
     
 class DevelopmentConfig(Config):
     """Development configuration"""
@@ -0,0 +1,134 @@
+"""
+Conditional GET and compression for JSON responses
+
+Branch libraries poll the book and member listings over a slow tunnel, so
+unchanged listings are answered with ``304 Not Modified`` and the rest are
+compressed:
+
+- Every transaction that writes a versioned table (``books``, ``members``)
+  bumps that table's counter in ``table_versions`` just before it commits,
+  whether it went through the unit of work or a bulk ``UPDATE``. The bump is
+  the transaction's last statement, so the counter rows are never locked
+  before another row and cannot take part in a deadlock.
+- ``versioned_etag`` derives a listing's weak ETag from those counters and
+  the query string with a single primary-key read, and answers a matching
+  ``If-None-Match`` before the listing is queried or serialized.
+- ``compress_response`` gzips JSON bodies of at least ``COMPRESS_MIN_SIZE``
+  bytes, or uses Brotli when the ``brotli`` package is installed and the
+  client accepts it.
+
+Writes that bypass the session (raw SQL in migration scripts) do not bump
+the counters; clients then see fresh data once anything else changes.
+"""
+
+import gzip
+import hashlib
+from functools import wraps
+from flask import current_app, request
+from sqlalchemy import event, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from models import db, TableVersion
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+VERSIONED_TABLES = ('books', 'members')
+
+def _changed_tables(session):
+    return session.info.setdefault('changed_tables', set())
+
+@event.listens_for(Session, 'do_orm_execute')
+def _track_bulk_writes(orm_execute_state):
+    if orm_execute_state.is_update or orm_execute_state.is_insert or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.statement, 'table', None)
+        if table is not None and table.name in VERSIONED_TABLES:
+            _changed_tables(orm_execute_state.session).add(table.name)
+
+@event.listens_for(Session, 'after_flush')
+def _track_flushed_writes(session, flush_context):
+    for instance in list(session.new) + list(session.dirty) + list(session.deleted):
+        table_name = getattr(instance, '__tablename__', None)
+        if table_name in VERSIONED_TABLES:
+            _changed_tables(session).add(table_name)
+
+@event.listens_for(Session, 'before_commit')
+def _bump_table_versions(session):
+    # Pending objects are flushed first, so their tables are known
+    session.flush()
+    changed = session.info.pop('changed_tables', None)
+    for table_name in sorted(changed or ()):
+        session.execute(
+            update(TableVersion)
+            .where(TableVersion.name == table_name)
+            .values(version=TableVersion.version + 1)
+            .execution_options(synchronize_session=False)
+        )
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_changed_tables(session):
+    session.info.pop('changed_tables', None)
+
+def table_versions(*table_names):
+    """Current (version, created_at) of each table, creating missing counters"""
+    rows = {
+        row.name: row for row in db.session.execute(
+            select(TableVersion.name, TableVersion.version, TableVersion.created_at)
+            .where(TableVersion.name.in_(table_names))
+        )
+    }
+    missing = [name for name in table_names if name not in rows]
+    if missing:
+        try:
+            db.session.add_all(TableVersion(name=name) for name in missing)
+            db.session.commit()
+        except IntegrityError:
+            # Another worker created them at the same time
+            db.session.rollback()
+        return table_versions(*table_names)
+    return [(rows[name].version, rows[name].created_at) for name in table_names]
+
+def versioned_etag(*table_names):
+    """Answer GETs of a view that only reads ``table_names`` with 304 while those tables are unchanged"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            versions = table_versions(*table_names)
+            key = f"{request.path}?{sorted(request.args.items(multi=True))}:{versions}"
+            etag = hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+            if request.if_none_match.contains_weak(etag):
+                response = current_app.response_class(status=304)
+            else:
+                response = current_app.make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag, weak=True)
+            # Cached copies may be reused, but only after revalidating them
+            response.cache_control.no_cache = True
+            return response
+        return wrapper
+    return decorator
+
+def compress_response(response):
+    """Compress a large JSON response for clients that accept gzip or Brotli"""
+    if response.mimetype != 'application/json' or response.direct_passthrough or response.is_streamed:
+        return response
+    response.vary.add('Accept-Encoding')
+    if response.status_code < 200 or response.status_code in (204, 206, 304) or 'Content-Encoding' in response.headers:
+        return response
+
+    data = response.get_data()
+    if len(data) < current_app.config['COMPRESS_MIN_SIZE']:
+        return response
+
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        response.set_data(brotli.compress(data, quality=current_app.config['COMPRESS_BROTLI_QUALITY']))
+        response.headers['Content-Encoding'] = 'br'
+    elif accepted['gzip']:
+        response.set_data(gzip.compress(data, compresslevel=current_app.config['COMPRESS_LEVEL']))
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
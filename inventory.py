@@ -0,0 +1,285 @@
+"""
+Shelf inventory audits
+
+An audit compares what is physically on a shelf with what the catalogue
+says. Starting an audit copies the books shelved at a location (a prefix of
+``Book.location``, as for label sheets) into ``inventory_audit_items``, an
+indexed snapshot that later catalogue changes do not disturb. Scanned codes
+(book UUIDs, QR label payloads or ISBNs) are appended to
+``inventory_audit_scans`` in bulk, one INSERT per request however many codes
+it carries, so a session can take tens of thousands of scans without a
+query per scan.
+
+The diff is computed with set operations over the snapshot and the distinct
+scanned codes; only codes that are not in the snapshot go back to the
+``books`` table, in chunked ``IN (...)`` queries:
+
+- ``missing``: expected on the shelf (copies available) but never scanned
+- ``misplaced``: scanned here but catalogued at another location
+- ``unexpected``: scanned codes that match no book
+- ``checked_out_but_present``: scanned here although every copy is on loan
+"""
+
+import json
+import uuid as uuid_module
+from datetime import datetime
+import isbnlib
+from sqlalchemy import select, insert, update, func
+from models import db, Book, InventoryAudit, InventoryAuditItem, InventoryAuditScan
+
+# Values per IN (...) query, well under SQLite's bound parameter limit
+LOOKUP_CHUNK_SIZE = 500
+SNAPSHOT_BATCH_SIZE = 1000
+
+def isbn_key(isbn):
+    """ISBN-13 digits for an ISBN written in any form, or None if it is not an ISBN"""
+    if not isbn:
+        return None
+    clean = isbnlib.canonical(isbnlib.clean(str(isbn)))
+    if isbnlib.is_isbn13(clean):
+        return clean
+    if isbnlib.is_isbn10(clean):
+        return isbnlib.to_isbn13(clean)
+    return None
+
+def normalize_scan_code(code):
+    """Classify a scanned code as ('uuid', uuid) or ('isbn', isbn13), or None if it is neither
+
+    Accepts book UUIDs, the JSON payload of a book QR label and ISBNs with
+    or without hyphens.
+    """
+    text = str(code or '').strip()
+    if text.startswith('{'):
+        try:
+            data = json.loads(text)
+        except ValueError:
+            return None
+        if not (isinstance(data, dict) and data.get('type') == 'library_book' and data.get('uuid')):
+            return None
+        text = str(data['uuid'])
+
+    try:
+        return 'uuid', str(uuid_module.UUID(text))
+    except ValueError:
+        pass
+
+    key = isbn_key(text)
+    return ('isbn', key) if key else None
+
+def _chunks(values, size=LOOKUP_CHUNK_SIZE):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+def start_audit(location):
+    """Open an audit of a shelf location and snapshot the books expected there"""
+    audit = InventoryAudit(location=location)
+    db.session.add(audit)
+    db.session.flush()
+
+    books = db.session.execute(
+        select(
+            Book.id, Book.uuid, Book.isbn, Book.title, Book.author,
+            Book.location, Book.copies_total, Book.copies_available
+        ).where(Book.location.startswith(location, autoescape=True))
+    ).all()
+
+    items = [{
+        'audit_id': audit.id,
+        'book_id': book.id,
+        'uuid': book.uuid,
+        'isbn_key': isbn_key(book.isbn),
+        'title': book.title,
+        'author': book.author,
+        'location': book.location,
+        'copies_total': book.copies_total,
+        'copies_available': book.copies_available
+    } for book in books]
+    for batch in _chunks(items, SNAPSHOT_BATCH_SIZE):
+        db.session.execute(insert(InventoryAuditItem), batch)
+
+    audit.expected_books = len(items)
+    db.session.commit()
+    return audit
+
+def record_scans(audit_id, codes):
+    """Append scanned codes to an open audit
+
+    Returns (accepted, invalid codes). Raises ValueError if the audit is not
+    open, so scans cannot slip into an audit that was just closed.
+    """
+    scans = []
+    invalid = []
+    for code in codes:
+        normalized = normalize_scan_code(code)
+        if normalized is None:
+            invalid.append(code)
+        else:
+            scans.append(normalized)
+
+    # Counting the scans only succeeds while the audit is still open
+    opened = db.session.execute(
+        update(InventoryAudit)
+        .where(InventoryAudit.id == audit_id, InventoryAudit.status == 'open')
+        .values(scan_count=InventoryAudit.scan_count + len(scans))
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if not opened:
+        db.session.rollback()
+        raise ValueError('Audit is not open')
+
+    if scans:
+        now = datetime.utcnow()
+        db.session.execute(insert(InventoryAuditScan), [
+            {'audit_id': audit_id, 'code_type': code_type, 'code': code, 'scanned_at': now}
+            for code_type, code in scans
+        ])
+    db.session.commit()
+    return len(scans), invalid
+
+def _snapshot_entry(item, scans=None):
+    entry = {
+        'book_id': item.book_id,
+        'uuid': item.uuid,
+        'title': item.title,
+        'author': item.author,
+        'location': item.location,
+        'copies_total': item.copies_total,
+        'copies_available': item.copies_available
+    }
+    if scans is not None:
+        entry['scans'] = scans
+    return entry
+
+def _isbn_variants(key):
+    """The ways an ISBN-13 may have been stored in ``Book.isbn``"""
+    variants = {key, isbnlib.mask(key)}
+    isbn10 = isbnlib.to_isbn10(key)
+    if isbn10:
+        variants.update([isbn10, isbnlib.mask(isbn10)])
+    return {variant for variant in variants if variant}
+
+def _resolve_outside_codes(codes):
+    """Find the catalogued books for scanned codes that are not in the snapshot
+
+    Returns {(code_type, code): book row}.
+    """
+    columns = (
+        Book.id, Book.uuid, Book.isbn, Book.title, Book.author,
+        Book.location, Book.copies_total, Book.copies_available
+    )
+    found = {}
+
+    uuids = [code for code_type, code in codes if code_type == 'uuid']
+    for chunk in _chunks(uuids):
+        for book in db.session.execute(select(*columns).where(Book.uuid.in_(chunk))):
+            found[('uuid', book.uuid)] = book
+
+    variants = {}
+    for code_type, code in codes:
+        if code_type == 'isbn':
+            for variant in _isbn_variants(code):
+                variants[variant] = code
+    for chunk in _chunks(variants):
+        for book in db.session.execute(select(*columns).where(Book.isbn.in_(chunk))):
+            found[('isbn', variants[book.isbn])] = book
+
+    return found
+
+def audit_diff(audit):
+    """Compare an audit's scans with its snapshot of the shelf"""
+    snapshot = db.session.execute(
+        select(InventoryAuditItem).where(InventoryAuditItem.audit_id == audit.id)
+    ).scalars().all()
+    items = {item.book_id: item for item in snapshot}
+    ids_by_uuid = {item.uuid: item.book_id for item in snapshot}
+    ids_by_isbn = {}
+    for item in snapshot:
+        if item.isbn_key:
+            ids_by_isbn.setdefault(item.isbn_key, set()).add(item.book_id)
+
+    # Distinct codes with how often each was scanned
+    scanned = {
+        (code_type, code): count
+        for code_type, code, count in db.session.execute(
+            select(InventoryAuditScan.code_type, InventoryAuditScan.code, func.count())
+            .where(InventoryAuditScan.audit_id == audit.id)
+            .group_by(InventoryAuditScan.code_type, InventoryAuditScan.code)
+        )
+    }
+
+    scans_by_book = {}
+    outside = []
+    for (code_type, code), count in scanned.items():
+        if code_type == 'uuid':
+            book_ids = {ids_by_uuid[code]} if code in ids_by_uuid else set()
+        else:
+            book_ids = ids_by_isbn.get(code, set())
+        if not book_ids:
+            outside.append((code_type, code))
+        for book_id in book_ids:
+            scans_by_book[book_id] = scans_by_book.get(book_id, 0) + count
+
+    present_ids = set(scans_by_book)
+    on_shelf_ids = {book_id for book_id, item in items.items() if item.copies_available > 0}
+    missing_ids = on_shelf_ids - present_ids
+    checked_out_ids = present_ids - on_shelf_ids
+
+    misplaced = []
+    unexpected = []
+    found = _resolve_outside_codes(outside)
+    for code_type, code in outside:
+        book = found.get((code_type, code))
+        if book is None:
+            unexpected.append({'code_type': code_type, 'code': code, 'scans': scanned[(code_type, code)]})
+        elif not (book.location or '').startswith(audit.location):
+            # Books shelved here since the audit started are neither expected nor misplaced
+            misplaced.append({
+                'book_id': book.id,
+                'uuid': book.uuid,
+                'title': book.title,
+                'author': book.author,
+                'location': book.location,
+                'copies_total': book.copies_total,
+                'copies_available': book.copies_available,
+                'scans': scanned[(code_type, code)]
+            })
+
+    return {
+        'summary': {
+            'expected_books': len(items),
+            'scanned_codes': len(scanned),
+            'present': len(present_ids),
+            'missing': len(missing_ids),
+            'misplaced': len(misplaced),
+            'unexpected': len(unexpected),
+            'checked_out_but_present': len(checked_out_ids)
+        },
+        'missing': [_snapshot_entry(items[book_id]) for book_id in sorted(missing_ids)],
+        'misplaced': misplaced,
+        'unexpected': unexpected,
+        'checked_out_but_present': [
+            _snapshot_entry(items[book_id], scans_by_book[book_id]) for book_id in sorted(checked_out_ids)
+        ]
+    }
+
+def close_audit(audit):
+    """Close an audit and store its final diff, which later calls return unchanged"""
+    if audit.status == 'closed':
+        return json.loads(audit.result)
+
+    diff = audit_diff(audit)
+    closed = db.session.execute(
+        update(InventoryAudit)
+        .where(InventoryAudit.id == audit.id, InventoryAudit.status == 'open')
+        .values(status='closed', result=json.dumps(diff), closed_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+
+    if not closed:
+        # Another request closed it first; its result is the final one
+        db.session.refresh(audit)
+        return json.loads(audit.result)
+    db.session.refresh(audit)
+    return diff
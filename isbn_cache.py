@@ -0,0 +1,196 @@
+"""
+Cache for external ISBN metadata lookups
+
+Looking an ISBN up walks several remote providers and can take seconds, so
+results are cached at two levels:
+
+- a small in-memory LRU per worker, for repeated scans at the same desk
+- the shared ``isbn_cache`` table, which survives worker restarts and is
+  visible to every gunicorn worker
+
+Entries expire after ``ISBN_CACHE_TTL``. ISBNs that no provider knows are
+cached too (negative caching) for the shorter ``ISBN_CACHE_NEGATIVE_TTL``.
+The table is trimmed back to ``ISBN_CACHE_MAX_ENTRIES`` by evicting the least
+recently used entries.
+"""
+
+import copy
+import json
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from sqlalchemy import select, insert, update, delete, func
+from sqlalchemy.exc import IntegrityError
+from models import db, IsbnCacheEntry
+
+# Lookup sources meaning no provider knew the ISBN
+NOT_FOUND_SOURCES = ['manual_entry']
+
+# Lookup sources that must not be cached, such as network failures and
+# lookups that ran out of time before every provider answered
+UNCACHEABLE_SOURCES = ['error_fallback', 'timeout_fallback']
+
+# Trim the shared table after this many writes from a worker
+PRUNE_EVERY = 100
+
+class ISBNMetadataCache:
+    def __init__(self, ttl=None, negative_ttl=None, max_entries=None, local_size=None):
+        # Import config to get cache settings
+        try:
+            from config import Config
+            defaults = Config
+        except ImportError:
+            defaults = None
+
+        self.ttl = ttl or getattr(defaults, 'ISBN_CACHE_TTL', 30 * 24 * 3600)
+        self.negative_ttl = negative_ttl or getattr(defaults, 'ISBN_CACHE_NEGATIVE_TTL', 24 * 3600)
+        self.max_entries = max_entries or getattr(defaults, 'ISBN_CACHE_MAX_ENTRIES', 50000)
+        self.local_size = local_size or getattr(defaults, 'ISBN_CACHE_LOCAL_SIZE', 1000)
+
+        self.table = IsbnCacheEntry.__table__
+        self.local = OrderedDict()  # isbn -> (expires_at, book info)
+        self.lock = threading.Lock()
+        self.writes_since_prune = 0
+
+    def _get_local(self, isbn, now):
+        with self.lock:
+            entry = self.local.get(isbn)
+            if entry is None:
+                return None
+
+            expires_at, data = entry
+            if expires_at <= now:
+                del self.local[isbn]
+                return None
+
+            self.local.move_to_end(isbn)
+            return data
+
+    def _set_local(self, isbn, data, expires_at):
+        with self.lock:
+            self.local[isbn] = (expires_at, data)
+            self.local.move_to_end(isbn)
+            while len(self.local) > self.local_size:
+                self.local.popitem(last=False)
+
+    def get(self, isbn):
+        """Return cached book info for an ISBN, or None on a miss"""
+        now = datetime.utcnow()
+
+        data = self._get_local(isbn, now)
+        if data is not None:
+            return copy.deepcopy(data)
+
+        try:
+            # Cache reads and writes use their own connection so they never
+            # commit or roll back the request's session
+            with db.engine.begin() as conn:
+                row = conn.execute(
+                    select(self.table.c.data, self.table.c.expires_at)
+                    .where(self.table.c.isbn == isbn, self.table.c.expires_at > now)
+                ).first()
+                if row is None:
+                    return None
+
+                conn.execute(
+                    update(self.table)
+                    .where(self.table.c.isbn == isbn)
+                    .values(last_accessed=now, hit_count=self.table.c.hit_count + 1)
+                )
+        except Exception as e:
+            print(f"ISBN cache read failed for {isbn}: {e}")
+            return None
+
+        data = json.loads(row.data)
+        self._set_local(isbn, data, row.expires_at)
+        return copy.deepcopy(data)
+
+    def set(self, isbn, data):
+        """Store book info for an ISBN"""
+        source = data.get('source')
+        if source in UNCACHEABLE_SOURCES:
+            return
+
+        found = source not in NOT_FOUND_SOURCES
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=self.ttl if found else self.negative_ttl)
+        values = {
+            'data': json.dumps(data),
+            'found': found,
+            'fetched_at': now,
+            'expires_at': expires_at,
+            'last_accessed': now,
+            'hit_count': 0
+        }
+
+        self._set_local(isbn, copy.deepcopy(data), expires_at)
+
+        try:
+            with db.engine.begin() as conn:
+                updated = conn.execute(
+                    update(self.table).where(self.table.c.isbn == isbn).values(**values)
+                ).rowcount
+                if not updated:
+                    conn.execute(insert(self.table).values(isbn=isbn, **values))
+        except IntegrityError:
+            # Another worker stored the same ISBN at the same moment
+            pass
+        except Exception as e:
+            print(f"ISBN cache write failed for {isbn}: {e}")
+            return
+
+        with self.lock:
+            self.writes_since_prune += 1
+            should_prune = self.writes_since_prune >= PRUNE_EVERY
+            if should_prune:
+                self.writes_since_prune = 0
+        if should_prune:
+            self.prune()
+
+    def invalidate(self, isbn):
+        """Remove an ISBN from both cache levels"""
+        with self.lock:
+            self.local.pop(isbn, None)
+
+        try:
+            with db.engine.begin() as conn:
+                conn.execute(delete(self.table).where(self.table.c.isbn == isbn))
+        except Exception as e:
+            print(f"ISBN cache invalidation failed for {isbn}: {e}")
+
+    def prune(self):
+        """Delete expired entries and evict least recently used ones above the size limit"""
+        now = datetime.utcnow()
+
+        try:
+            with db.engine.begin() as conn:
+                removed = conn.execute(
+                    delete(self.table).where(self.table.c.expires_at <= now)
+                ).rowcount
+
+                excess = conn.execute(select(func.count()).select_from(self.table)).scalar() - self.max_entries
+                if excess > 0:
+                    oldest = (
+                        select(self.table.c.isbn)
+                        .order_by(self.table.c.last_accessed)
+                        .limit(excess)
+                    )
+                    removed += conn.execute(
+                        delete(self.table).where(self.table.c.isbn.in_(oldest))
+                    ).rowcount
+            return removed
+        except Exception as e:
+            print(f"ISBN cache prune failed: {e}")
+            return 0
+
+    def get_book_info(self, isbn, lookup, refresh=False):
+        """Return book info for an ISBN from the cache, calling lookup on a miss"""
+        if not refresh:
+            cached = self.get(isbn)
+            if cached is not None:
+                return cached
+
+        data = lookup(isbn)
+        if data:
+            self.set(isbn, data)
+        return data
@@ -0,0 +1,192 @@
+"""
+Database-backed background job queue
+
+Slow work such as external ISBN lookups and bulk imports is stored as a row
+in the ``jobs`` table by the web workers and picked up by
+``scripts/job_worker.py``, so no broker is needed beyond the existing
+database. A worker claims a job with a conditional UPDATE, which only one
+worker can win, so any number of workers can poll the same table on SQLite
+or PostgreSQL.
+
+Failed jobs are retried after ``JOB_RETRY_DELAY`` seconds (doubling on each
+attempt) until ``max_attempts`` is reached. Jobs left running by a worker
+that died are queued again after ``JOB_STALE_TIMEOUT`` seconds.
+"""
+
+import json
+import os
+import socket
+import time
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import update, delete
+from models import db, Job
+
+# Handlers by job type; each takes the decoded payload and returns a JSON-serializable result
+JOB_HANDLERS = {}
+
+def job_handler(job_type):
+    """Register a function as the handler for a job type"""
+    def register(func):
+        JOB_HANDLERS[job_type] = func
+        return func
+    return register
+
+@job_handler('isbn_lookup')
+def run_isbn_lookup(payload):
+    from app import lookup_book_info
+    from isbn_cache import UNCACHEABLE_SOURCES
+    book_info = lookup_book_info(payload['isbn'], refresh=payload.get('refresh', False))
+    if book_info and book_info.get('source') in UNCACHEABLE_SOURCES:
+        # The providers failed or timed out, so let the job be retried later
+        raise RuntimeError(f"ISBN lookup did not complete ({book_info['source']})")
+    return book_info
+
+@job_handler('bulk_import')
+def run_bulk_import(payload):
+    from app import isbn_scanner, isbn_cache
+    from bulk_import import import_books
+    return import_books(payload['rows'], isbn_scanner, isbn_cache)
+
+def enqueue_job(job_type, payload, max_attempts=None):
+    """Queue a job and commit it so workers can see it"""
+    if job_type not in JOB_HANDLERS:
+        raise ValueError(f"Unknown job type: {job_type}")
+
+    job = Job(
+        job_type=job_type,
+        payload=json.dumps(payload),
+        max_attempts=max_attempts or current_app.config['JOB_MAX_ATTEMPTS']
+    )
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+def default_worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+def claim_next_job(worker_id):
+    """Claim the oldest runnable job for this worker, or return None"""
+    while True:
+        now = datetime.utcnow()
+        job_id = db.session.query(Job.id).filter(
+            Job.status == 'queued',
+            Job.run_after <= now
+        ).order_by(Job.run_after, Job.id).limit(1).scalar()
+        if job_id is None:
+            db.session.rollback()
+            return None
+
+        # Only one worker's UPDATE can still see the job as queued
+        claimed = db.session.execute(
+            update(Job)
+            .where(Job.id == job_id, Job.status == 'queued')
+            .values(
+                status='running',
+                locked_by=worker_id,
+                started_at=now,
+                attempts=Job.attempts + 1
+            )
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.session.commit()
+
+        if claimed:
+            return db.session.get(Job, job_id)
+
+def run_job(job):
+    """Run a claimed job and record its result, scheduling a retry if it fails"""
+    handler = JOB_HANDLERS.get(job.job_type)
+    started = time.monotonic()
+
+    try:
+        if handler is None:
+            raise ValueError(f"Unknown job type: {job.job_type}")
+        result = handler(json.loads(job.payload) if job.payload else {})
+
+        job.result = json.dumps(result)
+        job.error = None
+        job.status = 'succeeded'
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+        print(f"✅ Job {job.id} ({job.job_type}) succeeded in {time.monotonic() - started:.2f}s")
+    except Exception as e:
+        db.session.rollback()
+        job = db.session.get(Job, job.id)
+        job.error = str(e)
+
+        if handler is not None and job.attempts < job.max_attempts:
+            delay = current_app.config['JOB_RETRY_DELAY'] * 2 ** (job.attempts - 1)
+            job.status = 'queued'
+            job.locked_by = None
+            job.run_after = datetime.utcnow() + timedelta(seconds=delay)
+            print(f"⚠️  Job {job.id} ({job.job_type}) failed, retrying in {delay}s: {e}")
+        else:
+            job.status = 'failed'
+            job.finished_at = datetime.utcnow()
+            print(f"❌ Job {job.id} ({job.job_type}) failed: {e}")
+        db.session.commit()
+
+    return job
+
+def requeue_stale_jobs(timeout=None):
+    """Queue jobs again whose worker stopped before finishing them
+
+    Jobs that have used all their attempts are marked failed instead, so a
+    job that is not safe to repeat (``max_attempts=1``) never runs twice.
+    """
+    timeout = timeout or current_app.config['JOB_STALE_TIMEOUT']
+    now = datetime.utcnow()
+    stale = (Job.status == 'running', Job.started_at < now - timedelta(seconds=timeout))
+
+    requeued = db.session.execute(
+        update(Job)
+        .where(*stale, Job.attempts < Job.max_attempts)
+        .values(status='queued', locked_by=None, run_after=now)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.execute(
+        update(Job)
+        .where(*stale)
+        .values(status='failed', error='Worker stopped before the job finished', finished_at=now)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return requeued
+
+def prune_finished_jobs(days=None):
+    """Delete finished jobs older than the retention period"""
+    days = days or current_app.config['JOB_RETENTION_DAYS']
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    removed = db.session.execute(
+        delete(Job)
+        .where(Job.status.in_(['succeeded', 'failed']), Job.finished_at < cutoff)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+    return removed
+
+def work(worker_id=None, poll_interval=None, once=False):
+    """Run jobs until interrupted, or until the queue is empty when ``once`` is set"""
+    worker_id = worker_id or default_worker_id()
+    poll_interval = poll_interval or current_app.config['JOB_POLL_INTERVAL']
+    last_maintenance = None
+
+    while True:
+        # Housekeeping runs about once a minute
+        if last_maintenance is None or time.monotonic() - last_maintenance > 60:
+            requeued = requeue_stale_jobs()
+            if requeued:
+                print(f"♻️  Requeued {requeued} stale job(s)")
+            prune_finished_jobs()
+            last_maintenance = time.monotonic()
+
+        job = claim_next_job(worker_id)
+        if job is not None:
+            run_job(job)
+            db.session.remove()
+            continue
+
+        if once:
+            return
+        time.sleep(poll_interval)
@@ -0,0 +1,320 @@
+"""
+Printable QR label sheets for books
+
+Books are laid out ``columns`` x ``rows`` per page, each label carrying the
+book's deterministic QR code, its title, author, shelf location and ISBN.
+Pages are rendered in a process pool (QR encoding and drawing are CPU bound)
+and streamed out in order as they finish, either as a PDF or as a ZIP of
+PNG pages, so relabelling thousands of books never holds the whole document
+in memory.
+
+The render functions only depend on the QR encoder and Pillow, so the spawned
+render processes start without importing the web application.
+"""
+
+import io
+import os
+import zlib
+import unicodedata
+import zipfile
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image, ImageDraw, ImageFont
+from qr_encoder import QREncoder
+
+# Page sizes in millimetres
+PAGE_SIZES = {
+    'a4': (210.0, 297.0),
+    'letter': (215.9, 279.4)
+}
+
+LABEL_FORMATS = {
+    'pdf': 'application/pdf',
+    'png': 'application/zip'
+}
+
+MM_PER_INCH = 25.4
+POINTS_PER_INCH = 72
+
+# Fonts with Vietnamese glyphs tried when LABEL_FONT_PATH is not set
+FONT_CANDIDATES = [
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',  # Debian/Ubuntu (fonts-dejavu-core)
+    '/usr/share/fonts/dejavu/DejaVuSans.ttf',
+    'C:/Windows/Fonts/arial.ttf',
+    '/Library/Fonts/Arial Unicode.ttf'
+]
+
+def default_layout(config):
+    """Build the sheet layout from the application config"""
+    return {
+        'page_size': config['LABEL_PAGE_SIZE'],
+        'dpi': config['LABEL_DPI'],
+        'columns': config['LABEL_COLUMNS'],
+        'rows': config['LABEL_ROWS'],
+        'margin_mm': config['LABEL_MARGIN_MM'],
+        'font_path': config['LABEL_FONT_PATH']
+    }
+
+def page_pixels(layout):
+    width_mm, height_mm = PAGE_SIZES[layout['page_size']]
+    return (
+        round(width_mm / MM_PER_INCH * layout['dpi']),
+        round(height_mm / MM_PER_INCH * layout['dpi'])
+    )
+
+def _font_path(layout):
+    if layout.get('font_path'):
+        return layout['font_path']
+    for path in FONT_CANDIDATES:
+        if os.path.exists(path):
+            return path
+    return None
+
+def _load_font(font_path, size):
+    if font_path:
+        return ImageFont.truetype(font_path, size)
+    return ImageFont.load_default(size=size)
+
+def _strip_accents(text):
+    """Remove diacritics but keep case, for fonts without Vietnamese glyphs"""
+    text = text.replace('đ', 'd').replace('Đ', 'D')
+    return ''.join(char for char in unicodedata.normalize('NFD', text) if not unicodedata.combining(char))
+
+def _fit_text(draw, text, font, width):
+    """Shorten text with an ellipsis until it fits the given pixel width"""
+    if draw.textlength(text, font=font) <= width:
+        return text
+    while text and draw.textlength(text + '…', font=font) > width:
+        text = text[:-1]
+    return text.rstrip() + '…'
+
+def _wrap_text(draw, text, font, width, max_lines):
+    """Wrap text by words into at most ``max_lines`` lines of the given width"""
+    lines = []
+    words = text.split()
+    while words and len(lines) < max_lines:
+        line = words.pop(0)
+        while words and draw.textlength(f'{line} {words[0]}', font=font) <= width:
+            line = f'{line} {words.pop(0)}'
+        lines.append(line)
+    if words:
+        lines[-1] = _fit_text(draw, f"{lines[-1]} {' '.join(words)}", font, width)
+    return [_fit_text(draw, line, font, width) for line in lines]
+
+# One encoder per render process; book payloads share a length, so after the
+# first label every code reuses the cached QR version
+encoder = QREncoder(border=1)
+
+def _qr_image(payload, size):
+    """Encode a payload as a crisp 1-bit QR image no larger than ``size`` pixels"""
+    modules = encoder.matrix(payload).shape[0] + 2 * encoder.border
+    # Whole pixels per module keep the edges sharp for scanners
+    scale = max(1, size // modules)
+    width, height, bits = encoder.render_bits(payload, box_size=scale)
+    return Image.frombytes('1', (width, height), bits)
+
+def render_sheet(layout, labels):
+    """Render one page of labels to a 1-bit image"""
+    width, height = page_pixels(layout)
+    margin = round(layout['margin_mm'] / MM_PER_INCH * layout['dpi'])
+    cell_width = (width - 2 * margin) // layout['columns']
+    cell_height = (height - 2 * margin) // layout['rows']
+    padding = cell_height // 12
+
+    sheet = Image.new('L', (width, height), 255)
+    draw = ImageDraw.Draw(sheet)
+    font_path = _font_path(layout)
+    title_font = _load_font(font_path, max(8, cell_height // 10))
+    detail_font = _load_font(font_path, max(8, cell_height // 13))
+    # Pillow's built-in font has no Vietnamese glyphs, so print unaccented text rather than boxes
+    printable = (lambda text: text) if font_path else _strip_accents
+
+    for index, label in enumerate(labels):
+        left = margin + (index % layout['columns']) * cell_width
+        top = margin + (index // layout['columns']) * cell_height
+
+        # The QR code takes at most 40% of the width, leaving room for 13-digit ISBNs
+        qr_image = _qr_image(label['payload'], min(cell_height - 2 * padding, cell_width * 2 // 5))
+        sheet.paste(qr_image, (left + padding, top + (cell_height - qr_image.height) // 2))
+
+        text_left = left + 2 * padding + qr_image.width
+        text_width = cell_width - (text_left - left) - padding
+        if text_width <= 0:
+            continue
+
+        y = top + padding
+        for line in _wrap_text(draw, printable(label.get('title') or ''), title_font, text_width, 2):
+            draw.text((text_left, y), line, font=title_font, fill=0)
+            y += round(title_font.size * 1.2)
+
+        y += detail_font.size // 2
+        for line in (label.get('author'), label.get('location'), label.get('isbn')):
+            if line:
+                draw.text((text_left, y), _fit_text(draw, printable(line), detail_font, text_width), font=detail_font, fill=0)
+                y += round(detail_font.size * 1.3)
+
+    return sheet.convert('1')
+
+def render_page(task):
+    """Render a page for the output format (runs in the render processes)"""
+    layout, labels, output_format = task
+    sheet = render_sheet(layout, labels)
+
+    if output_format == 'png':
+        buffered = io.BytesIO()
+        sheet.save(buffered, format='PNG', optimize=True)
+        return buffered.getvalue()
+
+    # PDF pages embed the packed 1-bit pixels directly, Flate compressed
+    return zlib.compress(sheet.tobytes(), 6)
+
+def render_pages(layout, pages, output_format, processes):
+    """Yield rendered pages in order, rendering up to ``processes`` at a time"""
+    if processes <= 1:
+        for labels in pages:
+            yield render_page((layout, labels, output_format))
+        return
+
+    # Spawned rather than forked: the web workers run threads (ISBN lookups),
+    # and forking a threaded process can deadlock the child
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=processes, mp_context=context) as executor:
+        # A bounded window of pages in flight keeps memory flat for large runs
+        in_flight = deque()
+        for labels in pages:
+            in_flight.append(executor.submit(render_page, (layout, labels, output_format)))
+            if len(in_flight) >= 2 * processes:
+                yield in_flight.popleft().result()
+        while in_flight:
+            yield in_flight.popleft().result()
+
+def pdf_document(layout, rendered_pages):
+    """Stream a PDF with one full-page image per rendered page"""
+    width, height = page_pixels(layout)
+    width_pt = width / layout['dpi'] * POINTS_PER_INCH
+    height_pt = height / layout['dpi'] * POINTS_PER_INCH
+
+    offsets = {}
+    position = 0
+    page_ids = []
+
+    def write_object(object_id, body):
+        nonlocal position
+        offsets[object_id] = position
+        data = f'{object_id} 0 obj\n'.encode('latin-1') + body + b'\nendobj\n'
+        position += len(data)
+        return data
+
+    header = b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n'
+    position += len(header)
+    yield header
+
+    # Objects 1 and 2 (catalog and page tree) are written last, once every page is known
+    next_id = 3
+    for image_data in rendered_pages:
+        image_id, content_id, page_id = next_id, next_id + 1, next_id + 2
+        next_id += 3
+
+        yield write_object(image_id, (
+            f'<< /Type /XObject /Subtype /Image /Width {width} /Height {height} '
+            f'/ColorSpace /DeviceGray /BitsPerComponent 1 /Filter /FlateDecode '
+            f'/Length {len(image_data)} >>\nstream\n'
+        ).encode('latin-1') + image_data + b'\nendstream')
+
+        content = f'q {width_pt:.2f} 0 0 {height_pt:.2f} 0 0 cm /Sheet Do Q'.encode('latin-1')
+        yield write_object(content_id, f'<< /Length {len(content)} >>\nstream\n'.encode('latin-1') + content + b'\nendstream')
+
+        yield write_object(page_id, (
+            f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {width_pt:.2f} {height_pt:.2f}] '
+            f'/Resources << /XObject << /Sheet {image_id} 0 R >> >> /Contents {content_id} 0 R >>'
+        ).encode('latin-1'))
+        page_ids.append(page_id)
+
+    kids = ' '.join(f'{page_id} 0 R' for page_id in page_ids)
+    yield write_object(2, f'<< /Type /Pages /Kids [{kids}] /Count {len(page_ids)} >>'.encode('latin-1'))
+    yield write_object(1, b'<< /Type /Catalog /Pages 2 0 R >>')
+
+    xref = [f'xref\n0 {next_id}\n', '0000000000 65535 f \n']
+    xref.extend(f'{offsets[object_id]:010d} 00000 n \n' for object_id in range(1, next_id))
+    xref.append(f'trailer\n<< /Size {next_id} /Root 1 0 R >>\nstartxref\n{position}\n%%EOF\n')
+    yield ''.join(xref).encode('latin-1')
+
+class _ChunkWriter(io.RawIOBase):
+    """Write-only, unseekable stream whose bytes are collected for streaming"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+def zip_document(rendered_pages):
+    """Stream a ZIP archive with one PNG per rendered page"""
+    writer = _ChunkWriter()
+    # PNG pages are already compressed, so they are stored as they are
+    with zipfile.ZipFile(writer, 'w', compression=zipfile.ZIP_STORED) as archive:
+        for number, image_data in enumerate(rendered_pages, start=1):
+            archive.writestr(f'labels-page-{number:04d}.png', image_data)
+            yield writer.drain()
+    yield writer.drain()
+
+def label_sheet_stream(layout, pages, output_format='pdf', processes=1):
+    """Render pages of labels and stream them as a PDF or a ZIP of PNGs"""
+    rendered_pages = render_pages(layout, pages, output_format, processes)
+    if output_format == 'png':
+        return zip_document(rendered_pages)
+    return pdf_document(layout, rendered_pages)
+
+def label_books_query(location=None, added_from=None, added_to=None, ids=None):
+    """Build the query for books to label, in shelf order"""
+    # Imported here so the render processes never load the database layer
+    from models import Book
+    from sqlalchemy import select
+
+    statement = select(Book.uuid, Book.title, Book.author, Book.location, Book.isbn)
+    if location:
+        statement = statement.where(Book.location.startswith(location, autoescape=True))
+    if added_from:
+        statement = statement.where(Book.added_date >= added_from)
+    if added_to:
+        statement = statement.where(Book.added_date < added_to)
+    if ids:
+        statement = statement.where(Book.id.in_(ids))
+    return statement.order_by(Book.location, Book.id)
+
+def label_pages(statement, labels_per_page, payload_for, batch_size=1000):
+    """Yield lists of label dicts, one list per page, streaming rows from the database"""
+    from models import db
+
+    page = []
+    rows = db.session.execute(statement.execution_options(yield_per=batch_size))
+    for uuid, title, author, location, isbn in rows:
+        page.append({
+            'payload': payload_for(uuid),
+            'title': title,
+            'author': author,
+            'location': location,
+            'isbn': isbn
+        })
+        if len(page) == labels_per_page:
+            yield page
+            page = []
+    if page:
+        yield page
+
+def render_processes(config, page_count):
+    """Number of render processes worth starting for a run of ``page_count`` pages"""
+    # Starting processes costs more than rendering a couple of pages inline
+    if page_count <= 2:
+        return 1
+    return min(config['LABEL_PROCESSES'] or os.cpu_count() or 1, page_count)
@@ -15,6 +15,7 @@ import os
 import argparse
 
 from app import app, db
+from overdue import start_overdue_scheduler
 
 def parse_arguments():
     """Parse command line arguments"""
@@ -47,6 +48,10 @@ def main():
                     print(f"❌ Failed to connect to database: {e}")
                     sys.exit(1)
     
+    # Sweep overdue loans in the background if an interval is configured
+    if start_overdue_scheduler(app):
+        print(f"⏰ Overdue sweep every {app.config['OVERDUE_SWEEP_INTERVAL']}s")
+    
     # Configure SSL if HTTPS is requested
     ssl_context = None
     if args.https:
@@ -1,11 +1,17 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event, inspect
 from datetime import datetime
 import uuid
+import json
+import re
 
 db = SQLAlchemy()
 
 class Book(db.Model):
     __tablename__ = 'books'
+    __table_args__ = (
+        db.Index('idx_books_status', 'status'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     uuid = db.Column(db.String(36), unique=True, nullable=False, default=lambda: str(uuid.uuid4()))
@@ -29,9 +35,12 @@ class Book(db.Model):
     # Normalized search columns for Vietnamese accent-insensitive search
     title_normalized = db.Column(db.String(255), nullable=True)
     author_normalized = db.Column(db.String(255), nullable=True)
+    search_text = db.Column(db.Text, nullable=True)  # Normalized text indexed for full-text search (see search.py)
     
     # Relationships
-    transactions = db.relationship('Transaction', backref='book', lazy=True)
+    transactions = db.relationship('Transaction', back_populates='book', lazy=True)
+    # Normalized form of ``categories``, kept in sync by categories.py
+    category_set = db.relationship('Category', secondary='book_categories', lazy=True, collection_class=set)
     
     def to_dict(self):
         return {
@@ -57,13 +66,56 @@ class Book(db.Model):
     
     def update_normalized_fields(self):
         """Update normalized search fields for Vietnamese accent-insensitive search"""
-        from utils import normalize_vietnamese_text
+        from utils import normalize_vietnamese_text, isbn_variants
         
         if self.title:
             self.title_normalized = normalize_vietnamese_text(self.title)
         
         if self.author:
             self.author_normalized = normalize_vietnamese_text(self.author)
+        
+        # Combined text for the full-text index; ISBN hyphens are dropped so the
+        # number is indexed as a single term, in both its ISBN-13 and ISBN-10 forms
+        isbn_terms = isbn_variants(self.isbn) or ([re.sub(r'[^0-9Xx]', '', self.isbn)] if self.isbn else [])
+        parts = [self.title, self.author, *isbn_terms, self.categories, self.description]
+        self.search_text = ' '.join(normalize_vietnamese_text(part) for part in parts if part) or None
+
+# Fields whose changes must refresh the normalized search columns
+BOOK_SEARCH_FIELDS = ['title', 'author', 'isbn', 'categories', 'description']
+
+# Fields of Book.to_dict() that list endpoints accept in ?fields=
+BOOK_FIELDS = [
+    'id', 'uuid', 'isbn', 'title', 'author', 'publisher', 'publication_date',
+    'categories', 'description', 'language', 'pages', 'thumbnail_url', 'location',
+    'status', 'copies_total', 'copies_available', 'added_date', 'last_updated'
+]
+
+# The compact listing (?fields=compact) for grids and pickers
+BOOK_LIST_FIELDS = ['id', 'uuid', 'title', 'author', 'status', 'copies_total', 'copies_available']
+
+@event.listens_for(Book, 'before_insert')
+@event.listens_for(Book, 'before_update')
+def _refresh_book_search_fields(mapper, connection, target):
+    """Keep normalized search columns in sync however a book is written"""
+    state = inspect(target)
+    if state.key is None or any(state.attrs[field].history.has_changes() for field in BOOK_SEARCH_FIELDS):
+        target.update_normalized_fields()
+
+# Links each book to the categories in its comma-separated ``categories``. The
+# primary key serves lookups by book; the index serves ?category= and the facet counts
+book_categories = db.Table(
+    'book_categories',
+    db.Column('book_id', db.Integer, db.ForeignKey('books.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('category_id', db.Integer, db.ForeignKey('categories.id', ondelete='CASCADE'), primary_key=True),
+    db.Index('idx_book_categories_category', 'category_id', 'book_id')
+)
+
+class Category(db.Model):
+    __tablename__ = 'categories'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)  # Spelling of the first book filed under it
+    key = db.Column(db.String(100), unique=True, nullable=False)  # Case-folded name that books are matched on
 
 class Member(db.Model):
     __tablename__ = 'members'
@@ -81,9 +133,12 @@ class Member(db.Model):
     membership_type = db.Column(db.String(20), nullable=False, default='regular')  # regular, premium, student
     status = db.Column(db.String(20), nullable=False, default='active')  # active, suspended, expired
     max_books = db.Column(db.Integer, nullable=False, default=5)
+    # Maintained by circulation.py with each loan, so checkout never counts transactions
+    active_loans = db.Column(db.Integer, nullable=False, default=0)
+    fines_outstanding = db.Column(db.Float, nullable=False, default=0.0)
     
     # Relationships
-    transactions = db.relationship('Transaction', backref='member', lazy=True)
+    transactions = db.relationship('Transaction', back_populates='member', lazy=True)
     
     def to_dict(self):
         return {
@@ -99,11 +154,37 @@ class Member(db.Model):
             'membership_date': self.membership_date.isoformat(),
             'membership_type': self.membership_type,
             'status': self.status,
-            'max_books': self.max_books
+            'max_books': self.max_books,
+            'active_loans': self.active_loans,
+            'fines_outstanding': round(self.fines_outstanding, 2)
         }
 
+# Loan statuses of a borrowed copy not yet returned; the overdue sweep moves
+# loans past their due date from active to overdue
+OPEN_LOAN_STATUSES = ('active', 'overdue')
+
 class Transaction(db.Model):
     __tablename__ = 'transactions'
+    __table_args__ = (
+        # Checkout counts a member's active loans; checkin finds a book's active loan
+        db.Index('idx_transactions_member_type_status', 'member_id', 'transaction_type', 'status'),
+        db.Index('idx_transactions_book_type_status', 'book_id', 'transaction_type', 'status'),
+        # Recent activity lists borrows newest first; exports filter by date
+        db.Index('idx_transactions_type_date', 'transaction_type', 'transaction_date'),
+        db.Index('idx_transactions_transaction_date', 'transaction_date'),
+        # The overdue sweep and listing find loans by status and due date
+        db.Index('idx_transactions_status_due_date', 'status', 'due_date'),
+        # Partial indexes holding only open loans (PostgreSQL; SQLite cannot match
+        # partial indexes against bound parameters, so it relies on the composites)
+        db.Index(
+            'idx_transactions_open_by_member', 'member_id',
+            postgresql_where=db.text("transaction_type = 'borrow' AND status IN ('active', 'overdue')")
+        ).ddl_if(dialect='postgresql'),
+        db.Index(
+            'idx_transactions_open_by_book', 'book_id',
+            postgresql_where=db.text("transaction_type = 'borrow' AND status IN ('active', 'overdue')")
+        ).ddl_if(dialect='postgresql'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     book_id = db.Column(db.Integer, db.ForeignKey('books.id'), nullable=False)
@@ -119,6 +200,10 @@ class Transaction(db.Model):
     condition_notes = db.Column(db.Text, nullable=True)
     condition_fee = db.Column(db.Float, nullable=False, default=0.0)
     
+    # Relationships (lazy by default; list views should use joinedload to avoid a query per row)
+    book = db.relationship('Book', back_populates='transactions', lazy='select')
+    member = db.relationship('Member', back_populates='transactions', lazy='select')
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -135,3 +220,149 @@ class Transaction(db.Model):
             'condition_notes': self.condition_notes,
             'condition_fee': self.condition_fee
         }
+
+class LibraryStats(db.Model):
+    __tablename__ = 'library_stats'
+    
+    # Single-row table of dashboard aggregates, kept current by the circulation
+    # and catalogue endpoints and periodically rebuilt from the source tables
+    id = db.Column(db.Integer, primary_key=True)
+    total_books = db.Column(db.Integer, nullable=False, default=0)
+    total_copies = db.Column(db.Integer, nullable=False, default=0)
+    available_copies = db.Column(db.Integer, nullable=False, default=0)
+    overdue_loans = db.Column(db.Integer, nullable=False, default=0)
+    active_members = db.Column(db.Integer, nullable=False, default=0)
+    # Every overdue fine and condition fee charged so far; payments are not
+    # recorded anywhere, so nothing is ever deducted from it
+    fines_outstanding = db.Column(db.Float, nullable=False, default=0.0)
+    last_reconciled = db.Column(db.DateTime, nullable=True)
+    last_updated = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'total_books': self.total_books,
+            'total_copies': self.total_copies,
+            'available_copies': self.available_copies,
+            'copies_out': self.total_copies - self.available_copies,
+            'overdue_loans': self.overdue_loans,
+            'active_members': self.active_members,
+            'fines_outstanding': round(self.fines_outstanding, 2),
+            'last_reconciled': self.last_reconciled.isoformat() if self.last_reconciled else None,
+            'last_updated': self.last_updated.isoformat()
+        }
+
+class TableVersion(db.Model):
+    __tablename__ = 'table_versions'
+    
+    # Change counter per table, bumped when a transaction writing the table
+    # commits; listing ETags are derived from it (see http_cache.py)
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+class IsbnCacheEntry(db.Model):
+    __tablename__ = 'isbn_cache'
+    __table_args__ = (
+        db.Index('idx_isbn_cache_last_accessed', 'last_accessed'),
+        db.Index('idx_isbn_cache_expires_at', 'expires_at'),
+    )
+    
+    # Shared cache of external ISBN metadata lookups (see isbn_cache.py)
+    isbn = db.Column(db.String(20), primary_key=True)
+    data = db.Column(db.Text, nullable=False)  # JSON book info as returned by ISBNScanner
+    found = db.Column(db.Boolean, nullable=False, default=True)  # False for negative entries
+    fetched_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False)
+    last_accessed = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    hit_count = db.Column(db.Integer, nullable=False, default=0)
+
+class Job(db.Model):
+    __tablename__ = 'jobs'
+    __table_args__ = (
+        db.Index('idx_jobs_status_run_after', 'status', 'run_after'),
+    )
+    
+    # Background work queued by the web workers and run by scripts/job_worker.py (see jobs.py)
+    id = db.Column(db.Integer, primary_key=True)
+    job_type = db.Column(db.String(50), nullable=False)  # isbn_lookup, bulk_import
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, succeeded, failed
+    payload = db.Column(db.Text, nullable=True)  # JSON arguments for the handler
+    result = db.Column(db.Text, nullable=True)  # JSON value returned by the handler
+    error = db.Column(db.Text, nullable=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=3)
+    run_after = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)  # Delays retries
+    locked_by = db.Column(db.String(100), nullable=True)  # Worker running the job
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'job_type': self.job_type,
+            'status': self.status,
+            'result': json.loads(self.result) if self.result else None,
+            'error': self.error,
+            'attempts': self.attempts,
+            'max_attempts': self.max_attempts,
+            'created_at': self.created_at.isoformat(),
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+class InventoryAudit(db.Model):
+    __tablename__ = 'inventory_audits'
+    
+    # A shelf inventory session: the expected holdings are snapshotted when it
+    # starts and compared with the scanned codes (see inventory.py)
+    id = db.Column(db.Integer, primary_key=True)
+    location = db.Column(db.String(100), nullable=False)  # Shelf location prefix being audited
+    status = db.Column(db.String(20), nullable=False, default='open')  # open, closed
+    expected_books = db.Column(db.Integer, nullable=False, default=0)
+    scan_count = db.Column(db.Integer, nullable=False, default=0)
+    result = db.Column(db.Text, nullable=True)  # JSON diff, stored when the audit is closed
+    started_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    closed_at = db.Column(db.DateTime, nullable=True)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'location': self.location,
+            'status': self.status,
+            'expected_books': self.expected_books,
+            'scan_count': self.scan_count,
+            'started_at': self.started_at.isoformat(),
+            'closed_at': self.closed_at.isoformat() if self.closed_at else None
+        }
+
+class InventoryAuditItem(db.Model):
+    __tablename__ = 'inventory_audit_items'
+    __table_args__ = (
+        db.Index('idx_inventory_audit_items_uuid', 'audit_id', 'uuid'),
+        db.Index('idx_inventory_audit_items_isbn_key', 'audit_id', 'isbn_key'),
+    )
+    
+    # Books shelved at the audited location when the audit started
+    audit_id = db.Column(db.Integer, db.ForeignKey('inventory_audits.id', ondelete='CASCADE'), primary_key=True)
+    book_id = db.Column(db.Integer, primary_key=True)
+    uuid = db.Column(db.String(36), nullable=False)
+    isbn_key = db.Column(db.String(13), nullable=True)  # ISBN-13 digits, to match scans however the ISBN was written
+    title = db.Column(db.String(255), nullable=False)
+    author = db.Column(db.String(255), nullable=False)
+    location = db.Column(db.String(100), nullable=True)
+    copies_total = db.Column(db.Integer, nullable=False)
+    copies_available = db.Column(db.Integer, nullable=False)
+
+class InventoryAuditScan(db.Model):
+    __tablename__ = 'inventory_audit_scans'
+    __table_args__ = (
+        db.Index('idx_inventory_audit_scans_audit_code', 'audit_id', 'code_type', 'code'),
+    )
+    
+    # Append-only log of codes scanned during an audit; repeats are folded when diffing
+    id = db.Column(db.Integer, primary_key=True)
+    audit_id = db.Column(db.Integer, db.ForeignKey('inventory_audits.id', ondelete='CASCADE'), nullable=False)
+    code_type = db.Column(db.String(10), nullable=False)  # uuid, isbn
+    code = db.Column(db.String(36), nullable=False)  # Book UUID or ISBN-13
+    scanned_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
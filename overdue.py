@@ -0,0 +1,136 @@
+"""
+Overdue loans and fine accrual
+
+Loans used to be checked for being overdue row by row on every request, and
+the ``overdue`` transaction status was never written. ``sweep_overdue_loans``
+now does both jobs for all loans at once with set-based UPDATEs:
+
+1. ``active`` loans past their due date become ``overdue``
+2. every overdue loan's ``fine_amount`` is raised to what ``calculate_fine``
+   gives for today (whole days overdue times ``FINE_PER_DAY``, computed in
+   SQL), and the increase is added to the members' and the dashboard's
+   ``fines_outstanding`` in the same transaction
+
+Fines are absolute amounts, so the sweep can run any number of times: from
+cron through ``scripts/sweep_overdue.py``, from the in-process scheduler that
+``main.py`` starts when ``OVERDUE_SWEEP_INTERVAL`` is set, or both. Checkin
+treats overdue loans like active ones and only adds the part of the final
+fine that was not accrued yet.
+
+``/api/circulation/overdue`` lists overdue loans through the
+``(status, due_date)`` index.
+"""
+
+import threading
+import time
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import select, update, func, cast, extract, literal, bindparam, Integer, DateTime
+from models import db, Member, Transaction, OPEN_LOAN_STATUSES
+from stats import adjust_library_stats
+
+def whole_days_overdue(now):
+    """SQL expression for the whole days a loan is past due at ``now``, as ``calculate_fine`` counts them"""
+    now = literal(now, DateTime)
+    if db.session.get_bind().dialect.name == 'sqlite':
+        # Truncation matches timedelta.days for the positive spans compared here
+        return cast(func.julianday(now) - func.julianday(Transaction.due_date), Integer)
+    return func.floor(extract('epoch', now - Transaction.due_date) / 86400)
+
+def overdue_loans_filter(now):
+    """Filter for loans past their due date, whether or not a sweep has marked them yet"""
+    return (
+        Transaction.transaction_type == 'borrow',
+        Transaction.status.in_(OPEN_LOAN_STATUSES),
+        Transaction.due_date < now
+    )
+
+def sweep_overdue_loans(now=None, fine_per_day=None):
+    """Mark loans past their due date as overdue and accrue their fines
+
+    Returns a summary with the loans newly marked overdue, the loans whose
+    fine went up and the fines added.
+    """
+    now = now or datetime.utcnow()
+    if fine_per_day is None:
+        fine_per_day = current_app.config['FINE_PER_DAY']
+
+    # Being the first write, this also takes SQLite's write lock for the sweep
+    marked = db.session.execute(
+        update(Transaction)
+        .where(
+            Transaction.transaction_type == 'borrow',
+            Transaction.status == 'active',
+            Transaction.due_date < now
+        )
+        .values(status='overdue')
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+    accrued_fine = whole_days_overdue(now) * fine_per_day
+    behind = (Transaction.status == 'overdue', Transaction.fine_amount < accrued_fine)
+
+    # Lock the loans on PostgreSQL, so a checkin of one of them waits for the
+    # sweep and then sees the accrued fine
+    db.session.execute(select(Transaction.id).where(*behind).with_for_update())
+    increases = db.session.execute(
+        select(Transaction.member_id, func.sum(accrued_fine - Transaction.fine_amount))
+        .where(*behind)
+        .group_by(Transaction.member_id)
+    ).all()
+
+    accrued = 0
+    fines_added = 0.0
+    if increases:
+        members = Member.__table__
+        db.session.execute(
+            update(members)
+            .where(members.c.id == bindparam('member'))
+            .values(fines_outstanding=members.c.fines_outstanding + bindparam('increase')),
+            [{'member': member_id, 'increase': float(increase)} for member_id, increase in increases]
+        )
+        accrued = db.session.execute(
+            update(Transaction)
+            .where(*behind)
+            .values(fine_amount=accrued_fine)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        fines_added = sum(float(increase) for _, increase in increases)
+        adjust_library_stats(fines_outstanding=fines_added)
+
+    db.session.commit()
+    return {
+        'marked_overdue': marked,
+        'fines_accrued': accrued,
+        'fines_added': round(fines_added, 2),
+        'swept_at': now.isoformat()
+    }
+
+def start_overdue_scheduler(app, interval=None):
+    """Sweep overdue loans every ``interval`` seconds in a daemon thread
+
+    Each process that calls this runs its own sweeps; they are safe to
+    overlap. Returns the thread, or None when no interval is configured.
+    """
+    interval = interval or app.config.get('OVERDUE_SWEEP_INTERVAL')
+    if not interval:
+        return None
+
+    def run():
+        while True:
+            with app.app_context():
+                try:
+                    summary = sweep_overdue_loans()
+                    if summary['marked_overdue'] or summary['fines_accrued']:
+                        print(f"⏰ Overdue sweep: {summary['marked_overdue']} loan(s) became overdue, "
+                              f"{summary['fines_accrued']} fine(s) accrued (+${summary['fines_added']:.2f})")
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"❌ Overdue sweep failed: {e}")
+                finally:
+                    db.session.remove()
+            time.sleep(interval)
+
+    thread = threading.Thread(target=run, name='overdue-sweep', daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,40 @@
+"""
+Keyset (cursor) pagination for list endpoints
+
+Instead of OFFSET, each page continues from the last id of the previous page
+(``?after=<id>&limit=<n>``), so deep pages cost the same as the first one.
+Counting the full result set is opt-in through ``include_total``.
+"""
+
+from collections import namedtuple
+from flask import request
+
+KeysetPage = namedtuple('KeysetPage', ['items', 'next_cursor', 'has_more', 'total'])
+
+def keyset_requested():
+    """Check whether the request asks for cursor pagination"""
+    return 'after' in request.args or 'limit' in request.args
+
+def keyset_args(default_limit, max_limit):
+    """Read after, limit and include_total from the query string"""
+    after = request.args.get('after', type=int)
+    limit = request.args.get('limit', default_limit, type=int)
+    limit = max(1, min(limit, max_limit))
+    include_total = request.args.get('include_total', '').lower() in ('1', 'true', 'yes')
+    return after, limit, include_total
+
+def keyset_paginate(query, key_column, after=None, limit=50, include_total=False, descending=False):
+    """Fetch one page of a query ordered by a unique, indexed key column"""
+    total = query.order_by(None).count() if include_total else None
+    
+    if after is not None:
+        query = query.filter(key_column < after if descending else key_column > after)
+    query = query.order_by(key_column.desc() if descending else key_column)
+    
+    # Fetch one extra row to learn whether another page exists without counting
+    items = query.limit(limit + 1).all()
+    has_more = len(items) > limit
+    items = items[:limit]
+    next_cursor = getattr(items[-1], key_column.key) if has_more else None
+    
+    return KeysetPage(items, next_cursor, has_more, total)
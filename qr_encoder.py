@@ -0,0 +1,118 @@
+"""
+Thread-safe QR code encoder
+
+``qrcode.QRCode`` objects are mutable builders, so sharing one between
+requests is only safe with a single thread per worker. ``QREncoder`` keeps
+no per-request state: every call builds its own module matrix, and the only
+shared state is a lock-protected table of QR versions.
+
+Our payloads have fixed shapes (a book payload is always the same length
+because UUIDs are), so the version that fits a payload length is found once
+and reused, skipping qrcode's best-fit search on every render. A payload that
+turns out not to fit (say, numeric data cached a smaller version for the same
+length) falls back to best fit and raises the cached version.
+
+Images are rendered straight from the module matrix to SVG, to packed 1-bit
+rows (the layout of Pillow's mode ``1`` and PDF 1-bit gray images), or to a
+1-bit grayscale PNG, without building a PIL RGB image.
+"""
+
+import struct
+import threading
+import zlib
+import numpy as np
+import qrcode
+from qrcode.exceptions import DataOverflowError
+
+class QREncoder:
+    def __init__(self, box_size=10, border=4, error_correction=qrcode.constants.ERROR_CORRECT_L):
+        self.box_size = box_size
+        self.border = border
+        self.error_correction = error_correction
+        self.versions = {}  # payload length in bytes -> smallest version that fits
+        self.lock = threading.Lock()
+
+    def _build(self, payload, version):
+        qr = qrcode.QRCode(version=version, error_correction=self.error_correction, border=0)
+        qr.add_data(payload)
+        qr.make(fit=version is None)
+        return qr
+
+    def matrix(self, payload):
+        """Encode a payload into a boolean module matrix (True is dark), without the quiet zone"""
+        length = len(payload.encode('utf-8'))
+        with self.lock:
+            version = self.versions.get(length)
+
+        qr = None
+        if version is not None:
+            try:
+                qr = self._build(payload, version)
+            except DataOverflowError:
+                qr = None
+        if qr is None:
+            qr = self._build(payload, None)
+            with self.lock:
+                if qr.version > self.versions.get(length, 0):
+                    self.versions[length] = qr.version
+
+        return np.array(qr.get_matrix(), dtype=bool)
+
+    def _with_quiet_zone(self, modules, border):
+        return np.pad(modules, border, constant_values=False)
+
+    def _packed_rows(self, payload, box_size, border):
+        box_size = box_size or self.box_size
+        border = self.border if border is None else border
+        modules = self._with_quiet_zone(self.matrix(payload), border)
+        pixels = np.repeat(np.repeat(~modules, box_size, axis=0), box_size, axis=1)
+        return pixels.shape[1], np.packbits(pixels, axis=1)
+
+    def render_bits(self, payload, box_size=None, border=None):
+        """Render to packed 1-bit rows, most significant bit first, 1 meaning white
+
+        Returns (width, height, bytes); each row is padded to a whole byte.
+        """
+        width, rows = self._packed_rows(payload, box_size, border)
+        return width, rows.shape[0], rows.tobytes()
+
+    def render_png(self, payload, box_size=None, border=None):
+        """Render to a 1-bit grayscale PNG"""
+        width, rows = self._packed_rows(payload, box_size, border)
+        height = rows.shape[0]
+        # Every PNG scanline starts with a filter type byte (0, no filter)
+        raw = np.hstack([np.zeros((height, 1), dtype=np.uint8), rows]).tobytes()
+
+        def chunk(kind, data):
+            return (
+                struct.pack('>I', len(data)) + kind + data
+                + struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff)
+            )
+
+        return b''.join([
+            b'\x89PNG\r\n\x1a\n',
+            chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 1, 0, 0, 0, 0)),
+            chunk(b'IDAT', zlib.compress(raw, 9)),
+            chunk(b'IEND', b'')
+        ])
+
+    def render_svg(self, payload, border=None):
+        """Render to an SVG document with one path for all dark modules"""
+        border = self.border if border is None else border
+        modules = self.matrix(payload)
+        size = modules.shape[0] + 2 * border
+        # Physical size matches qrcode's SVG output: 1 mm per module at box size 10
+        size_mm = size * self.box_size / 10
+
+        path = ''.join(
+            f'M{x + border},{y + border}h1v1h-1z'
+            for y, x in zip(*np.nonzero(modules))
+        )
+        return (
+            f'<?xml version="1.0" encoding="UTF-8"?>\n'
+            f'<svg xmlns="http://www.w3.org/2000/svg" version="1.1" '
+            f'width="{size_mm:g}mm" height="{size_mm:g}mm" viewBox="0 0 {size} {size}" '
+            f'shape-rendering="crispEdges">'
+            f'<rect width="{size}" height="{size}" fill="#fff"/>'
+            f'<path d="{path}" fill="#000"/></svg>'
+        ).encode('utf-8')
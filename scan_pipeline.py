@@ -0,0 +1,243 @@
+"""
+Barcode and QR code decoding pipeline for uploaded images
+
+Phone cameras upload 12 megapixel photos, and zbar's cost grows with the
+pixel count, while a QR label or an ISBN barcode is usually readable at a
+fraction of that resolution. Uploads are therefore decoded once, straight to
+grayscale, and scanned in stages that stop at the first one finding symbols
+(or, when the caller asks for particular symbol types, once every requested
+type has been found):
+
+1. ``downscaled``: the image shrunk to at most ``SCAN_MAX_DIMENSION`` pixels
+   on its longest side (skipped when the image is already that small)
+2. ``roi``: full-resolution crops of the high-contrast regions found in
+   the downscaled image, for codes too small to read after shrinking
+3. ``full``: the whole full-resolution image
+4. ``threshold``: an adaptive threshold of the working image, for glare,
+   shadows and low-contrast prints
+
+Each stage is timed, so slow scans can be traced to decoding the upload or
+to a particular pass.
+
+Batches of images (an inventory audit photographs whole shelves) are
+scanned in parallel processes by ``scan_images``.
+"""
+
+import base64
+import io
+import multiprocessing
+import os
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+import cv2
+import numpy as np
+from PIL import Image
+from pyzbar import pyzbar
+
+DEFAULT_MAX_DIMENSION = 1280
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.bmp', '.gif', '.tif', '.tiff')
+MAX_REGIONS = 4  # candidate regions decoded at full resolution in the roi stage
+
+def load_grayscale(image_data):
+    """Decode an upload (bytes, a data URL, a PIL image or an array) to a grayscale array"""
+    if isinstance(image_data, str) and image_data.startswith('data:image'):
+        header, data = image_data.split(',', 1)
+        image_data = base64.b64decode(data)
+
+    if isinstance(image_data, (bytes, bytearray)):
+        gray = cv2.imdecode(np.frombuffer(image_data, np.uint8), cv2.IMREAD_GRAYSCALE)
+        if gray is None:
+            # Formats OpenCV cannot read (such as GIF) still go through Pillow
+            gray = np.array(Image.open(io.BytesIO(image_data)).convert('L'))
+        return gray
+
+    if isinstance(image_data, Image.Image):
+        return np.array(image_data.convert('L'))
+
+    image = np.asarray(image_data)
+    if image.ndim == 3:
+        code = cv2.COLOR_BGRA2GRAY if image.shape[2] == 4 else cv2.COLOR_BGR2GRAY
+        image = cv2.cvtColor(image, code)
+    return image
+
+def _to_upload_coordinates(obj, scale=1, offset=(0, 0)):
+    """Map a result's rect and polygon from a downscaled image or a crop back to the upload"""
+    if scale == 1 and offset == (0, 0):
+        return obj
+    x0, y0 = offset
+    rect = obj.rect._replace(
+        left=round(obj.rect.left * scale) + x0,
+        top=round(obj.rect.top * scale) + y0,
+        width=round(obj.rect.width * scale),
+        height=round(obj.rect.height * scale)
+    )
+    polygon = [
+        point._replace(x=round(point.x * scale) + x0, y=round(point.y * scale) + y0)
+        for point in obj.polygon
+    ]
+    return obj._replace(rect=rect, polygon=polygon)
+
+def _regions_of_interest(working, limit=MAX_REGIONS):
+    """Bounding boxes of the largest high-contrast, densely textured areas
+
+    QR codes and barcodes are blocks of sharp black and white edges, so they
+    stand out in a morphological gradient once neighbouring edges are merged.
+    """
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
+    gradient = cv2.morphologyEx(working, cv2.MORPH_GRADIENT, kernel)
+    _, edges = cv2.threshold(gradient, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+    close_size = max(9, min(working.shape) // 40)
+    merged = cv2.morphologyEx(
+        edges, cv2.MORPH_CLOSE, cv2.getStructuringElement(cv2.MORPH_RECT, (close_size, close_size))
+    )
+
+    contours, _ = cv2.findContours(merged, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    # Codes too small to find here are left to the full-resolution pass, and so
+    # are regions covering most of the image, where a crop would save nothing
+    min_area = (min(working.shape) // 60) ** 2
+    max_area = working.shape[0] * working.shape[1] // 2
+    boxes = [cv2.boundingRect(contour) for contour in contours]
+    boxes = [box for box in boxes if min_area <= box[2] * box[3] <= max_area]
+    boxes.sort(key=lambda box: box[2] * box[3], reverse=True)
+    return boxes[:limit]
+
+def _decode_regions(gray, working, scale, symbols):
+    """Decode full-resolution crops around the candidate regions of the working image"""
+    height, width = gray.shape[:2]
+    for x, y, w, h in _regions_of_interest(working):
+        # Pad the box so the quiet zone around the code is included
+        pad_x, pad_y = w // 5 + 2, h // 5 + 2
+        x0, y0 = max(0, round((x - pad_x) * scale)), max(0, round((y - pad_y) * scale))
+        x1, y1 = min(width, round((x + w + pad_x) * scale)), min(height, round((y + h + pad_y) * scale))
+        decoded = pyzbar.decode(gray[y0:y1, x0:x1], symbols=symbols)
+        if decoded:
+            return [_to_upload_coordinates(obj, offset=(x0, y0)) for obj in decoded]
+    return []
+
+def _threshold(gray):
+    # The block has to span several QR modules or bars, or the inside of a
+    # finder pattern is thresholded against itself
+    block_size = max(31, (min(gray.shape) // 4) | 1)
+    return cv2.adaptiveThreshold(
+        gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, block_size, 2
+    )
+
+def decode_symbols(image_data, symbols=None, max_dimension=None):
+    """Find barcodes and QR codes in an image, trying the cheapest passes first
+
+    Without ``symbols`` the scan stops at the first stage that finds
+    anything. With ``symbols`` it goes on while any requested type is still
+    missing, so a QR code on a book cover does not end the scan before the
+    EAN-13 barcode is read, and results from every stage run are merged.
+
+    Returns (decoded, report). ``decoded`` holds pyzbar results with their
+    rects in full-resolution coordinates. ``report`` has the image size, the
+    last stage that found new symbols (None if nothing was found) and
+    per-stage timings in milliseconds.
+    """
+    max_dimension = max_dimension or DEFAULT_MAX_DIMENSION
+    timings = {}
+    report = {'width': None, 'height': None, 'stage': None, 'timings_ms': timings}
+    started = time.perf_counter()
+
+    def finish_stage(name, stage_started):
+        timings[name] = round((time.perf_counter() - stage_started) * 1000, 1)
+
+    stage_started = time.perf_counter()
+    gray = load_grayscale(image_data)
+    report['height'], report['width'] = gray.shape[:2]
+    finish_stage('load', stage_started)
+
+    # Working image for the first pass, and the factor back to full resolution
+    longest = max(gray.shape[:2])
+    scale = longest / max_dimension if longest > max_dimension else 1
+
+    def decode_working(image):
+        return [_to_upload_coordinates(obj, scale) for obj in pyzbar.decode(image, symbols=symbols)]
+    if scale > 1:
+        stage_started = time.perf_counter()
+        working = cv2.resize(
+            gray,
+            (round(gray.shape[1] / scale), round(gray.shape[0] / scale)),
+            interpolation=cv2.INTER_AREA
+        )
+        finish_stage('resize', stage_started)
+        stages = [
+            ('downscaled', lambda: decode_working(working)),
+            ('roi', lambda: _decode_regions(gray, working, scale, symbols)),
+            ('full', lambda: pyzbar.decode(gray, symbols=symbols))
+        ]
+    else:
+        working = gray
+        stages = [('full', lambda: pyzbar.decode(gray, symbols=symbols))]
+    stages.append(('threshold', lambda: decode_working(_threshold(working))))
+
+    wanted = {symbol.name for symbol in symbols} if symbols else None
+    found = {}
+    for name, run_stage in stages:
+        stage_started = time.perf_counter()
+        stage_decoded = run_stage()
+        finish_stage(name, stage_started)
+        for obj in stage_decoded:
+            if (obj.type, obj.data) not in found:
+                found[(obj.type, obj.data)] = obj
+                report['stage'] = name
+        if found and (wanted is None or wanted <= {symbol_type for symbol_type, _ in found}):
+            break
+    decoded = list(found.values())
+
+    timings['total'] = round((time.perf_counter() - started) * 1000, 1)
+    return decoded, report
+
+def server_timing(report):
+    """Format a scan report's timings as a Server-Timing header value"""
+    return ', '.join(f"scan-{name};dur={ms}" for name, ms in report['timings_ms'].items())
+
+def read_image_archive(data, max_images, max_bytes):
+    """Extract the images from a ZIP upload as (filename, bytes) pairs
+
+    Raises ValueError if the archive holds more than ``max_images`` images
+    or more than ``max_bytes`` of them once uncompressed.
+    """
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        members = [
+            info for info in archive.infolist()
+            if not info.is_dir()
+            and info.filename.lower().endswith(IMAGE_EXTENSIONS)
+            and not os.path.basename(info.filename).startswith('.')
+        ]
+        if len(members) > max_images:
+            raise ValueError(f"archive holds {len(members)} images, at most {max_images} are allowed")
+        # Checked before extracting anything, so a ZIP bomb is never inflated
+        if sum(info.file_size for info in members) > max_bytes:
+            raise ValueError(f"archive images exceed {max_bytes // (1024 * 1024)}MB uncompressed")
+        return [(info.filename, archive.read(info)) for info in members]
+
+def scan_image_task(task):
+    """Scan one image in a worker process, returning (decoded, report, error)"""
+    image_data, symbols, max_dimension = task
+    try:
+        decoded, report = decode_symbols(image_data, symbols=symbols, max_dimension=max_dimension)
+        return decoded, report, None
+    except Exception as e:
+        return [], None, str(e)
+
+def scan_processes(config, image_count):
+    """Number of scan processes worth starting for a batch of ``image_count`` images"""
+    # Starting processes costs more than scanning a couple of images inline
+    if image_count <= 2:
+        return 1
+    return min(config['SCAN_PROCESSES'] or os.cpu_count() or 1, image_count)
+
+def scan_images(images, processes, symbols=None, max_dimension=None):
+    """Scan many images, returning (decoded, report, error) for each in input order"""
+    tasks = [(image_data, symbols, max_dimension) for image_data in images]
+    if processes <= 1:
+        return [scan_image_task(task) for task in tasks]
+
+    # Spawned rather than forked: the web workers run threads (ISBN lookups),
+    # and forking a threaded process can deadlock the child
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=processes, mp_context=context) as executor:
+        return list(executor.map(scan_image_task, tasks))
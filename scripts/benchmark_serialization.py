@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Benchmark book listing serialization
+Seeds an in-memory catalogue (10,000 books by default) and times the two
+ways of turning it into a JSON listing:
+
+- ORM: load Book instances and call to_dict() on each
+- rows: select the columns and build the dicts with rows_to_dicts()
+
+each encoded with the stdlib encoder and, when installed, orjson. The last
+line times GET /api/books for the whole catalogue through the app.
+Nothing is written to the configured database.
+"""
+
+import sys
+import os
+import argparse
+import time
+from datetime import date, datetime, timedelta
+
+# Benchmark against the in-memory testing database
+os.environ['FLASK_ENV'] = 'testing'
+
+# Add the parent directory to Python path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import insert
+from app import app
+from models import db, Book, BOOK_FIELDS
+from serialization import FastJSONProvider, rows_to_dicts, orjson
+
+def seed_books(count):
+    """Insert ``count`` books with every listed field filled in"""
+    now = datetime.utcnow()
+    db.session.execute(insert(Book), [
+        {
+            'isbn': f'978{i:010d}',
+            'title': f'Lịch sử thư viện, tập {i}',
+            'author': f'Tác giả {i % 500}',
+            'publisher': 'Nhà xuất bản Trẻ',
+            'publication_date': date(1990, 1, 1) + timedelta(days=i),
+            'categories': 'History, Libraries',
+            'description': 'A survey of public libraries and their catalogues. ' * 4,
+            'pages': 100 + i % 400,
+            'thumbnail_url': f'https://covers.example.org/{i}.jpg',
+            'location': f'A{i % 40}-{i % 7}',
+            'added_date': now,
+            'last_updated': now
+        }
+        for i in range(count)
+    ])
+    db.session.commit()
+
+def best_of(repeat, func):
+    """Fastest of ``repeat`` runs, in milliseconds, and the last result"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        timings.append((time.perf_counter() - started) * 1000)
+        db.session.expunge_all()
+    return min(timings), result
+
+def load_orm():
+    return [book.to_dict() for book in Book.query.order_by(Book.id).all()]
+
+def load_rows():
+    columns = [getattr(Book, field) for field in BOOK_FIELDS]
+    return rows_to_dicts(db.session.execute(db.select(*columns).order_by(Book.id)), columns)
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark ORM and row-tuple serialization of the book listing')
+    parser.add_argument('--books', type=int, default=10000, help='Books in the catalogue')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per measurement; the fastest is reported')
+    args = parser.parse_args()
+
+    encoders = [('stdlib', DefaultJSONProvider(app))]
+    if orjson is not None:
+        encoders.append(('orjson', FastJSONProvider(app)))
+    else:
+        print("⚠️  orjson is not installed; only the stdlib encoder is measured")
+
+    with app.app_context():
+        try:
+            db.create_all()
+            print(f"📚 Seeding {args.books} books...")
+            seed_books(args.books)
+
+            print(f"⏱️  Best of {args.repeat} runs (ms)")
+            print(f"   {'path':<14}{'build dicts':>12}{'encode':>10}{'total':>10}")
+            for path, load in [('ORM', load_orm), ('rows', load_rows)]:
+                build_ms, books = best_of(args.repeat, load)
+                for name, provider in encoders:
+                    encode_ms, body = best_of(args.repeat, lambda: provider.dumps({'books': books}, separators=(',', ':')))
+                    print(f"   {path + ' + ' + name:<14}{build_ms:>12.1f}{encode_ms:>10.1f}{build_ms + encode_ms:>10.1f}")
+
+            client = app.test_client()
+            url = f'/api/books?per_page={args.books}'
+            request_ms, response = best_of(args.repeat, lambda: client.get(url))
+            print(f"🌐 GET {url}: {request_ms:.1f} ms, {len(response.get_data()) // 1024} KiB ({type(app.json).__name__})")
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Benchmark failed: {e}")
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
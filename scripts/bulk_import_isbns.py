@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Bulk import books by ISBN
+Reads a CSV file (with an "isbn" header and optional copies, location, title
+and author columns) or a plain list of ISBNs, one per line, resolves the
+metadata concurrently and adds the books in batched transactions. Books that
+are already in the catalogue gain copies instead.
+
+Usage:
+    python scripts/bulk_import_isbns.py donation.csv
+    python scripts/bulk_import_isbns.py isbns.txt --location "Shelf A" --report results.csv
+"""
+
+import argparse
+import csv
+import sys
+import os
+
+# Add the parent directory to Python path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app, isbn_scanner, isbn_cache
+from models import db
+from bulk_import import parse_import_csv, import_books
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk import books by ISBN')
+    parser.add_argument('file', help='CSV file or list of ISBNs, one per line')
+    parser.add_argument('--location', help='Shelf location for rows that do not specify one')
+    parser.add_argument('--concurrency', type=int, help='ISBNs to resolve at the same time')
+    parser.add_argument('--batch-size', type=int, help='Books written per transaction')
+    parser.add_argument('--report', help='Write per-row results to this CSV file')
+    args = parser.parse_args()
+
+    with open(args.file, encoding='utf-8-sig') as f:
+        rows = parse_import_csv(f.read())
+
+    if args.location:
+        for row in rows:
+            row.setdefault('location', args.location)
+
+    print(f"📚 Importing {len(rows)} rows from {args.file}...")
+
+    def progress(done, total):
+        if done % 50 == 0 or done == total:
+            print(f"   🔎 Resolved metadata for {done}/{total} new ISBNs")
+
+    with app.app_context():
+        try:
+            db.create_all()
+            report = import_books(
+                rows, isbn_scanner, isbn_cache,
+                concurrency=args.concurrency,
+                batch_size=args.batch_size,
+                progress=progress
+            )
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Import failed: {e}")
+            sys.exit(1)
+
+    summary = report['summary']
+    print(f"✅ Created {summary['created']} books, added copies to {summary['updated']}")
+    for status in ['not_found', 'lookup_failed', 'invalid', 'error']:
+        if summary[status]:
+            print(f"⚠️  {summary[status]} rows {status.replace('_', ' ')}")
+
+    for result in report['results']:
+        if result['status'] in ['not_found', 'lookup_failed', 'invalid', 'error']:
+            print(f"   Row {result['row']} ({result['isbn']}): {result['message']}")
+
+    if args.report:
+        with open(args.report, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=['row', 'isbn', 'status', 'book_id', 'message'])
+            writer.writeheader()
+            writer.writerows(report['results'])
+        print(f"📝 Wrote per-row results to {args.report}")
+
+    if summary['error']:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Check that the hot queries in app.py are served by indexes
+Runs EXPLAIN (PostgreSQL) or EXPLAIN QUERY PLAN (SQLite) for each query on
+the circulation and listing paths and reports any that fall back to a full
+table scan. Exits with status 1 if any query does not use an index.
+
+On PostgreSQL sequential scans are disabled for the check, so small tables
+still show whether an index *can* serve the query.
+"""
+
+import sys
+import os
+from datetime import datetime
+
+# Add the parent directory to Python path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+from models import db, Book, Member, Transaction, OPEN_LOAN_STATUSES
+from categories import category_filter
+from sqlalchemy import select, func, text
+
+# The filters below mirror the queries issued by the endpoints in app.py
+HOT_QUERIES = [
+    (
+        'member counter reconciliation: count member active loans',
+        select(func.count()).select_from(Transaction).where(
+            Transaction.member_id == 1,
+            Transaction.transaction_type == 'borrow',
+            Transaction.status.in_(OPEN_LOAN_STATUSES)
+        )
+    ),
+    (
+        'checkin / status: find book active loans',
+        select(Transaction.id).where(
+            Transaction.book_id == 1,
+            Transaction.transaction_type == 'borrow',
+            Transaction.status.in_(OPEN_LOAN_STATUSES)
+        )
+    ),
+    (
+        'recent transactions: latest borrows',
+        select(Transaction.id).where(
+            Transaction.transaction_type == 'borrow'
+        ).order_by(Transaction.transaction_date.desc()).limit(10)
+    ),
+    (
+        'batch checkin: member active loans of books',
+        select(Transaction.id).where(
+            Transaction.book_id.in_([1, 2]),
+            Transaction.member_id == 1,
+            Transaction.transaction_type == 'borrow',
+            Transaction.status.in_(OPEN_LOAN_STATUSES)
+        )
+    ),
+    (
+        'overdue sweep / listing: loans past due',
+        select(Transaction.id).where(
+            Transaction.transaction_type == 'borrow',
+            Transaction.status.in_(OPEN_LOAN_STATUSES),
+            Transaction.due_date < datetime(2025, 1, 1)
+        ).order_by(Transaction.due_date).limit(50)
+    ),
+    (
+        'delete book: count transactions',
+        select(func.count()).select_from(Transaction).where(Transaction.book_id == 1)
+    ),
+    (
+        'books listing: filter by status',
+        select(Book.id).where(Book.status == 'available').limit(10)
+    ),
+    (
+        'books listing: filter by category',
+        select(Book.id).where(category_filter('Fiction')).limit(10)
+    ),
+    (
+        'circulation: book by uuid',
+        select(Book.id).where(Book.uuid == '00000000-0000-0000-0000-000000000000')
+    ),
+    (
+        'member lookup: by employee code',
+        select(Member.id).where(Member.employee_code == 'EMP000')
+    ),
+]
+
+def explain(statement):
+    """Return the query plan lines for a statement"""
+    dialect = db.engine.dialect
+    sql = str(statement.compile(dialect=dialect, compile_kwargs={'literal_binds': True}))
+    
+    if dialect.name == 'sqlite':
+        rows = db.session.execute(text(f"EXPLAIN QUERY PLAN {sql}")).fetchall()
+        return [row[-1] for row in rows]
+    elif dialect.name == 'postgresql':
+        db.session.execute(text("SET LOCAL enable_seqscan = off"))
+        rows = db.session.execute(text(f"EXPLAIN {sql}")).fetchall()
+        return [row[0] for row in rows]
+    else:
+        raise ValueError(f"Unsupported database type: {dialect.name}")
+
+def uses_index(plan):
+    """Check a plan for index access and the absence of full table scans"""
+    if db.engine.dialect.name == 'sqlite':
+        full_scans = [line for line in plan if line.startswith('SCAN') and 'USING' not in line]
+        index_access = [line for line in plan if 'USING' in line and 'TEMP B-TREE' not in line]
+        return bool(index_access) and not full_scans
+    
+    plan_text = '\n'.join(plan)
+    return 'Index' in plan_text and 'Seq Scan' not in plan_text
+
+def main():
+    print("🔍 Checking query plans for hot queries")
+    print("=" * 50)
+    
+    failures = 0
+    with app.app_context():
+        print(f"Database type: {db.engine.dialect.name}\n")
+        
+        for name, statement in HOT_QUERIES:
+            try:
+                plan = explain(statement)
+            except Exception as e:
+                db.session.rollback()
+                print(f"❌ {name}: could not explain query ({e})")
+                failures += 1
+                continue
+            finally:
+                db.session.rollback()
+            
+            if uses_index(plan):
+                print(f"✅ {name}")
+            else:
+                print(f"❌ {name}")
+                failures += 1
+            for line in plan:
+                print(f"      {line}")
+    
+    print()
+    if failures:
+        print(f"💥 {failures} hot query(s) are not using an index. Run scripts/migrate_add_circulation_indexes.py")
+        sys.exit(1)
+    print("🎉 All hot queries use an index")
+
+if __name__ == '__main__':
+    main()
@@ -47,6 +47,11 @@ REM Function to run database migrations
 :run_migrations
 echo 🔄 Running database migrations...
 docker compose exec -T library-app python scripts/migrate_add_thumbnail_url_universal.py
+if not errorlevel 1 docker compose exec -T library-app python scripts/migrate_add_search_index.py
+if not errorlevel 1 docker compose exec -T library-app python scripts/migrate_add_circulation_indexes.py
+if not errorlevel 1 docker compose exec -T library-app python scripts/migrate_add_member_counters.py
+if not errorlevel 1 docker compose exec -T library-app python scripts/migrate_add_categories.py
+if not errorlevel 1 docker compose exec -T library-app python scripts/migrate_canonicalize_isbns.py
 if not errorlevel 1 (
     echo ✅ Database migrations completed successfully!
     goto :eof
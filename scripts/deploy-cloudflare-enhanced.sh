@@ -45,8 +45,13 @@ check_health() {
 run_migrations() {
     echo "🔄 Running database migrations..."
     
-    # Run the universal migration script that works with both SQLite and PostgreSQL
-    if docker compose exec -T library-app python scripts/migrate_add_thumbnail_url_universal.py; then
+    # Run the universal migration scripts that work with both SQLite and PostgreSQL
+    if docker compose exec -T library-app python scripts/migrate_add_thumbnail_url_universal.py && \
+       docker compose exec -T library-app python scripts/migrate_add_search_index.py && \
+       docker compose exec -T library-app python scripts/migrate_add_circulation_indexes.py && \
+       docker compose exec -T library-app python scripts/migrate_add_member_counters.py && \
+       docker compose exec -T library-app python scripts/migrate_add_categories.py && \
+       docker compose exec -T library-app python scripts/migrate_canonicalize_isbns.py; then
         echo "✅ Database migrations completed successfully!"
         return 0
     else
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Generate QR label sheets for books
+Renders print-ready sheets of book labels (QR code, title, author, shelf
+location and ISBN) for a shelf, a date range of acquisitions or a list of
+book ids. Pages are rendered in parallel processes and written as they
+finish, so a whole floor of books can be relabelled in one run.
+
+Usage:
+    python scripts/generate_book_labels.py --location A1 --output shelf-a1.pdf
+    python scripts/generate_book_labels.py --added-from 2024-01-01 --added-to 2024-03-31
+    python scripts/generate_book_labels.py --ids 12,15,19 --format png --output labels.zip
+"""
+
+import argparse
+import sys
+import os
+import time
+
+# Add the parent directory to Python path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate QR label sheets for books')
+    parser.add_argument('--location', help='Only books whose shelf location starts with this')
+    parser.add_argument('--added-from', help='Only books added on or after this date (YYYY-MM-DD)')
+    parser.add_argument('--added-to', help='Only books added on or before this date (YYYY-MM-DD)')
+    parser.add_argument('--ids', help='Comma-separated book ids')
+    parser.add_argument('--format', choices=['pdf', 'png'], default='pdf', help='PDF, or a ZIP of PNG pages')
+    parser.add_argument('--columns', type=int, help='Labels across each sheet')
+    parser.add_argument('--rows', type=int, help='Labels down each sheet')
+    parser.add_argument('--processes', type=int, help='Render processes (default: CPU count)')
+    parser.add_argument('--output', help='Output file (default: book-labels.pdf or book-labels.zip)')
+    args = parser.parse_args()
+
+    # Imported here rather than at module level: render processes are spawned
+    # and re-import this script, and they do not need the web application
+    from sqlalchemy import select, func
+    from app import app, qr_manager, parse_label_filters
+    from models import db
+    from labels import default_layout, label_books_query, label_pages, label_sheet_stream, render_processes
+
+    output = args.output or f"book-labels.{'zip' if args.format == 'png' else 'pdf'}"
+
+    with app.app_context():
+        try:
+            filters = parse_label_filters({
+                'location': args.location,
+                'added_from': args.added_from,
+                'added_to': args.added_to,
+                'ids': args.ids
+            })
+        except ValueError as e:
+            print(f"❌ Invalid filters: {e}")
+            sys.exit(1)
+
+        layout = default_layout(app.config)
+        layout['columns'] = args.columns or layout['columns']
+        layout['rows'] = args.rows or layout['rows']
+        labels_per_page = layout['columns'] * layout['rows']
+
+        statement = label_books_query(**filters)
+        book_count = db.session.scalar(select(func.count()).select_from(statement.subquery()))
+        if not book_count:
+            print("⚠️  No books match these filters")
+            return
+
+        page_count = -(-book_count // labels_per_page)
+        processes = args.processes or render_processes(app.config, page_count)
+        print(f"🏷️  Rendering {book_count} labels on {page_count} pages with {processes} process(es)...")
+
+        started = time.time()
+        pages = label_pages(
+            statement, labels_per_page,
+            lambda book_uuid: qr_manager.build_payload(book_uuid, deterministic=True)
+        )
+        with open(output, 'wb') as f:
+            for chunk in label_sheet_stream(layout, pages, args.format, processes):
+                f.write(chunk)
+
+        print(f"✅ Wrote {output} in {time.time() - started:.1f}s")
+
+if __name__ == '__main__':
+    main()
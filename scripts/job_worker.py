@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Background job worker
+Runs queued jobs (external ISBN lookups, bulk imports) from the jobs table
+so slow work never ties up the web workers. Run one or more of these next
+to gunicorn; they coordinate through the database, no broker is needed.
+
+Usage:
+    python scripts/job_worker.py           # Run until interrupted
+    python scripts/job_worker.py --once    # Drain the queue and exit (e.g. from cron)
+"""
+
+import argparse
+import sys
+import os
+
+# Add the parent directory to Python path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+from models import db
+from jobs import work, default_worker_id
+
+def main():
+    parser = argparse.ArgumentParser(description='Run background jobs from the jobs table')
+    parser.add_argument('--once', action='store_true', help='Exit once the queue is empty')
+    parser.add_argument('--poll-interval', type=float, help='Seconds to wait between polls of an empty queue')
+    args = parser.parse_args()
+
+    worker_id = default_worker_id()
+    print(f"⚙️  Job worker {worker_id} starting...")
+
+    with app.app_context():
+        db.create_all()
+        try:
+            work(worker_id=worker_id, poll_interval=args.poll_interval, once=args.once)
+        except KeyboardInterrupt:
+            print("👋 Job worker stopped")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Database migration script for normalized book categories
+Creates the categories and book_categories tables and links every book to
+the categories in its comma-separated categories column.
+Works with both SQLite and PostgreSQL. Safe to run more than once.
+"""
+
+import sys
+import os
+
+# Add the parent directory to Python path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+from models import db, Book, Category, book_categories
+from categories import link_categories
+from sqlalchemy import select, func
+
+def create_tables():
+    """Create the category tables and their index if they do not exist yet"""
+    inspector = db.inspect(db.engine)
+    for table in (Category.__table__, book_categories):
+        if inspector.has_table(table.name):
+            print(f"✅ {table.name} table already exists")
+        else:
+            print(f"➕ Creating {table.name} table...")
+            table.create(db.engine)
+
+def link_books(batch_size):
+    """Link books to their categories, one batch of books per transaction"""
+    linked = 0
+    after = 0
+    while True:
+        books = (
+            Book.query
+            .filter(Book.id > after, Book.categories.isnot(None))
+            .order_by(Book.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not books:
+            return linked
+        link_categories(db.session, books)
+        db.session.commit()
+        linked += len(books)
+        after = books[-1].id
+        print(f"   {linked} book(s) linked...")
+
+def main():
+    print("🚀 Starting database migration: Add book categories")
+    print("=" * 50)
+    
+    with app.app_context():
+        try:
+            print(f"🔍 Detected database type: {db.engine.dialect.name}")
+            create_tables()
+            print("🏷️  Splitting book categories...")
+            linked = link_books(app.config['EXPORT_BATCH_SIZE'])
+            categories = db.session.scalar(select(func.count()).select_from(Category))
+            print(f"✅ Linked {linked} book(s) to {categories} categories")
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Error during migration: {e}")
+            print("💥 Migration failed!")
+            sys.exit(1)
+    
+    print("🎉 Migration completed successfully!")
+
+if __name__ == '__main__':
+    main()
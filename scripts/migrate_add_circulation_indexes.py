@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Database migration script for circulation indexes
+Creates the indexes declared on the books and transactions models (composite
+indexes for open-loan lookups, recent activity and the overdue sweep, plus
+partial open-loan indexes on PostgreSQL) on databases created before they
+existed.
+Works with both SQLite and PostgreSQL. Safe to run more than once.
+"""
+
+import sys
+import os
+
+# Add the parent directory to Python path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+from models import db, Book, Transaction
+
+def create_indexes():
+    """Create any model indexes that do not exist yet"""
+    inspector = db.inspect(db.engine)
+    created = 0
+    
+    for model in (Book, Transaction):
+        table_name = model.__tablename__
+        existing = {index['name'] for index in inspector.get_indexes(table_name)}
+        
+        for index in sorted(model.__table__.indexes, key=lambda index: index.name):
+            if index.name in existing:
+                print(f"✅ {index.name} already exists")
+                continue
+            
+            # Partial indexes are only declared for PostgreSQL
+            if index.dialect_options['postgresql']['where'] is not None and db.engine.dialect.name != 'postgresql':
+                print(f"⏭️  {index.name} is PostgreSQL-only, skipping")
+                continue
+            
+            print(f"📇 Creating {index.name} on {table_name}...")
+            index.create(bind=db.engine, checkfirst=True)
+            created += 1
+    
+    return created
+
+def main():
+    print("🚀 Starting database migration: Add circulation indexes")
+    print("=" * 50)
+    
+    with app.app_context():
+        try:
+            print(f"🔍 Detected database type: {db.engine.dialect.name}")
+            created = create_indexes()
+            print(f"✅ Created {created} index(es)")
+        except Exception as e:
+            print(f"❌ Error during migration: {e}")
+            print("💥 Migration failed!")
+            sys.exit(1)
+    
+    print("🎉 Migration completed successfully!")
+    print("Run scripts/check_query_plans.py to verify the hot queries use them.")
+
+if __name__ == '__main__':
+    main()
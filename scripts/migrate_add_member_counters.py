@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Database migration script for member loan counters
+Adds the active_loans and fines_outstanding columns to the members table and
+fills them from the transactions table.
+Works with both SQLite and PostgreSQL. Safe to run more than once.
+"""
+
+import sys
+import os
+
+# Add the parent directory to Python path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+from models import db
+from circulation import reconcile_member_counters
+from sqlalchemy import text
+
+COLUMNS = {
+    'active_loans': 'INTEGER NOT NULL DEFAULT 0',
+    'fines_outstanding': 'FLOAT NOT NULL DEFAULT 0'
+}
+
+def add_columns():
+    """Add any counter columns that do not exist yet"""
+    inspector = db.inspect(db.engine)
+    existing = {column['name'] for column in inspector.get_columns('members')}
+    
+    with db.engine.connect() as conn:
+        for name, definition in COLUMNS.items():
+            if name in existing:
+                print(f"✅ members.{name} already exists")
+                continue
+            print(f"➕ Adding members.{name}...")
+            conn.execute(text(f"ALTER TABLE members ADD COLUMN {name} {definition}"))
+        conn.commit()
+
+def main():
+    print("🚀 Starting database migration: Add member loan counters")
+    print("=" * 50)
+    
+    with app.app_context():
+        try:
+            print(f"🔍 Detected database type: {db.engine.dialect.name}")
+            add_columns()
+            print("🔢 Filling counters from the transactions table...")
+            drift = reconcile_member_counters()
+            print(f"✅ Set counters for {len(drift)} member(s) with loans or fines")
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Error during migration: {e}")
+            print("💥 Migration failed!")
+            sys.exit(1)
+    
+    print("🎉 Migration completed successfully!")
+
+if __name__ == '__main__':
+    main()
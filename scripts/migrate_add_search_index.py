@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Database migration script for the full-text search index
+Adds the books.search_text column, fills it for existing books and builds the
+inverted index used by smart search. Works with both SQLite (FTS5) and
+PostgreSQL (tsvector + GIN, plus pg_trgm indexes for fuzzy search).
+Safe to run more than once.
+"""
+
+import sys
+import os
+
+# Add the parent directory to Python path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+from models import db, Book
+from search import ensure_search_index
+from sqlalchemy import text
+
+BATCH_SIZE = 500
+
+def add_search_text_column():
+    """Add the search_text column to the books table if it is missing"""
+    inspector = db.inspect(db.engine)
+    columns = [col['name'] for col in inspector.get_columns('books')]
+    
+    if 'search_text' in columns:
+        print("✅ search_text column already exists in books table")
+        return
+    
+    print("📚 Adding search_text column to books table...")
+    db.session.execute(text("ALTER TABLE books ADD COLUMN search_text TEXT"))
+    db.session.commit()
+    print("✅ Added search_text column")
+
+def populate_search_text():
+    """Fill search_text for every existing book in batches"""
+    updated_count = 0
+    last_id = 0
+    
+    while True:
+        books = Book.query.filter(Book.id > last_id).order_by(Book.id).limit(BATCH_SIZE).all()
+        if not books:
+            break
+        
+        for book in books:
+            book.update_normalized_fields()
+        last_id = books[-1].id
+        db.session.commit()
+        
+        updated_count += len(books)
+        print(f"   Indexed {updated_count} books...")
+    
+    print(f"✅ Populated search text for {updated_count} books")
+
+def main():
+    print("🚀 Starting database migration: Add full-text search index")
+    print("=" * 50)
+    
+    with app.app_context():
+        try:
+            print(f"🔍 Detected database type: {db.engine.dialect.name}")
+            add_search_text_column()
+            populate_search_text()
+            
+            print("🔎 Building full-text index...")
+            ensure_search_index()
+            print("✅ Full-text index is ready")
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Error during migration: {e}")
+            print("💥 Migration failed!")
+            sys.exit(1)
+    
+    print("🎉 Migration completed successfully!")
+
+if __name__ == '__main__':
+    main()
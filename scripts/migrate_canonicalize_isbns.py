@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Database migration script for the stored ISBN form
+Rewrites book ISBNs saved with hyphens or spaces (978-0-13-468599-1) to the
+digits-only form that adding books and bulk import now store and match on
+(9780134685991), so existing books are found instead of duplicated.
+A book whose digits-only ISBN already belongs to another book is left as it
+is and reported, so the two can be merged by hand.
+Works with both SQLite and PostgreSQL. Safe to run more than once.
+"""
+
+import sys
+import os
+
+# Add the parent directory to Python path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+from models import db, Book
+from utils import canonical_isbn
+from sqlalchemy import or_
+
+def canonicalize_isbns(batch_size):
+    """Rewrite non-canonical ISBNs one batch of books per transaction; returns (updated, conflicts)"""
+    updated = 0
+    conflicts = []
+    after = 0
+    while True:
+        books = (
+            Book.query
+            .filter(
+                Book.id > after,
+                or_(Book.isbn.contains('-'), Book.isbn.contains(' '), Book.isbn.endswith('x'))
+            )
+            .order_by(Book.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not books:
+            return updated, conflicts
+
+        wanted = {book.id: canonical_isbn(book.isbn) for book in books}
+        taken = {
+            isbn for (isbn,) in
+            db.session.query(Book.isbn).filter(Book.isbn.in_({isbn for isbn in wanted.values() if isbn}))
+        }
+        for book in books:
+            isbn = wanted[book.id]
+            if not isbn or isbn == book.isbn:
+                continue
+            if isbn in taken:
+                conflicts.append((book.id, book.isbn, isbn))
+                continue
+            book.isbn = isbn
+            taken.add(isbn)
+            updated += 1
+        db.session.commit()
+        after = books[-1].id
+
+def main():
+    print("🚀 Starting database migration: Canonicalize book ISBNs")
+    print("=" * 50)
+
+    with app.app_context():
+        try:
+            print(f"🔍 Detected database type: {db.engine.dialect.name}")
+            print("🔢 Rewriting hyphenated ISBNs...")
+            updated, conflicts = canonicalize_isbns(app.config['EXPORT_BATCH_SIZE'])
+            print(f"✅ Rewrote {updated} ISBN(s)")
+            for book_id, isbn, canonical in conflicts:
+                print(f"⚠️  Book {book_id} keeps ISBN {isbn}: {canonical} belongs to another book, merge them by hand")
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Error during migration: {e}")
+            print("💥 Migration failed!")
+            sys.exit(1)
+
+    print("🎉 Migration completed successfully!")
+
+if __name__ == '__main__':
+    main()
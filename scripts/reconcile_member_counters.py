@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Reconcile member loan counters
+Recomputes every member's active_loans and fines_outstanding counters from
+the transactions table and reports any drift from the values maintained by
+checkout and checkin. Safe to run from cron at any interval.
+"""
+
+import sys
+import os
+
+# Add the parent directory to Python path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+from models import db
+from circulation import reconcile_member_counters
+
+def main():
+    print("👥 Reconciling member loan counters...")
+    
+    with app.app_context():
+        try:
+            db.create_all()
+            drift = reconcile_member_counters()
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Reconciliation failed: {e}")
+            sys.exit(1)
+        
+        if drift:
+            print(f"⚠️  Corrected drift for {len(drift)} member(s):")
+            for member_id, changes in drift.items():
+                for name, values in changes.items():
+                    print(f"   {member_id} {name}: stored {values['stored']} -> actual {values['actual']}")
+        else:
+            print("✅ All member counters were already accurate")
+
+if __name__ == '__main__':
+    main()
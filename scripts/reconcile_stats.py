@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Reconcile dashboard statistics
+Recomputes the library_stats counters from the books, members and
+transactions tables and reports any drift from the incrementally
+maintained values. Safe to run from cron at any interval.
+"""
+
+import sys
+import os
+
+# Add the parent directory to Python path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+from models import db
+from stats import reconcile_library_stats
+
+def main():
+    print("📊 Reconciling dashboard statistics...")
+    
+    with app.app_context():
+        try:
+            db.create_all()
+            stats, drift = reconcile_library_stats()
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Reconciliation failed: {e}")
+            sys.exit(1)
+        
+        if drift:
+            print(f"⚠️  Corrected drift in {len(drift)} counter(s):")
+            for name, values in drift.items():
+                print(f"   {name}: stored {values['stored']} -> actual {values['actual']}")
+        else:
+            print("✅ All counters were already accurate")
+        
+        for name, value in stats.to_dict().items():
+            print(f"   {name}: {value}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+Overdue loan sweep
+Marks loans past their due date as overdue and accrues their fines, adding
+the increase to the member and dashboard fine counters. Safe to run from
+cron at any interval (hourly or daily is typical), also alongside the
+in-process sweep enabled by OVERDUE_SWEEP_INTERVAL.
+"""
+
+import sys
+import os
+
+# Add the parent directory to Python path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+from models import db
+from overdue import sweep_overdue_loans
+
+def main():
+    print("⏰ Sweeping overdue loans...")
+    
+    with app.app_context():
+        try:
+            db.create_all()
+            summary = sweep_overdue_loans()
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Sweep failed: {e}")
+            sys.exit(1)
+        
+        print(f"   Newly overdue loans: {summary['marked_overdue']}")
+        print(f"   Fines accrued: {summary['fines_accrued']} (+${summary['fines_added']:.2f})")
+        print("✅ Overdue sweep complete")
+
+if __name__ == '__main__':
+    main()
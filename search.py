@@ -0,0 +1,325 @@
+"""
+Full-text and fuzzy search indexes for the book catalogue
+
+Each book carries a ``search_text`` column holding the accent-stripped,
+lowercased title, author, ISBN, categories and description, maintained by
+``Book.update_normalized_fields``. That column is indexed with an inverted
+index native to the database:
+
+- PostgreSQL: a GIN index over ``to_tsvector('simple', search_text)``
+- SQLite: an FTS5 external-content table ``books_fts`` kept in sync by triggers
+
+Because accents are removed in Python before the text is stored and before
+the query is built, Vietnamese search behaves the same on both databases
+without the ``unaccent`` extension.
+
+Fuzzy (typo-tolerant) search ranks books by trigram similarity against the
+normalized title and author. PostgreSQL uses ``pg_trgm`` GIN indexes when
+they are installed; other databases use the in-process ``TrigramIndex``.
+"""
+
+import re
+import threading
+from collections import defaultdict
+from sqlalchemy import event, text, func, column, literal, or_, DDL
+from models import db, Book
+from http_cache import table_versions
+from utils import normalize_vietnamese_text, create_search_variants, isbn_variants
+
+POSTGRES_INDEX_NAME = 'idx_books_search_text_fts'
+SQLITE_FTS_TABLE = 'books_fts'
+
+POSTGRES_DDL = [
+    f"CREATE INDEX IF NOT EXISTS {POSTGRES_INDEX_NAME} ON books "
+    "USING GIN (to_tsvector('simple', coalesce(search_text, '')))"
+]
+
+POSTGRES_TRGM_INDEX_NAME = 'idx_books_title_normalized_trgm'
+
+# pg_trgm needs CREATE EXTENSION privileges, so these only run from the migration
+POSTGRES_TRGM_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    f"CREATE INDEX IF NOT EXISTS {POSTGRES_TRGM_INDEX_NAME} ON books "
+    "USING GIN (title_normalized gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS idx_books_author_normalized_trgm ON books "
+    "USING GIN (author_normalized gin_trgm_ops)"
+]
+
+SQLITE_DDL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {SQLITE_FTS_TABLE} USING fts5("
+    "search_text, content='books', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    f"CREATE TRIGGER IF NOT EXISTS books_fts_ai AFTER INSERT ON books BEGIN "
+    f"INSERT INTO {SQLITE_FTS_TABLE}(rowid, search_text) VALUES (new.id, new.search_text); END",
+    f"CREATE TRIGGER IF NOT EXISTS books_fts_ad AFTER DELETE ON books BEGIN "
+    f"INSERT INTO {SQLITE_FTS_TABLE}({SQLITE_FTS_TABLE}, rowid, search_text) "
+    "VALUES ('delete', old.id, old.search_text); END",
+    f"CREATE TRIGGER IF NOT EXISTS books_fts_au AFTER UPDATE OF search_text ON books BEGIN "
+    f"INSERT INTO {SQLITE_FTS_TABLE}({SQLITE_FTS_TABLE}, rowid, search_text) "
+    "VALUES ('delete', old.id, old.search_text); "
+    f"INSERT INTO {SQLITE_FTS_TABLE}(rowid, search_text) VALUES (new.id, new.search_text); END"
+]
+
+# Create the index alongside the books table for new databases. The FTS5 table
+# is not part of the metadata, so it is dropped explicitly with the books table.
+for statement in POSTGRES_DDL:
+    event.listen(Book.__table__, 'after_create', DDL(statement).execute_if(dialect='postgresql'))
+for statement in SQLITE_DDL:
+    event.listen(Book.__table__, 'after_create', DDL(statement).execute_if(dialect='sqlite'))
+event.listen(
+    Book.__table__, 'before_drop',
+    DDL(f"DROP TABLE IF EXISTS {SQLITE_FTS_TABLE}").execute_if(dialect='sqlite')
+)
+
+# Caches of whether each engine has the indexes, so the checks run once per process
+_index_available = {}
+_trgm_available = {}
+
+# Queries made of ISBN characters also match the start of indexed ISBNs
+ISBN_FRAGMENT = re.compile(r'^[0-9]{4,}x?$')
+
+def search_terms(search):
+    """Split a search string into normalized index terms"""
+    return re.findall(r'\w+', normalize_vietnamese_text(search))
+
+def search_index_available():
+    """Check whether the current database has the full-text index installed"""
+    engine = db.engine
+    if engine not in _index_available:
+        try:
+            if engine.dialect.name == 'sqlite':
+                result = db.session.execute(text(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"
+                ), {'name': SQLITE_FTS_TABLE})
+            elif engine.dialect.name == 'postgresql':
+                result = db.session.execute(text(
+                    "SELECT 1 FROM pg_indexes WHERE indexname = :name"
+                ), {'name': POSTGRES_INDEX_NAME})
+            else:
+                result = None
+            _index_available[engine] = result is not None and result.first() is not None
+        except Exception as e:
+            print(f"Full-text index check failed: {e}")
+            db.session.rollback()
+            _index_available[engine] = False
+    return _index_available[engine]
+
+def full_text_filter(search):
+    """Build a filter clause that matches books through the full-text index
+
+    Every term must match the start of a word, so partially typed words still
+    find results. An ISBN, with or without hyphens, matches the book in either
+    its ISBN-13 or ISBN-10 form, and the start of an ISBN typed with or
+    without hyphens matches as a prefix of either form. Returns None when the
+    search has no indexable terms.
+    """
+    isbn_forms = isbn_variants(search)
+    if isbn_forms:
+        return _index_match(isbn_forms, match_all=False)
+
+    terms = search_terms(search)
+    index_filter = _index_match(terms, match_all=True) if terms else None
+
+    # ISBNs are indexed as one term each, so a hyphenated number is also tried joined up
+    digits = re.sub(r'[\s-]', '', search).lower()
+    if not ISBN_FRAGMENT.match(digits) or terms == [digits]:
+        return index_filter
+    isbn_filter = _index_match([digits], match_all=True)
+    return isbn_filter if index_filter is None else or_(index_filter, isbn_filter)
+
+def _index_match(terms, match_all):
+    """Match indexed words starting with all (or any) of ``terms``"""
+    if db.engine.dialect.name == 'postgresql':
+        tsquery = (' & ' if match_all else ' | ').join(f'{term}:*' for term in terms)
+        return func.to_tsvector('simple', func.coalesce(Book.search_text, '')).op('@@', is_comparison=True)(
+            func.to_tsquery('simple', tsquery)
+        )
+
+    fts_query = (' ' if match_all else ' OR ').join(f'"{term}"*' for term in terms)
+    return Book.id.in_(
+        text(f"SELECT rowid FROM {SQLITE_FTS_TABLE} WHERE {SQLITE_FTS_TABLE} MATCH :fts_query")
+        .bindparams(fts_query=fts_query)
+        .columns(column('rowid'))
+    )
+
+def substring_filter(search):
+    """Filter for books whose text fields contain the search, with or without Vietnamese accents
+
+    Scans the table; smart search uses it when the full-text index is
+    missing or when the request asks for substring matches.
+    """
+    conditions = []
+    for variant in create_search_variants(search):
+        variant_lower = variant.lower()
+        conditions.extend([
+            # Search in original fields
+            func.lower(Book.title).contains(variant_lower),
+            func.lower(Book.author).contains(variant_lower),
+            func.lower(Book.isbn).contains(variant_lower),
+            func.lower(Book.categories).contains(variant_lower),
+            func.lower(Book.description).contains(variant_lower),
+            # Search in normalized fields (if they exist)
+            func.lower(Book.title_normalized).contains(variant_lower),
+            func.lower(Book.author_normalized).contains(variant_lower)
+        ])
+    return or_(*conditions) if conditions else None
+
+def ensure_search_index():
+    """Create the full-text index on an existing database and rebuild its contents"""
+    engine = db.engine
+    if engine.dialect.name == 'postgresql':
+        statements = POSTGRES_DDL + POSTGRES_TRGM_DDL
+    elif engine.dialect.name == 'sqlite':
+        statements = SQLITE_DDL + [
+            f"INSERT INTO {SQLITE_FTS_TABLE}({SQLITE_FTS_TABLE}) VALUES ('rebuild')"
+        ]
+    else:
+        raise ValueError(f"Unsupported database type: {engine.dialect.name}")
+
+    for statement in statements:
+        db.session.execute(text(statement))
+    db.session.commit()
+    _index_available.pop(engine, None)
+    _trgm_available.pop(engine, None)
+
+def trigram_index_available():
+    """Check whether the current database has pg_trgm indexes for fuzzy search"""
+    engine = db.engine
+    if engine not in _trgm_available:
+        _trgm_available[engine] = False
+        if engine.dialect.name == 'postgresql':
+            try:
+                result = db.session.execute(text(
+                    "SELECT 1 FROM pg_indexes WHERE indexname = :name"
+                ), {'name': POSTGRES_TRGM_INDEX_NAME})
+                _trgm_available[engine] = result.first() is not None
+            except Exception as e:
+                print(f"Trigram index check failed: {e}")
+                db.session.rollback()
+    return _trgm_available[engine]
+
+def fuzzy_search_clauses(search, threshold):
+    """Build the pg_trgm filter and relevance score for a fuzzy search
+
+    Uses word similarity, so a short query scores well against a long title
+    that contains a close match. The ``<%`` operator is served by the GIN
+    trigram indexes; its threshold is set for the current transaction only.
+    """
+    normalized = normalize_vietnamese_text(search)
+    db.session.execute(
+        text("SELECT set_config('pg_trgm.word_similarity_threshold', :threshold, true)"),
+        {'threshold': str(threshold)}
+    )
+    term = literal(normalized)
+    search_filter = or_(
+        term.op('<%', is_comparison=True)(Book.title_normalized),
+        term.op('<%', is_comparison=True)(Book.author_normalized)
+    )
+    score = func.greatest(
+        func.word_similarity(term, func.coalesce(Book.title_normalized, '')),
+        func.word_similarity(term, func.coalesce(Book.author_normalized, ''))
+    )
+    return search_filter, score
+
+def trigrams(value):
+    """Split normalized text into padded word trigrams, as pg_trgm does"""
+    grams = set()
+    for word in re.findall(r'\w+', value or ''):
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+class TrigramIndex:
+    """In-process trigram index over normalized book titles and authors
+
+    Each worker keeps its own copy. ``refresh`` compares the ``books``
+    counter in ``table_versions`` (one primary-key read) with the version the
+    index was built from, and only when the table has changed picks up rows
+    changed since the last refresh through ``Book.last_updated``, rebuilding
+    from scratch when the row count no longer matches (books were deleted).
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.postings = defaultdict(set)  # trigram -> book ids
+        self.documents = {}  # book id -> (title trigrams, author trigrams)
+        self.last_seen = None
+        self.version = None  # books table version the index reflects
+
+    def _add(self, book_id, title_normalized, author_normalized):
+        self._remove(book_id)
+        fields = (trigrams(title_normalized), trigrams(author_normalized))
+        self.documents[book_id] = fields
+        for gram in fields[0] | fields[1]:
+            self.postings[gram].add(book_id)
+
+    def _remove(self, book_id):
+        fields = self.documents.pop(book_id, None)
+        if fields:
+            for gram in fields[0] | fields[1]:
+                self.postings[gram].discard(book_id)
+
+    def _load(self, query):
+        rows = query.with_entities(
+            Book.id, Book.title_normalized, Book.author_normalized, Book.last_updated
+        ).all()
+        for book_id, title_normalized, author_normalized, last_updated in rows:
+            self._add(book_id, title_normalized, author_normalized)
+            if self.last_seen is None or last_updated > self.last_seen:
+                self.last_seen = last_updated
+
+    def refresh(self):
+        """Bring the index up to date with the books table, if it has changed"""
+        # Read before loading, so writes committed during the load trigger another refresh
+        version = table_versions('books')[0]
+        if version == self.version:
+            return
+
+        book_count = db.session.query(func.count(Book.id)).scalar()
+        with self.lock:
+            if self.last_seen is not None:
+                self._load(Book.query.filter(Book.last_updated >= self.last_seen))
+            if self.last_seen is None or len(self.documents) != book_count:
+                self.postings = defaultdict(set)
+                self.documents = {}
+                self.last_seen = None
+                self._load(Book.query)
+            self.version = version
+
+    def search(self, search, threshold, limit):
+        """Return up to ``limit`` (book id, score) pairs ordered by relevance"""
+        query_grams = trigrams(normalize_vietnamese_text(search))
+        if not query_grams:
+            return []
+
+        with self.lock:
+            # Count shared trigrams across both fields to prune candidates cheaply
+            hits = defaultdict(int)
+            for gram in query_grams:
+                for book_id in self.postings.get(gram, ()):
+                    hits[book_id] += 1
+
+            minimum_hits = threshold * len(query_grams)
+            results = []
+            for book_id, count in hits.items():
+                if count < minimum_hits:
+                    continue
+                best = (0.0, 0.0)
+                for field in self.documents[book_id]:
+                    shared = len(query_grams & field)
+                    if not shared:
+                        continue
+                    # Word-similarity style score, ties broken by overall
+                    # similarity so tighter matches rank first
+                    candidate = (
+                        shared / len(query_grams),
+                        shared / (len(query_grams) + len(field) - shared)
+                    )
+                    best = max(best, candidate)
+                if best[0] >= threshold:
+                    results.append((book_id, best))
+
+        results.sort(key=lambda item: (-item[1][0], -item[1][1], item[0]))
+        return [(book_id, round(score[0], 3)) for book_id, score in results[:limit]]
+
+trigram_index = TrigramIndex()
@@ -0,0 +1,141 @@
+"""
+Dashboard statistics for the Library Management System
+
+The aggregates shown on the dashboard live in a single ``library_stats`` row.
+Endpoints that change books, loans or members call ``adjust_library_stats``
+inside their own transaction, so the counters are committed (or rolled back)
+together with the change itself. ``reconcile_library_stats`` rebuilds every
+counter from the source tables; it runs whenever the row is older than
+``STATS_RECONCILE_INTERVAL`` and from ``scripts/reconcile_stats.py``.
+"""
+
+from datetime import datetime, timedelta
+from sqlalchemy import func, update, case
+from sqlalchemy.exc import IntegrityError
+from models import db, Book, Member, Transaction, LibraryStats, OPEN_LOAN_STATUSES
+
+STATS_ROW_ID = 1
+
+STAT_FIELDS = [
+    'total_books',
+    'total_copies',
+    'available_copies',
+    'overdue_loans',
+    'active_members',
+    'fines_outstanding'
+]
+
+def adjust_library_stats(**deltas):
+    """Apply counter deltas to the stats row as part of the current transaction"""
+    deltas = {name: delta for name, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
+    values = {name: getattr(LibraryStats, name) + delta for name, delta in deltas.items()}
+    values['last_updated'] = datetime.utcnow()
+
+    # A single UPDATE ... SET x = x + delta keeps concurrent writers from
+    # overwriting each other's changes. If the row does not exist yet this is a
+    # no-op and the next read builds it from scratch.
+    db.session.execute(
+        update(LibraryStats)
+        .where(LibraryStats.id == STATS_ROW_ID)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+
+def release_overdue_loan(due_date):
+    """Decrement the overdue counter for a returned loan if it was counted as overdue"""
+    if not due_date:
+        return
+
+    # Loans only become overdue with the passage of time, so they are counted by
+    # reconciliation. A loan was counted if it was already due at that point.
+    db.session.execute(
+        update(LibraryStats)
+        .where(LibraryStats.id == STATS_ROW_ID)
+        .values(
+            overdue_loans=LibraryStats.overdue_loans - case(
+                (LibraryStats.last_reconciled > due_date, 1),
+                else_=0
+            ),
+            last_updated=datetime.utcnow()
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+def compute_library_stats(now=None):
+    """Compute all dashboard aggregates directly from the source tables"""
+    now = now or datetime.utcnow()
+
+    total_books, total_copies, available_copies = db.session.query(
+        func.count(Book.id),
+        func.coalesce(func.sum(Book.copies_total), 0),
+        func.coalesce(func.sum(Book.copies_available), 0)
+    ).one()
+
+    overdue_loans = db.session.query(func.count(Transaction.id)).filter(
+        Transaction.transaction_type == 'borrow',
+        Transaction.status.in_(OPEN_LOAN_STATUSES),
+        Transaction.due_date < now
+    ).scalar()
+
+    active_members = db.session.query(func.count(Member.id)).filter(
+        Member.status == 'active'
+    ).scalar()
+
+    # Fines charged over all transactions; there are no payments to subtract
+    fines_outstanding = db.session.query(
+        func.coalesce(func.sum(Transaction.fine_amount + Transaction.condition_fee), 0.0)
+    ).scalar()
+
+    return {
+        'total_books': total_books,
+        'total_copies': int(total_copies),
+        'available_copies': int(available_copies),
+        'overdue_loans': overdue_loans,
+        'active_members': active_members,
+        'fines_outstanding': float(fines_outstanding)
+    }
+
+def reconcile_library_stats():
+    """Rebuild the stats row from the source tables and report any drift"""
+    now = datetime.utcnow()
+    computed = compute_library_stats(now)
+
+    stats = db.session.get(LibraryStats, STATS_ROW_ID)
+    if stats is None:
+        stats = LibraryStats(id=STATS_ROW_ID)
+        db.session.add(stats)
+        drift = {}
+    else:
+        drift = {}
+        for name in STAT_FIELDS:
+            current = getattr(stats, name) or 0
+            if round(current - computed[name], 2) != 0:
+                drift[name] = {'stored': current, 'actual': computed[name]}
+
+    for name in STAT_FIELDS:
+        setattr(stats, name, computed[name])
+    stats.last_reconciled = now
+    stats.last_updated = now
+
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Another worker created the row at the same time; theirs is just as fresh
+        db.session.rollback()
+        stats = db.session.get(LibraryStats, STATS_ROW_ID)
+
+    return stats, drift
+
+def get_library_stats(max_age=None):
+    """Return the stats row, reconciling it first if it is missing or stale"""
+    stats = db.session.get(LibraryStats, STATS_ROW_ID)
+
+    if stats is None or stats.last_reconciled is None:
+        stats, _ = reconcile_library_stats()
+    elif max_age is not None and datetime.utcnow() - stats.last_reconciled > timedelta(seconds=max_age):
+        stats, _ = reconcile_library_stats()
+
+    return stats
@@ -0,0 +1,26 @@
+"""
+Shared pytest setup
+
+Runs the application against the in-memory testing database, so running
+the suite never touches instance/library.db. The environment is set here,
+before any test module imports the app, so every app the tests create
+(including test_vietnamese.py's own) gets the testing configuration.
+"""
+
+import os
+import sys
+
+import pytest
+
+os.environ['FLASK_ENV'] = 'testing'
+
+# Add parent directory to path to import modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+@pytest.fixture(autouse=True)
+def database_schema():
+    """Recreate the tables before each test, since some test cases drop them when they finish"""
+    from app import app, db
+    with app.app_context():
+        db.create_all()
+    yield
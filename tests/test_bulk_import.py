@@ -0,0 +1,124 @@
+import unittest
+import json
+import os
+import sys
+import threading
+
+# Use the in-memory testing database when run directly
+os.environ['FLASK_ENV'] = 'testing'
+
+# Add parent directory to path to import modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..') if '__file__' in globals() else '..')
+
+from app import app, db
+from models import Book
+from bulk_import import import_books, parse_import_csv
+from isbn_cache import ISBNMetadataCache
+
+class FakeScanner:
+    """Answers ISBN lookups from a dict instead of the network"""
+
+    def __init__(self, books, release=None):
+        self.books = books
+        self.release = release
+        self.lookups = []
+
+    def get_book_info_by_isbn(self, isbn, deadline=None):
+        self.lookups.append(isbn)
+        if self.release is not None:
+            self.release.wait(5)
+        info = self.books.get(isbn)
+        if info is None:
+            return {'isbn': isbn, 'title': f'Book {isbn}', 'source': 'manual_entry'}
+        return dict(info, isbn=isbn, source='api_lookup')
+
+class BulkImportTestCase(unittest.TestCase):
+    def setUp(self):
+        """Set up test fixtures before each test method"""
+        self.app = app.test_client()
+        self.cache = ISBNMetadataCache()
+        self.scanner = FakeScanner({
+            '9780306406157': {'title': 'Data Reduction', 'author': 'Bevington'},
+            '9780132350884': {'title': 'Clean Code', 'author': 'Robert Martin'}
+        })
+
+        with app.app_context():
+            db.create_all()
+
+    def tearDown(self):
+        """Clean up after each test method"""
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def run_import(self, rows, **kwargs):
+        with app.app_context():
+            return import_books(rows, self.scanner, self.cache, **kwargs)
+
+    def test_parse_import_csv(self):
+        """CSV files with a header keep their columns; headerless files are read as ISBNs"""
+        self.assertEqual(parse_import_csv('isbn,copies\n978-0-306-40615-7,2\n\n'), [{'isbn': '978-0-306-40615-7', 'copies': '2'}])
+        self.assertEqual(parse_import_csv('9780306406157\n0306406152\n'), [{'isbn': '9780306406157'}, {'isbn': '0306406152'}])
+
+    def test_import_creates_and_updates(self):
+        """New ISBNs are looked up and created; repeats and known books gain copies"""
+        report = self.run_import([
+            '978-0-306-40615-7',
+            {'isbn': '9780306406157', 'copies': 2},
+            {'isbn': '9781111111113', 'title': 'Local Zine', 'author': 'Staff'},
+            '9780000000002',
+            'not an isbn',
+            {'isbn': '9780132350884', 'copies': 'two'}
+        ])
+
+        statuses = [(result['row'], result['status']) for result in report['results']]
+        self.assertEqual(statuses, [
+            (1, 'created'), (2, 'updated'), (3, 'created'), (4, 'not_found'), (5, 'invalid'), (6, 'invalid')
+        ])
+        self.assertEqual(report['summary']['total'], 6)
+        # Each new ISBN is looked up once
+        self.assertEqual(sorted(self.scanner.lookups), ['9780000000002', '9780306406157', '9781111111113'])
+
+        with app.app_context():
+            book = Book.query.filter_by(isbn='9780306406157').one()
+            self.assertEqual((book.title, book.copies_total, book.copies_available), ('Data Reduction', 3, 3))
+            self.assertEqual(Book.query.filter_by(isbn='9781111111113').one().title, 'Local Zine')
+
+    def test_import_and_add_book_share_isbn_form(self):
+        """A book added by hand and the same ISBN imported in bulk stay one book"""
+        response = self.app.post('/api/books', data=json.dumps({
+            'isbn': '978-0-306-40615-7', 'title': 'Data Reduction', 'author': 'Bevington'
+        }), content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(json.loads(response.data)['book']['isbn'], '9780306406157')
+
+        report = self.run_import(['9780306406157', '978 0 13 235088 4'])
+        self.assertEqual([result['status'] for result in report['results']], ['updated', 'created'])
+        self.assertEqual(self.scanner.lookups, ['9780132350884'])
+
+        response = self.app.post('/api/books', data=json.dumps({
+            'isbn': '978-0-13-235088-4', 'title': 'Clean Code', 'author': 'Robert Martin'
+        }), content_type='application/json')
+        self.assertEqual(json.loads(response.data)['action'], 'updated_existing')
+
+        with app.app_context():
+            self.assertEqual(
+                sorted((book.isbn, book.copies_total) for book in Book.query.all()),
+                [('9780132350884', 2), ('9780306406157', 2)]
+            )
+            self.assertEqual(self.app.get('/api/books/isbn/978-0-13-235088-4').status_code, 200)
+
+    def test_unresolved_rows_are_pending(self):
+        """Rows whose lookup misses the time budget come back as pending"""
+        self.scanner.release = threading.Event()
+        try:
+            report = self.run_import(['9780306406157'], time_budget=0.2)
+        finally:
+            self.scanner.release.set()
+
+        self.assertEqual(report['results'][0]['status'], 'pending')
+        with app.app_context():
+            self.assertEqual(Book.query.count(), 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import unittest
+import json
+import os
+import sys
+
+# Use the in-memory testing database when run directly
+os.environ['FLASK_ENV'] = 'testing'
+
+# Add parent directory to path to import modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..') if '__file__' in globals() else '..')
+
+from app import app, db
+from models import Book, Category, book_categories
+from categories import split_categories
+
+class CategoryTestCase(unittest.TestCase):
+    def setUp(self):
+        """Set up test fixtures before each test method"""
+        self.app = app.test_client()
+
+        with app.app_context():
+            db.create_all()
+            db.session.add_all([
+                Book(title='Dune', author='Herbert', categories='Fiction, Science Fiction'),
+                Book(title='Cosmos', author='Sagan', categories='Science'),
+                Book(title='Gone Girl', author='Flynn', categories=' fiction ,Mystery,FICTION', status='borrowed'),
+                Book(title='Atlas', author='Unknown')
+            ])
+            db.session.commit()
+
+    def tearDown(self):
+        """Clean up after each test method"""
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def titles(self, query):
+        response = self.app.get(f'/api/books?fields=title&per_page=50&{query}')
+        self.assertEqual(response.status_code, 200)
+        return sorted(book['title'] for book in json.loads(response.data)['books'])
+
+    def test_split_categories(self):
+        """Names are trimmed, blanks dropped and repeats merged case-insensitively"""
+        self.assertEqual(split_categories(' Fiction,, fiction ,Science   Fiction'), ['Fiction', 'Science Fiction'])
+        self.assertEqual(split_categories(None), [])
+
+    def test_category_filter_matches_whole_names(self):
+        """?category= matches whole category names, ignoring case"""
+        self.assertEqual(self.titles('category=fiction'), ['Dune', 'Gone Girl'])
+        self.assertEqual(self.titles('category=Science'), ['Cosmos'])
+        self.assertEqual(self.titles('category=fiction&category=mystery'), ['Gone Girl'])
+        self.assertEqual(self.titles('category=Poetry'), [])
+
+    def test_links_follow_book_writes(self):
+        """Editing or deleting a book updates its category links"""
+        with app.app_context():
+            book_id = Book.query.filter_by(title='Cosmos').one().id
+
+        response = self.app.put(f'/api/books/{book_id}', data=json.dumps({
+            'categories': 'Astronomy, science fiction'
+        }), content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data)['book']['categories'], 'Astronomy, science fiction')
+        self.assertEqual(self.titles('category=Science'), [])
+        self.assertEqual(self.titles('category=Science Fiction'), ['Cosmos', 'Dune'])
+
+        self.assertEqual(self.app.delete(f'/api/books/{book_id}').status_code, 200)
+        self.assertEqual(self.titles('category=astronomy'), [])
+        with app.app_context():
+            self.assertEqual(db.session.query(book_categories).filter_by(book_id=book_id).count(), 0)
+            # The first spelling filed is kept
+            self.assertEqual(Category.query.filter_by(key='science fiction').one().name, 'Science Fiction')
+
+    def test_category_facets(self):
+        """The facet endpoint counts books per category, most books first"""
+        response = self.app.get('/api/categories')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data)['categories'], [
+            {'name': 'Fiction', 'count': 2},
+            {'name': 'Mystery', 'count': 1},
+            {'name': 'Science', 'count': 1},
+            {'name': 'Science Fiction', 'count': 1}
+        ])
+
+        response = self.app.get('/api/categories?status=available&limit=2')
+        self.assertEqual(json.loads(response.data)['categories'], [
+            {'name': 'Fiction', 'count': 1},
+            {'name': 'Science', 'count': 1}
+        ])
+
+if __name__ == '__main__':
+    unittest.main()
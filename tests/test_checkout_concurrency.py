@@ -0,0 +1,197 @@
+import unittest
+import json
+import os
+import sys
+import tempfile
+import threading
+from datetime import datetime, timedelta
+
+# Use the in-memory testing database when run directly
+os.environ['FLASK_ENV'] = 'testing'
+
+# Add parent directory to path to import modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..') if '__file__' in globals() else '..')
+
+from flask import Flask
+from app import app, db
+from config import config
+from models import Book, Member, Transaction
+from circulation import reconcile_member_counters
+
+THREADS = 16
+
+class CheckoutConcurrencyTests:
+    """Fire parallel checkouts and checkins through the real circulation views
+
+    The in-memory test database has a single shared connection, so these
+    tests run against their own database: a SQLite file, or PostgreSQL when
+    TEST_POSTGRES_URL is set.
+    """
+
+    database_url = None  # set by each database's test case
+
+    def setUp(self):
+        self.stress_app = Flask(__name__)
+        self.stress_app.config.from_object(config['testing'])
+        self.stress_app.config['SQLALCHEMY_DATABASE_URI'] = self.database_url
+        db.init_app(self.stress_app)
+        for path, endpoint in [
+            ('/api/circulation/checkout', 'checkout_book'),
+            ('/api/circulation/checkin', 'checkin_book'),
+            ('/api/circulation/batch', 'circulation_batch')
+        ]:
+            self.stress_app.add_url_rule(
+                path,
+                endpoint=endpoint,
+                view_func=app.view_functions[endpoint],
+                methods=['POST']
+            )
+
+        with self.stress_app.app_context():
+            db.drop_all()
+            db.create_all()
+
+    def tearDown(self):
+        with self.stress_app.app_context():
+            db.session.remove()
+            db.drop_all()
+            db.engine.dispose()
+
+    def add_members(self, count, max_books=5):
+        members = [
+            Member(
+                member_id=f'LIB{i:03d}',
+                first_name='Test',
+                last_name=f'User {i}',
+                employee_code=f'EMP{i:03d}',
+                max_books=max_books
+            )
+            for i in range(count)
+        ]
+        db.session.add_all(members)
+        db.session.commit()
+        return [member.id for member in members]
+
+    def run_parallel(self, path, payloads):
+        """POST every payload at once from its own thread; returns the status codes"""
+        barrier = threading.Barrier(len(payloads))
+        statuses = [None] * len(payloads)
+
+        def post(index, payload):
+            client = self.stress_app.test_client()
+            barrier.wait()
+            response = client.post(path, data=json.dumps(payload), content_type='application/json')
+            statuses[index] = response.status_code
+
+        threads = [threading.Thread(target=post, args=item) for item in enumerate(payloads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return statuses
+
+    def test_last_copies_are_lent_once(self):
+        """Parallel checkouts of a book never lend more copies than it has"""
+        with self.stress_app.app_context():
+            book = Book(title='Rush', author='Author', copies_total=3, copies_available=3)
+            db.session.add(book)
+            db.session.commit()
+            book_uuid, book_id = book.uuid, book.id
+            member_ids = self.add_members(THREADS)
+
+        statuses = self.run_parallel('/api/circulation/checkout', [
+            {'book_uuid': book_uuid, 'member_id': member_id} for member_id in member_ids
+        ])
+
+        self.assertEqual(statuses.count(200), 3)
+        self.assertEqual(statuses.count(400), THREADS - 3)
+        with self.stress_app.app_context():
+            book = db.session.get(Book, book_id)
+            self.assertEqual(book.copies_available, 0)
+            self.assertEqual(book.status, 'borrowed')
+            self.assertEqual(Transaction.query.filter_by(book_id=book_id, status='active').count(), 3)
+
+    def test_member_limit_holds_under_contention(self):
+        """Parallel checkouts by one member stop at the member's borrowing limit"""
+        with self.stress_app.app_context():
+            books = [Book(title=f'Book {i}', author='Author') for i in range(THREADS)]
+            db.session.add_all(books)
+            db.session.commit()
+            book_uuids = [book.uuid for book in books]
+            member_id = self.add_members(1, max_books=2)[0]
+
+        statuses = self.run_parallel('/api/circulation/checkout', [
+            {'book_uuid': book_uuid, 'member_id': member_id} for book_uuid in book_uuids
+        ])
+
+        self.assertEqual(statuses.count(200), 2)
+        with self.stress_app.app_context():
+            self.assertEqual(Transaction.query.filter_by(member_id=member_id, status='active').count(), 2)
+            self.assertEqual(db.session.get(Member, member_id).active_loans, 2)
+            available = db.session.query(db.func.sum(Book.copies_available)).scalar()
+            self.assertEqual(available, THREADS - 2)
+
+    def test_batch_checkouts_share_the_member_limit(self):
+        """Parallel batch checkouts by one member stop at the member's borrowing limit"""
+        with self.stress_app.app_context():
+            books = [Book(title=f'Book {i}', author='Author') for i in range(2 * THREADS)]
+            db.session.add_all(books)
+            db.session.commit()
+            book_uuids = [book.uuid for book in books]
+            member_id = self.add_members(1, max_books=3)[0]
+
+        statuses = self.run_parallel('/api/circulation/batch', [
+            {'member_id': member_id, 'book_uuids': book_uuids[i:i + 2]} for i in range(0, 2 * THREADS, 2)
+        ])
+
+        self.assertEqual(statuses.count(200), THREADS)
+        with self.stress_app.app_context():
+            self.assertEqual(Transaction.query.filter_by(member_id=member_id, status='active').count(), 3)
+            self.assertEqual(db.session.get(Member, member_id).active_loans, 3)
+            available = db.session.query(db.func.sum(Book.copies_available)).scalar()
+            self.assertEqual(available, 2 * THREADS - 3)
+
+    def test_loan_is_returned_once(self):
+        """Parallel checkins of the same loan put the copy back once"""
+        with self.stress_app.app_context():
+            book = Book(title='Returned', author='Author', copies_total=1, copies_available=0, status='borrowed')
+            db.session.add(book)
+            db.session.commit()
+            member_id = self.add_members(1)[0]
+            db.session.add(Transaction(
+                book_id=book.id,
+                member_id=member_id,
+                transaction_type='borrow',
+                due_date=datetime.utcnow() - timedelta(days=3),
+                status='active'
+            ))
+            db.session.get(Member, member_id).active_loans = 1
+            db.session.commit()
+            book_uuid, book_id = book.uuid, book.id
+
+        statuses = self.run_parallel('/api/circulation/checkin', [{'book_uuid': book_uuid}] * 8)
+
+        self.assertEqual(statuses.count(200), 1)
+        with self.stress_app.app_context():
+            book = db.session.get(Book, book_id)
+            self.assertEqual(book.copies_available, 1)
+            self.assertEqual(book.status, 'available')
+            member = db.session.get(Member, member_id)
+            self.assertEqual(member.active_loans, 0)
+            self.assertGreater(member.fines_outstanding, 0)
+            self.assertEqual(reconcile_member_counters(), {})
+
+class SQLiteCheckoutConcurrencyTestCase(CheckoutConcurrencyTests, unittest.TestCase):
+    database_path = os.path.join(tempfile.gettempdir(), f'library_checkout_stress_{os.getpid()}.db')
+    database_url = f'sqlite:///{database_path}'
+
+    def tearDown(self):
+        super().tearDown()
+        os.remove(self.database_path)
+
+@unittest.skipUnless(os.environ.get('TEST_POSTGRES_URL'), 'TEST_POSTGRES_URL is not set')
+class PostgresCheckoutConcurrencyTestCase(CheckoutConcurrencyTests, unittest.TestCase):
+    database_url = os.environ.get('TEST_POSTGRES_URL')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+import unittest
+import json
+import os
+import sys
+
+# Use the in-memory testing database when run directly
+os.environ['FLASK_ENV'] = 'testing'
+
+# Add parent directory to path to import modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..') if '__file__' in globals() else '..')
+
+from app import app, db
+
+class CirculationBatchRequestTestCase(unittest.TestCase):
+    def setUp(self):
+        """Set up test fixtures before each test method"""
+        self.app = app.test_client()
+
+        with app.app_context():
+            db.create_all()
+
+    def tearDown(self):
+        """Clean up after each test method"""
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_rejects_non_object_body(self):
+        """A batch body that is valid JSON but not an object is a 400, not a server error"""
+        for body in ('[1]', '"checkout"', '7'):
+            response = self.app.post('/api/circulation/batch', data=body, content_type='application/json')
+            self.assertEqual(response.status_code, 400, body)
+            self.assertEqual(json.loads(response.data)['message'], 'Request body must be a JSON object')
+
+    def test_requires_member_and_books(self):
+        """An object body without a member or a list of books is a 400"""
+        for body in ({}, {'member_id': 1}, {'member_id': 1, 'book_uuids': 'abc'}, {'action': 'renew'}):
+            response = self.app.post('/api/circulation/batch', data=json.dumps(body), content_type='application/json')
+            self.assertEqual(response.status_code, 400, body)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+import json
+import os
+import sys
+
+# Use the in-memory testing database when run directly
+os.environ['FLASK_ENV'] = 'testing'
+
+# Add parent directory to path to import modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..') if '__file__' in globals() else '..')
+
+from app import app, db
+from models import Book
+from search import trigram_index
+from tests.test_query_counts import QueryCounter
+
+class FuzzySearchTestCase(unittest.TestCase):
+    def setUp(self):
+        """Set up test fixtures before each test method"""
+        self.app = app.test_client()
+
+        with app.app_context():
+            db.create_all()
+            db.session.add_all([
+                Book(title='Effective Java', author='Joshua Bloch'),
+                Book(title='Clean Code', author='Robert Martin')
+            ])
+            db.session.commit()
+
+    def tearDown(self):
+        """Clean up after each test method"""
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def search(self, text):
+        response = self.app.get('/api/books', query_string={'search': text, 'search_type': 'fuzzy', 'fields': 'title'})
+        self.assertEqual(response.status_code, 200)
+        return [book['title'] for book in json.loads(response.data)['books']]
+
+    def test_typos_match(self):
+        """Misspelled titles and authors still find the book"""
+        self.assertEqual(self.search('efective jav'), ['Effective Java'])
+        self.assertEqual(self.search('robrt martn'), ['Clean Code'])
+
+    def test_index_refreshes_only_after_writes(self):
+        """The in-process index reloads books only when the books table version has changed"""
+        self.search('clean')
+        with app.app_context():
+            with QueryCounter(db.engine) as counter:
+                trigram_index.refresh()
+            self.assertEqual(counter.count, 1)
+
+        response = self.app.post('/api/books', data=json.dumps({
+            'title': 'Clean Architecture', 'author': 'Robert Martin'
+        }), content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.search('clean architecure')[0], 'Clean Architecture')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import unittest
+import gzip
+import json
+import os
+import sys
+
+# Use the in-memory testing database when run directly
+os.environ['FLASK_ENV'] = 'testing'
+
+# Add parent directory to path to import modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..') if '__file__' in globals() else '..')
+
+from app import app, db
+from models import Book, Member
+
+class ConditionalGetTestCase(unittest.TestCase):
+    def setUp(self):
+        """Set up test fixtures before each test method"""
+        self.app = app.test_client()
+
+        with app.app_context():
+            db.create_all()
+            books = [Book(title=f'Book {i}', author='Author', description='A long description. ' * 20) for i in range(10)]
+            member = Member(member_id='LIB001', first_name='Test', last_name='User', employee_code='EMP001')
+            db.session.add_all(books + [member])
+            db.session.commit()
+            self.book_uuid = books[0].uuid
+            self.member_id = member.id
+
+    def tearDown(self):
+        """Clean up after each test method"""
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def revalidate(self, path, etag):
+        return self.app.get(path, headers={'If-None-Match': etag}).status_code
+
+    def test_unchanged_listing_is_not_modified(self):
+        """Listings answer 304 until a write to their table commits"""
+        books = self.app.get('/api/books?per_page=10')
+        members = self.app.get('/api/members')
+        self.assertEqual(books.status_code, 200)
+        self.assertTrue(books.headers['ETag'].startswith('W/'))
+
+        self.assertEqual(self.revalidate('/api/books?per_page=10', books.headers['ETag']), 304)
+        self.assertEqual(self.revalidate('/api/books?per_page=5', books.headers['ETag']), 200)
+
+        # A checkout changes a book's available copies and the member's loan count
+        response = self.app.post('/api/circulation/checkout', data=json.dumps({
+            'book_uuid': self.book_uuid,
+            'member_id': self.member_id
+        }), content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(self.revalidate('/api/books?per_page=10', books.headers['ETag']), 200)
+        self.assertEqual(self.revalidate('/api/members', members.headers['ETag']), 200)
+
+    def test_other_tables_do_not_invalidate(self):
+        """Editing a member keeps the book listing's ETag valid"""
+        books = self.app.get('/api/books?per_page=10')
+
+        response = self.app.put(f'/api/members/{self.member_id}', data=json.dumps({
+            'phone': '+1-555-0100'
+        }), content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(self.revalidate('/api/books?per_page=10', books.headers['ETag']), 304)
+
+    def test_large_json_is_compressed(self):
+        """JSON above the size threshold is gzipped for clients that accept it"""
+        response = self.app.get('/api/books?per_page=10', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response.headers['Vary'])
+        self.assertEqual(len(json.loads(gzip.decompress(response.data))['books']), 10)
+
+        self.assertNotIn('Content-Encoding', self.app.get('/api/books?per_page=10').headers)
+        small = self.app.get('/api/books?per_page=1&search=nothing', headers={'Accept-Encoding': 'gzip'})
+        self.assertNotIn('Content-Encoding', small.headers)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+import os
+import sys
+from datetime import datetime, timedelta
+
+# Use the in-memory testing database when run directly
+os.environ['FLASK_ENV'] = 'testing'
+
+# Add parent directory to path to import modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..') if '__file__' in globals() else '..')
+
+from app import app, db
+from models import Book, Member
+from circulation import checkout_copy, reconcile_member_counters
+
+class MemberCountersTestCase(unittest.TestCase):
+    def setUp(self):
+        """Set up test fixtures before each test method"""
+        with app.app_context():
+            db.create_all()
+            member = Member(member_id='LIB000', first_name='Test', last_name='User', employee_code='EMP000', max_books=5)
+            books = [Book(title=f'Book {i}', author='Author') for i in range(2)]
+            db.session.add_all([member, *books])
+            db.session.commit()
+            self.member_id = member.id
+            self.book_ids = [book.id for book in books]
+
+    def tearDown(self):
+        """Clean up after each test method"""
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_checkout_updates_counters(self):
+        """Checkouts keep the member's open loan counter in step with the transactions"""
+        with app.app_context():
+            for book_id in self.book_ids:
+                checkout_copy(book_id, self.member_id, datetime.utcnow() + timedelta(days=14))
+            db.session.commit()
+
+            member = db.session.get(Member, self.member_id)
+            self.assertEqual((member.active_loans, member.fines_outstanding), (2, 0.0))
+            self.assertEqual(reconcile_member_counters(), {})
+
+    def test_reconcile_member_counters_reports_drift(self):
+        """Reconciliation recounts drifted member counters from the transactions"""
+        with app.app_context():
+            for book_id in self.book_ids:
+                checkout_copy(book_id, self.member_id, datetime.utcnow() + timedelta(days=14))
+            db.session.commit()
+
+            member = db.session.get(Member, self.member_id)
+            member.active_loans = 7
+            member.fines_outstanding = 4.5
+            db.session.commit()
+
+            drift = reconcile_member_counters()
+            self.assertEqual(drift, {'LIB000': {
+                'active_loans': {'stored': 7, 'actual': 2},
+                'fines_outstanding': {'stored': 4.5, 'actual': 0.0}
+            }})
+            member = db.session.get(Member, self.member_id)
+            self.assertEqual((member.active_loans, member.fines_outstanding), (2, 0.0))
+
+if __name__ == '__main__':
+    unittest.main()
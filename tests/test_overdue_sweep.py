@@ -0,0 +1,99 @@
+import unittest
+import json
+import os
+import sys
+from datetime import datetime, timedelta
+
+# Use the in-memory testing database when run directly
+os.environ['FLASK_ENV'] = 'testing'
+
+# Add parent directory to path to import modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..') if '__file__' in globals() else '..')
+
+from app import app, db
+from models import Book, Member, Transaction
+from circulation import checkout_copy, reconcile_member_counters
+from overdue import sweep_overdue_loans
+from utils import calculate_fine
+
+class OverdueSweepTestCase(unittest.TestCase):
+    def setUp(self):
+        """Lend three books to one member, two of them past due"""
+        self.app = app.test_client()
+        self.now = datetime.utcnow()
+
+        with app.app_context():
+            db.create_all()
+            books = [Book(title=f'Book {i}', author='Author') for i in range(3)]
+            member = Member(member_id='LIB001', first_name='Test', last_name='User', employee_code='EMP001')
+            db.session.add_all(books + [member])
+            db.session.commit()
+
+            self.due_dates = [
+                self.now - timedelta(days=4, hours=6),
+                self.now - timedelta(hours=2),
+                self.now + timedelta(days=3)
+            ]
+            for book, due_date in zip(books, self.due_dates):
+                checkout_copy(book.id, member.id, due_date)
+            db.session.commit()
+            self.member_id = member.id
+            self.book_uuids = [book.uuid for book in books]
+
+    def tearDown(self):
+        """Clean up after each test method"""
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_sweep_marks_overdue_and_accrues_fines(self):
+        """The sweep marks loans past due and accrues what calculate_fine gives"""
+        with app.app_context():
+            summary = sweep_overdue_loans(now=self.now, fine_per_day=1.5)
+            self.assertEqual(summary['marked_overdue'], 2)
+            self.assertEqual(summary['fines_accrued'], 1)
+            self.assertEqual(summary['fines_added'], 6.0)
+
+            loans = Transaction.query.order_by(Transaction.id).all()
+            self.assertEqual([loan.status for loan in loans], ['overdue', 'overdue', 'active'])
+            self.assertEqual(
+                [loan.fine_amount for loan in loans],
+                [calculate_fine(due_date, self.now, 1.5) for due_date in self.due_dates]
+            )
+            self.assertEqual(db.session.get(Member, self.member_id).fines_outstanding, 6.0)
+
+            # Running it again changes nothing
+            summary = sweep_overdue_loans(now=self.now, fine_per_day=1.5)
+            self.assertEqual((summary['marked_overdue'], summary['fines_accrued']), (0, 0))
+            self.assertEqual(db.session.get(Member, self.member_id).fines_outstanding, 6.0)
+
+    def test_checkin_does_not_count_accrued_fines_twice(self):
+        """Checking in an overdue loan adds only the fine accrued since the sweep"""
+        with app.app_context():
+            sweep_overdue_loans(now=self.now - timedelta(days=2))
+
+        response = self.app.post('/api/circulation/checkin', data=json.dumps({
+            'book_uuid': self.book_uuids[0]
+        }), content_type='application/json')
+
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data)
+        self.assertEqual(data['fine_amount'], 4.0)
+        self.assertEqual(data['member']['fines_outstanding'], 4.0)
+        self.assertEqual(data['member']['active_loans'], 2)
+        with app.app_context():
+            self.assertEqual(reconcile_member_counters(), {})
+
+    def test_overdue_listing(self):
+        """The overdue listing includes loans the sweep has not reached yet"""
+        response = self.app.get('/api/circulation/overdue')
+
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data)
+        self.assertEqual(data['total'], 2)
+        self.assertEqual([loan['book']['uuid'] for loan in data['loans']], self.book_uuids[:2])
+        self.assertEqual([loan['days_overdue'] for loan in data['loans']], [4, 0])
+        self.assertEqual(data['loans'][0]['fine_to_date'], 4.0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+import unittest
+import json
+import os
+import sys
+from datetime import datetime, timedelta
+
+# Use the in-memory testing database when run directly
+os.environ['FLASK_ENV'] = 'testing'
+
+# Add parent directory to path to import modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..') if '__file__' in globals() else '..')
+
+from sqlalchemy import event
+from app import app, db
+from models import Book, Member, Transaction
+
+class QueryCounter:
+    """Count SQL statements executed against the engine"""
+    
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+        self.statements = []
+    
+    def _increment(self, conn, cursor, statement, *args):
+        self.count += 1
+        self.statements.append(statement)
+    
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self._increment)
+        return self
+    
+    def __exit__(self, *args):
+        event.remove(self.engine, 'before_cursor_execute', self._increment)
+
+class CirculationQueryCountTestCase(unittest.TestCase):
+    def setUp(self):
+        """Set up test fixtures before each test method"""
+        self.app = app.test_client()
+        
+        with app.app_context():
+            db.create_all()
+            self.create_test_data()
+    
+    def tearDown(self):
+        """Clean up after each test method"""
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+    
+    def create_test_data(self):
+        """Create several books and members, each with one active loan"""
+        books = []
+        for i in range(5):
+            book = Book(title=f'Book {i}', author=f'Author {i}', copies_total=5, copies_available=5)
+            member = Member(
+                member_id=f'LIB{i}',
+                first_name='Test',
+                last_name=f'User {i}',
+                employee_code=f'EMP{i}'
+            )
+            db.session.add_all([book, member])
+            db.session.flush()
+            books.append(book)
+            
+            # Every member borrows the first book, and each book once
+            for loaned_book in {books[0].id: books[0], book.id: book}.values():
+                db.session.add(Transaction(
+                    book_id=loaned_book.id,
+                    member_id=member.id,
+                    transaction_type='borrow',
+                    due_date=datetime.utcnow() + timedelta(days=14),
+                    status='active'
+                ))
+        db.session.commit()
+        self.test_book_uuid = books[0].uuid
+    
+    def test_recent_transactions_query_count(self):
+        """Recent transactions load books and members without a query per row"""
+        with app.app_context():
+            with QueryCounter(db.engine) as counter:
+                response = self.app.get('/api/circulation/recent?limit=50')
+        
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data)
+        self.assertEqual(data['count'], 9)
+        self.assertTrue(all(trans['book'] and trans['member'] for trans in data['transactions']))
+        self.assertLessEqual(counter.count, 2)
+    
+    def test_circulation_status_query_count(self):
+        """Circulation status loads the members of active loans in one query"""
+        with app.app_context():
+            with QueryCounter(db.engine) as counter:
+                response = self.app.get(f'/api/circulation/status/{self.test_book_uuid}')
+        
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data)
+        self.assertEqual(len(data['active_transactions']), 5)
+        self.assertTrue(all(trans['member'] for trans in data['active_transactions']))
+        self.assertLessEqual(counter.count, 3)
+
+    def test_book_fields_load_only_requested_columns(self):
+        """A sparse book listing selects only the requested columns"""
+        with app.app_context():
+            with QueryCounter(db.engine) as counter:
+                response = self.app.get('/api/books?fields=compact&limit=3')
+        
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data)
+        self.assertEqual(len(data['books']), 3)
+        self.assertEqual(
+            set(data['books'][0]),
+            {'id', 'uuid', 'title', 'author', 'status', 'copies_total', 'copies_available'}
+        )
+        book_queries = [statement for statement in counter.statements if 'FROM books' in statement]
+        self.assertEqual(len(book_queries), 1)
+        self.assertNotIn('description', book_queries[0])
+
+if __name__ == '__main__':
+    unittest.main()
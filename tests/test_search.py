@@ -0,0 +1,64 @@
+import unittest
+import json
+import os
+import sys
+
+# Use the in-memory testing database when run directly
+os.environ['FLASK_ENV'] = 'testing'
+
+# Add parent directory to path to import modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..') if '__file__' in globals() else '..')
+
+from app import app, db
+from models import Book
+from search import search_index_available
+
+class SmartSearchTestCase(unittest.TestCase):
+    def setUp(self):
+        """Set up test fixtures before each test method"""
+        self.app = app.test_client()
+
+        with app.app_context():
+            db.create_all()
+            db.session.add_all([
+                Book(title='Effective Java', author='Joshua Bloch', isbn='978-0-13-468599-1'),
+                Book(title='Clean Code', author='Robert Martin', isbn='9780132350884'),
+                Book(title='Lãnh đạo bằng câu hỏi', author='Michael Marquardt')
+            ])
+            db.session.commit()
+            self.assertTrue(search_index_available())
+
+    def tearDown(self):
+        """Clean up after each test method"""
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def search(self, text, **params):
+        response = self.app.get('/api/books', query_string={'search': text, 'search_type': 'smart', 'fields': 'title', **params})
+        self.assertEqual(response.status_code, 200)
+        return sorted(book['title'] for book in json.loads(response.data)['books'])
+
+    def test_words_and_prefixes(self):
+        """Words match by prefix and without Vietnamese accents"""
+        self.assertEqual(self.search('effect jav'), ['Effective Java'])
+        self.assertEqual(self.search('lanh dao'), ['Lãnh đạo bằng câu hỏi'])
+        self.assertEqual(self.search('java code'), [])
+
+    def test_isbn_forms(self):
+        """An ISBN matches with or without hyphens, as ISBN-10 and by its first digits"""
+        for isbn in ['9780134685991', '978-0-13-468599-1', '0134685997', '0-13-468599-7', '9780134', '978-0-13-46', '01346']:
+            self.assertEqual(self.search(isbn), ['Effective Java'], isbn)
+        self.assertEqual(self.search('978-0-13-235088-4'), ['Clean Code'])
+        self.assertEqual(self.search('9780'), ['Clean Code', 'Effective Java'])
+        self.assertEqual(self.search('468599'), [])
+
+    def test_substrings_on_request(self):
+        """Text inside a word is only searched for with substring=true"""
+        self.assertEqual(self.search('ode'), [])
+        self.assertEqual(self.search('ode', substring='true'), ['Clean Code'])
+        self.assertEqual(self.search('ffective', substring='true'), ['Effective Java'])
+        self.assertEqual(self.search('468599', substring='true'), ['Effective Java'])
+
+if __name__ == '__main__':
+    unittest.main()
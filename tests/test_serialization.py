@@ -0,0 +1,104 @@
+import unittest
+import json
+import os
+import sys
+from datetime import date, datetime
+
+# Use the in-memory testing database when run directly
+os.environ['FLASK_ENV'] = 'testing'
+
+# Add parent directory to path to import modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..') if '__file__' in globals() else '..')
+
+from flask.json.provider import DefaultJSONProvider
+from app import app, db
+from models import Book, Member, Transaction, BOOK_FIELDS
+from serialization import FastJSONProvider, rows_to_dicts, orjson
+
+@unittest.skipIf(orjson is None, 'orjson is not installed')
+class FastJSONProviderTestCase(unittest.TestCase):
+    def setUp(self):
+        self.fast = FastJSONProvider(app)
+        self.stdlib = DefaultJSONProvider(app)
+
+    def test_matches_stdlib_output(self):
+        """orjson output decodes to what Flask's default provider writes"""
+        value = {
+            'title': 'Sách Tiếng Việt',
+            'due_date': datetime(2024, 1, 2, 3, 4, 5),
+            'published': date(2024, 1, 2),
+            'counts': {2: 'two', 1: 'one'},
+            'pages': [1, 2.5, None, True]
+        }
+        for kwargs in ({}, {'indent': 2}, {'separators': (',', ':')}):
+            self.assertEqual(json.loads(self.fast.dumps(value, **kwargs)), json.loads(self.stdlib.dumps(value, **kwargs)))
+        self.assertEqual(self.fast.dumps({'b': 1, 'a': 2}), '{"a":2,"b":1}')
+
+    def test_falls_back_to_stdlib(self):
+        """Values orjson cannot encode go through the stdlib encoder"""
+        self.assertEqual(self.fast.dumps({'big': 2 ** 70}), self.stdlib.dumps({'big': 2 ** 70}))
+        with self.assertRaises(TypeError):
+            self.fast.dumps({'book': object()})
+
+class RowSerializationTestCase(unittest.TestCase):
+    def setUp(self):
+        """Set up test fixtures before each test method"""
+        self.app = app.test_client()
+
+        with app.app_context():
+            db.create_all()
+            db.session.add_all([
+                Book(title=f'Book {i}', author='Author', isbn=f'97800000000{i:02d}',
+                     publication_date=date(2020, 1, i + 1) if i % 2 else None)
+                for i in range(5)
+            ])
+            db.session.commit()
+
+    def tearDown(self):
+        """Clean up after each test method"""
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_rows_match_to_dict(self):
+        """Row-tuple dicts are identical to Book.to_dict()"""
+        with app.app_context():
+            columns = [getattr(Book, field) for field in BOOK_FIELDS]
+            rows = db.session.execute(db.select(*columns).order_by(Book.id)).all()
+            expected = [book.to_dict() for book in Book.query.order_by(Book.id)]
+            self.assertEqual(rows_to_dicts(rows, columns), expected)
+
+    def test_cursor_pages_without_id_field(self):
+        """Cursor pagination works when the requested fields leave out the id"""
+        response = self.app.get('/api/books?fields=title,publication_date&limit=2')
+
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data)
+        self.assertEqual(data['books'], [
+            {'title': 'Book 0', 'publication_date': None},
+            {'title': 'Book 1', 'publication_date': '2020-01-02'}
+        ])
+        self.assertEqual(data['next_cursor'], 2)
+
+    def test_ndjson_export_lines(self):
+        """The NDJSON export writes one transaction per line, fields in column order"""
+        with app.app_context():
+            member = Member(member_id='LIB001', first_name='Test', last_name='User', employee_code='EMP001')
+            db.session.add(member)
+            db.session.flush()
+            for book in Book.query.order_by(Book.id).limit(2):
+                db.session.add(Transaction(
+                    book_id=book.id, member_id=member.id, transaction_type='borrow',
+                    due_date=datetime(2024, 1, 15), status='active'
+                ))
+            db.session.commit()
+            expected = [trans.to_dict() for trans in Transaction.query.order_by(Transaction.id)]
+
+        response = self.app.get('/api/transactions/export')
+        self.assertEqual(response.status_code, 200)
+        lines = response.get_data(as_text=True).splitlines()
+        self.assertEqual([json.loads(line) for line in lines], expected)
+        self.assertEqual([list(json.loads(line)) for line in lines], [list(trans) for trans in expected])
+
+if __name__ == '__main__':
+    unittest.main()
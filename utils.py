@@ -1,9 +1,4 @@
-import qrcode
-import cv2
-import numpy as np
-from pyzbar import pyzbar
 from PIL import Image
-import io
 import base64
 import requests
 import isbnlib
@@ -13,97 +8,171 @@ import time
 import ssl
 import urllib3
 from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
 import unicodedata
 import re
+import threading
+import hashlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from qr_encoder import QREncoder
+from pyzbar.pyzbar import ZBarSymbol
+from scan_pipeline import decode_symbols
 
 class QRCodeManager:
     def __init__(self):
-        self.qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_L,
-            box_size=10,
-            border=4,
-        )
+        # Import config to get QR code settings
+        try:
+            from config import Config
+            self.box_size = Config.QR_CODE_SIZE
+            self.border = Config.QR_CODE_BORDER
+            self.cache_size = Config.QR_IMAGE_CACHE_SIZE
+            self.scan_max_dimension = Config.SCAN_MAX_DIMENSION
+        except ImportError:
+            # Fallback if config import fails
+            self.box_size = 10
+            self.border = 4
+            self.cache_size = 2048
+            self.scan_max_dimension = 1280
+        
+        # Stateless encoder, safe to share between request threads
+        self.encoder = QREncoder(box_size=self.box_size, border=self.border)
+        
+        # Rendered label images keyed by content hash, least recently used first
+        self.image_cache = OrderedDict()
+        self.cache_lock = threading.Lock()
     
-    def generate_qr_code(self, book_uuid, format='base64'):
-        """Generate QR code for a book using its UUID"""
-        self.qr.clear()
+    def build_payload(self, book_uuid, deterministic=False):
+        """Build the JSON text encoded in a book's QR code
         
+        Deterministic payloads leave out the generation timestamp, so the same
+        book always produces the same image and the image can be cached.
+        """
         # Create QR code data with book information
         qr_data = {
             'type': 'library_book',
-            'uuid': book_uuid,
-            'timestamp': str(int(time.time()))
+            'uuid': book_uuid
         }
+        if not deterministic:
+            qr_data['timestamp'] = str(int(time.time()))
         
-        self.qr.add_data(json.dumps(qr_data))
-        self.qr.make(fit=True)
+        return json.dumps(qr_data)
+    
+    def generate_qr_code(self, book_uuid, format='base64', deterministic=False):
+        """Generate QR code for a book using its UUID"""
+        if deterministic and format == 'base64':
+            image_bytes, _ = self.get_qr_image(book_uuid, 'png')
+            return f"data:image/png;base64,{base64.b64encode(image_bytes).decode()}"
         
-        # Create QR code image
-        img = self.qr.make_image(fill_color="black", back_color="white")
+        payload = self.build_payload(book_uuid, deterministic)
         
         if format == 'base64':
             # Convert to base64 for web display
-            buffered = io.BytesIO()
-            img.save(buffered, format="PNG")
-            img_str = base64.b64encode(buffered.getvalue()).decode()
+            img_str = base64.b64encode(self.encoder.render_png(payload)).decode()
             return f"data:image/png;base64,{img_str}"
-        elif format == 'pil':
-            return img
-        else:
-            return img
+        
+        # 1-bit PIL image for callers that compose their own output
+        width, height, bits = self.encoder.render_bits(payload)
+        return Image.frombytes('1', (width, height), bits)
+    
+    def render_qr_image(self, payload, image_format='png'):
+        """Render a payload to PNG or SVG bytes"""
+        if image_format == 'svg':
+            return self.encoder.render_svg(payload)
+        return self.encoder.render_png(payload)
+    
+    def get_qr_image(self, book_uuid, image_format='png'):
+        """Return (image bytes, content hash) for a book's deterministic QR code
+        
+        The hash covers the payload and every rendering setting, so it changes
+        exactly when the image would, and serves as the cache key and ETag.
+        """
+        payload = self.build_payload(book_uuid, deterministic=True)
+        key = hashlib.sha256(
+            f"{image_format}:{self.box_size}:{self.border}:{payload}".encode('utf-8')
+        ).hexdigest()
+        
+        with self.cache_lock:
+            image_bytes = self.image_cache.get(key)
+            if image_bytes is not None:
+                self.image_cache.move_to_end(key)
+                return image_bytes, key
+        
+        image_bytes = self.render_qr_image(payload, image_format)
+        
+        with self.cache_lock:
+            self.image_cache[key] = image_bytes
+            while len(self.image_cache) > self.cache_size:
+                self.image_cache.popitem(last=False)
+        
+        return image_bytes, key
     
     def scan_qr_code(self, image_data):
         """Scan QR code from image data"""
+        return self.scan_qr_code_with_report(image_data)[0]
+    
+    def scan_qr_code_with_report(self, image_data):
+        """Scan QR codes from image data, returning (results, scan report with stage timings)"""
         try:
-            # Convert base64 to PIL Image if needed
-            if isinstance(image_data, str) and image_data.startswith('data:image'):
-                header, data = image_data.split(',', 1)
-                image_data = base64.b64decode(data)
-                image = Image.open(io.BytesIO(image_data))
-            elif isinstance(image_data, bytes):
-                image = Image.open(io.BytesIO(image_data))
-            else:
-                image = image_data
-            
-            # Convert to numpy array for pyzbar
-            img_array = np.array(image)
-            
-            # Decode QR codes
-            decoded_objects = pyzbar.decode(img_array)
-            
-            results = []
-            for obj in decoded_objects:
-                try:
-                    data = json.loads(obj.data.decode('utf-8'))
-                    if data.get('type') == 'library_book':
-                        results.append({
-                            'uuid': data.get('uuid'),
-                            'timestamp': data.get('timestamp'),
-                            'rect': obj.rect
-                        })
-                    elif data.get('type') == 'library_member':
-                        results.append({
-                            'employee_code': data.get('employee_code'),
-                            'member_id': data.get('member_id'),
-                            'timestamp': data.get('timestamp'),
-                            'rect': obj.rect
-                        })
-                except json.JSONDecodeError:
-                    # Handle non-JSON QR codes (might be plain employee codes)
-                    qr_text = obj.data.decode('utf-8')
-                    results.append({
-                        'data': qr_text,
-                        'rect': obj.rect,
-                        # Try to identify if it might be an employee code or member ID
-                        'possible_employee_code': qr_text if len(qr_text) <= 20 else None
-                    })
-            
-            return results
+            decoded_objects, report = decode_symbols(image_data, max_dimension=self.scan_max_dimension)
+            results = [self.parse_qr_symbol(obj) for obj in decoded_objects]
+            return [result for result in results if result is not None], report
         except Exception as e:
             print(f"Error scanning QR code: {e}")
-            return []
+            return [], None
+    
+    def parse_qr_symbol(self, obj):
+        """Interpret a decoded QR code as a book, a member or plain text
+
+        Returns None for JSON payloads of other types.
+        """
+        try:
+            data = json.loads(obj.data.decode('utf-8'))
+            if data.get('type') == 'library_book':
+                return {
+                    'uuid': data.get('uuid'),
+                    'timestamp': data.get('timestamp'),
+                    'rect': obj.rect
+                }
+            elif data.get('type') == 'library_member':
+                return {
+                    'employee_code': data.get('employee_code'),
+                    'member_id': data.get('member_id'),
+                    'timestamp': data.get('timestamp'),
+                    'rect': obj.rect
+                }
+            else:
+                return None
+        except (json.JSONDecodeError, UnicodeDecodeError, AttributeError):
+            pass
+        
+        # Handle non-JSON QR codes (might be plain employee codes)
+        qr_text = obj.data.decode('utf-8', errors='replace')
+        return {
+            'data': qr_text,
+            'rect': obj.rect,
+            # Try to identify if it might be an employee code or member ID
+            'possible_employee_code': qr_text if len(qr_text) <= 20 else None
+        }
+
+class RateLimiter:
+    """Spaces out calls to a provider so they stay under a requests-per-second limit"""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate
+        self.lock = threading.Lock()
+        self.next_slot = 0.0
+
+    def reserve(self, not_after=None):
+        """Claim the next free request slot and return its time (``time.monotonic()``)
+
+        Returns None without claiming anything if that slot is later than ``not_after``.
+        """
+        with self.lock:
+            slot = max(time.monotonic(), self.next_slot)
+            if not_after is not None and slot > not_after:
+                return None
+            self.next_slot = slot + self.interval
+            return slot
 
 class ISBNScanner:
     def __init__(self):
@@ -111,9 +180,20 @@ class ISBNScanner:
         try:
             from config import Config
             self.services = Config.ISBN_SERVICES
+            self.lookup_deadline = Config.ISBN_LOOKUP_DEADLINE
+            self.scan_max_dimension = Config.SCAN_MAX_DIMENSION
+            lookup_workers = Config.ISBN_LOOKUP_WORKERS
+            rate_limits = Config.ISBN_PROVIDER_RATE_LIMITS
         except ImportError:
             # Fallback if config import fails
             self.services = ['goob', 'openl', 'worldcat']  # ISBN service providers
+            self.lookup_deadline = 8
+            self.scan_max_dimension = 1280
+            lookup_workers = 16
+            rate_limits = {}
+        
+        # Per-provider request rate limits, shared by every lookup in this process
+        self.rate_limiters = {provider: RateLimiter(rate) for provider, rate in rate_limits.items()}
         
         print(f"ISBN Scanner initialized with services: {self.services}")
         
@@ -124,40 +204,37 @@ class ISBNScanner:
         self.session.verify = False
         urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
         
-        # Set up retry strategy
-        retry_strategy = Retry(
-            total=3,
-            backoff_factor=1,
-            status_forcelist=[429, 500, 502, 503, 504],
-        )
-        adapter = HTTPAdapter(max_retries=retry_strategy)
+        # No retries: a lookup has one deadline, and a retried request with
+        # backoff would keep a pool thread busy long after it has passed
+        adapter = HTTPAdapter(max_retries=0, pool_maxsize=lookup_workers)
         self.session.mount("http://", adapter)
         self.session.mount("https://", adapter)
         
         # Set timeout
         self.timeout = 10
+        
+        # isbnlib requests take no timeout argument, so cap them all at the deadline
+        isbnlib.config.seturlopentimeout(min(self.timeout, self.lookup_deadline))
+        isbnlib.config.setthreadstimeout(min(self.timeout, self.lookup_deadline))
+        
+        # Thread pool shared by all lookups for querying providers concurrently
+        self.executor = ThreadPoolExecutor(max_workers=lookup_workers, thread_name_prefix='isbn-lookup')
     
     def scan_isbn_from_image(self, image_data):
         """Scan ISBN barcode from image"""
+        return self.scan_isbn_from_image_with_report(image_data)[0]
+    
+    def scan_isbn_from_image_with_report(self, image_data):
+        """Scan ISBN barcodes from an image, returning (isbns, scan report with stage timings)"""
         try:
-            # Convert image data to OpenCV format
-            if isinstance(image_data, str) and image_data.startswith('data:image'):
-                header, data = image_data.split(',', 1)
-                image_data = base64.b64decode(data)
-            
-            # Convert to numpy array
-            nparr = np.frombuffer(image_data, np.uint8)
-            img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-            
-            # Convert to grayscale for better barcode detection
-            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-            
-            # Decode barcodes
-            barcodes = pyzbar.decode(gray)
+            # Book barcodes are EAN-13; other codes on the cover are not decoded
+            barcodes, report = decode_symbols(
+                image_data, symbols=[ZBarSymbol.EAN13], max_dimension=self.scan_max_dimension
+            )
             
             isbns = []
             for barcode in barcodes:
-                barcode_data = barcode.data.decode('utf-8')
+                barcode_data = barcode.data.decode('utf-8', errors='replace')
                 
                 # Validate if it's an ISBN
                 if self.is_valid_isbn(barcode_data):
@@ -167,10 +244,10 @@ class ISBNScanner:
                         'rect': barcode.rect
                     })
             
-            return isbns
+            return isbns, report
         except Exception as e:
             print(f"Error scanning ISBN: {e}")
-            return []
+            return [], None
     
     def is_valid_isbn(self, isbn_string):
         """Validate ISBN format"""
@@ -181,62 +258,129 @@ class ISBNScanner:
         except:
             return False
     
-    def get_book_info_by_isbn(self, isbn):
-        """Get book information from ISBN with fallback through multiple services"""
+    def _reserve_slot(self, provider, deadline):
+        """Time at which ``provider`` may be called, or None if it has no slot before ``deadline``"""
+        limiter = self.rate_limiters.get(provider)
+        if limiter is None:
+            return time.monotonic()
+        return limiter.reserve(not_after=deadline)
+
+    def _call_provider(self, deadline, func, *args, **kwargs):
+        """Run a provider call in a pool thread, unless the lookup's deadline passed while it was queued"""
+        if time.monotonic() >= deadline:
+            return None
+        return func(*args, **kwargs)
+
+    def get_book_info_by_isbn(self, isbn, deadline=None):
+        """Get book information from ISBN by querying every provider concurrently
+
+        The isbnlib services, the cover API, Google Books and Open Library are
+        all queried at once. The first isbnlib service to answer supplies the
+        core metadata, and the other responses fill in description, pages,
+        categories and cover. The lookup returns with whatever has arrived by
+        ``ISBN_LOOKUP_DEADLINE`` (or ``deadline`` seconds), so one slow
+        provider cannot hold the worker.
+
+        Rate limit slots are reserved here, before anything is submitted:
+        each call goes to the pool at its slot time, and a provider with no
+        free slot before the deadline is skipped. Pool threads never sleep,
+        and HTTP requests are given only the time left before the deadline.
+        """
         try:
             # Clean the ISBN
             isbn_clean = isbnlib.clean(isbn)
             print(f"Looking up ISBN: {isbn_clean}")
-            
-            # Try each service in order until one succeeds
+
+            started = time.monotonic()
+            deadline = started + (deadline or self.lookup_deadline)
+
+            calls = [('meta', service, meta, (isbn_clean,), {'service': service}) for service in self.services + ['default']]
+            calls.append(('cover', 'cover', cover, (isbn_clean,), {}))
+            calls.append(('google_books', 'google_books', self._fetch_google_books_volume, (isbn_clean, deadline), {}))
+            calls.append(('open_library', 'open_library', self._fetch_open_library_record, (isbn_clean, deadline), {}))
+
+            scheduled = []
+            for kind, provider, func, args, kwargs in calls:
+                slot = self._reserve_slot(provider, deadline)
+                if slot is None:
+                    print(f"⏳ Skipping {provider}: rate limit leaves no slot before the deadline")
+                    continue
+                scheduled.append((slot, kind, provider, func, args, kwargs))
+            scheduled.sort(key=lambda call: call[0])
+
+            futures = {}
+            results = {}
             book_info = None
-            for service in self.services:
-                try:
-                    print(f"Trying ISBN service: {service}")
-                    book_info = meta(isbn_clean, service=service)
-                    if book_info:
-                        print(f"✅ Successfully found metadata using service: {service}")
-                        print(f"Book info: {book_info}")
-                        break
-                except Exception as e:
-                    print(f"❌ Service '{service}' failed: {e}")
+            pending = set()
+            while scheduled or pending:
+                now = time.monotonic()
+                while scheduled and scheduled[0][0] <= now:
+                    _, kind, provider, func, args, kwargs = scheduled.pop(0)
+                    future = self.executor.submit(self._call_provider, deadline, func, *args, **kwargs)
+                    futures[future] = (kind, provider if kind == 'meta' else None)
+                    pending.add(future)
+
+                remaining = deadline - now
+                if remaining <= 0:
+                    break
+
+                # Wake up for the next scheduled call as well as for results
+                timeout = min(remaining, scheduled[0][0] - now) if scheduled else remaining
+                if not pending:
+                    time.sleep(timeout)
                     continue
-            
-            # If no service worked, try with default service as final attempt
-            if not book_info:
-                try:
-                    print("Trying default service as final attempt...")
-                    book_info = meta(isbn_clean, service='default')
-                    if book_info:
-                        print(f"✅ Successfully found metadata using default service")
-                        print(f"Book info: {book_info}")
-                except Exception as e:
-                    print(f"❌ Default service also failed: {e}")
-            
+
+                done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    kind, service = futures[future]
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        print(f"❌ {service or kind} lookup failed: {e}")
+                        continue
+
+                    if kind == 'meta':
+                        if result and book_info is None:
+                            print(f"✅ Successfully found metadata using service: {service}")
+                            book_info = result
+                    else:
+                        results[kind] = result
+
+                # Stop early once the metadata and every enrichment provider are in;
+                # the remaining isbnlib services can only repeat what we have
+                if book_info and all(kind in results for kind in ('cover', 'google_books', 'open_library')):
+                    break
+
+            # Running calls end on their own within the deadline; queued ones are dropped
+            timed_out = bool(pending) or bool(scheduled)
+            for future in pending:
+                future.cancel()
+            print(f"ISBN lookup for {isbn_clean} took {time.monotonic() - started:.2f}s"
+                  + (f" ({len(pending) + len(scheduled)} providers unanswered at the deadline)" if timed_out else ""))
+
+            google_volume = results.get('google_books')
+            open_library_record = results.get('open_library')
+
             if book_info:
                 # Get cover image URL
                 cover_url = None
-                try:
-                    covers = cover(isbn_clean)
-                    if covers:
-                        cover_url = covers.get('thumbnail') or covers.get('smallThumbnail')
-                except Exception as e:
-                    print(f"Error fetching cover: {e}")
-                
-                # Try to get description, page count, and categories from Google Books API
-                google_data = self._get_description_from_google_books(isbn_clean)
+                covers = results.get('cover')
+                if covers:
+                    cover_url = covers.get('thumbnail') or covers.get('smallThumbnail')
+
+                # Description, page count and categories come from Google Books,
+                # with Open Library filling in whatever is missing
+                google_data = self._parse_google_books_volume(isbn_clean, google_volume) if google_volume else {}
+                open_library_data = self._parse_open_library_record(isbn_clean, open_library_record) if open_library_record else {}
+
                 description = None
-                page_count = None
-                categories = None
-                
-                if google_data:
-                    description = google_data.get('description')
-                    page_count = google_data.get('pageCount')
-                    categories = google_data.get('categories')
-                
-                # If no description from Google Books, try Open Library
-                if not description:
-                    description = self._get_description_from_open_library(isbn_clean)
+                if google_volume and google_volume.get('description'):
+                    description = google_data['description']
+                if not description and open_library_record:
+                    description = self._open_library_description(open_library_record)
+                page_count = google_data.get('pages') or open_library_data.get('pages')
+                categories = google_data.get('categories')
+                cover_url = cover_url or google_data.get('cover_url') or open_library_data.get('cover_url')
 
                 return {
                     'isbn': isbn_clean,
@@ -253,75 +397,38 @@ class ISBNScanner:
                     'categories': categories,  # Add categories field
                     'source': 'api_lookup'
                 }
-            else:
-                # If no metadata found from any isbnlib service, try Google Books directly
-                print(f"❌ No metadata found from any isbnlib service, trying Google Books API directly...")
-                try:
-                    url = f"https://www.googleapis.com/books/v1/volumes?q=isbn:{isbn_clean}"
-                    response = self.session.get(url, timeout=self.timeout)
-                    
-                    if response.status_code == 200:
-                        data = response.json()
-                        if data.get('totalItems', 0) > 0:
-                            volume_info = data['items'][0].get('volumeInfo', {})
-                            
-                            # Extract description and clean it
-                            description = volume_info.get('description', 'No description available')
-                            if description:
-                                import re
-                                description = re.sub(r'<[^>]+>', '', description)
-                                description = description.strip()
-                                if len(description) > 500:
-                                    description = description[:500] + "..."
-                            
-                            # Extract categories
-                            categories = volume_info.get('categories', [])
-                            
-                            print(f"✅ Successfully found book info via Google Books API")
-                            return {
-                                'isbn': isbn_clean,
-                                'title': volume_info.get('title', f'Book {isbn_clean}'),
-                                'authors': volume_info.get('authors', []),
-                                'author': ', '.join(volume_info.get('authors', ['Unknown Author'])),
-                                'publisher': volume_info.get('publisher', 'Unknown Publisher'),
-                                'publication_date': volume_info.get('publishedDate', ''),
-                                'language': volume_info.get('language', 'en'),
-                                'description': description,
-                                'cover_url': volume_info.get('imageLinks', {}).get('thumbnail'),
-                                'pages': volume_info.get('pageCount'),
-                                'categories': categories,  # Add categories field
-                                'source': 'google_books_fallback'
-                            }
-                except Exception as e:
-                    print(f"❌ Google Books API error: {e}")
-                
-                # Try Open Library as final fallback
-                print(f"Trying Open Library as final fallback...")
-                try:
-                    open_library_data = self._get_full_book_info_from_open_library(isbn_clean)
-                    if open_library_data:
-                        print(f"✅ Successfully found book info via Open Library")
-                        return open_library_data
-                except Exception as e:
-                    print(f"❌ Open Library error: {e}")
-                
-                # If all external lookups fail, return basic info
-                print(f"❌ All API lookups failed, returning basic info for ISBN: {isbn_clean}")
-                return {
-                    'isbn': isbn_clean,
-                    'title': f'Book {isbn_clean}',
-                    'authors': [],
-                    'author': 'Unknown Author',
-                    'publisher': 'Unknown Publisher',
-                    'publication_date': '',
-                    'language': 'English',
-                    'description': f'Book with ISBN {isbn_clean}. Please update information manually.',
-                    'cover_url': None,
-                    'pages': None,
-                    'categories': [],  # Add empty categories array
-                    'source': 'manual_entry'
-                }
-                
+
+            # If no isbnlib service found metadata, use Google Books directly
+            if google_volume:
+                print(f"✅ Successfully found book info via Google Books API")
+                book_data = self._parse_google_books_volume(isbn_clean, google_volume)
+                if open_library_record and not book_data['cover_url']:
+                    book_data['cover_url'] = self._parse_open_library_record(isbn_clean, open_library_record)['cover_url']
+                return book_data
+
+            # Try Open Library as final fallback
+            if open_library_record:
+                print(f"✅ Successfully found book info via Open Library")
+                return self._parse_open_library_record(isbn_clean, open_library_record)
+
+            # If all external lookups fail, return basic info. Providers that were
+            # still running may yet know the ISBN, so that case is not a "not found".
+            print(f"❌ All API lookups failed, returning basic info for ISBN: {isbn_clean}")
+            return {
+                'isbn': isbn_clean,
+                'title': f'Book {isbn_clean}',
+                'authors': [],
+                'author': 'Unknown Author',
+                'publisher': 'Unknown Publisher',
+                'publication_date': '',
+                'language': 'English',
+                'description': f'Book with ISBN {isbn_clean}. Please update information manually.',
+                'cover_url': None,
+                'pages': None,
+                'categories': [],  # Add empty categories array
+                'source': 'timeout_fallback' if timed_out else 'manual_entry'
+            }
+
         except Exception as e:
             print(f"Error getting book info for ISBN {isbn}: {e}")
             # Return basic fallback info
@@ -340,143 +447,133 @@ class ISBNScanner:
                 'source': 'error_fallback'
             }
 
-    def _get_description_from_google_books(self, isbn):
-        """Get book description, page count, and categories from Google Books API"""
+    def _fetch_google_books_volume(self, isbn, deadline=None):
+        """Get the volume info for an ISBN from Google Books API, giving up at ``deadline`` (``time.monotonic()``)"""
         try:
             url = f"https://www.googleapis.com/books/v1/volumes?q=isbn:{isbn}"
-            response = self.session.get(url, timeout=self.timeout)
-            
+            response = self.session.get(url, timeout=self._request_timeout(deadline))
+
             if response.status_code == 200:
                 data = response.json()
                 if data.get('totalItems', 0) > 0:
-                    volume_info = data['items'][0].get('volumeInfo', {})
-                    description = volume_info.get('description', '')
-                    page_count = volume_info.get('pageCount')
-                    categories = volume_info.get('categories', [])
-                    
-                    # Clean up HTML tags if present in description
-                    if description:
-                        import re
-                        description = re.sub(r'<[^>]+>', '', description)
-                        description = description.strip()
-                        # Limit description length
-                        if len(description) > 500:
-                            description = description[:500] + "..."
-                    
-                    return {
-                        'description': description,
-                        'pageCount': page_count,
-                        'categories': categories
-                    }
+                    return data['items'][0].get('volumeInfo', {})
             return None
         except Exception as e:
-            print(f"Error fetching description from Google Books for ISBN {isbn}: {e}")
+            print(f"❌ Google Books API error for ISBN {isbn}: {e}")
             return None
 
-    def _get_description_from_open_library(self, isbn):
-        """Get book description from Open Library API"""
-        try:
-            url = f"https://openlibrary.org/api/books?bibkeys=ISBN:{isbn}&format=json&jscmd=data"
-            response = self.session.get(url, timeout=self.timeout)
-            
-            if response.status_code == 200:
-                data = response.json()
-                book_key = f"ISBN:{isbn}"
-                
-                if book_key in data:
-                    book_data = data[book_key]
-                    # Try different description fields
-                    description = (
-                        book_data.get('description', {}).get('value') if isinstance(book_data.get('description'), dict) else
-                        book_data.get('description') if isinstance(book_data.get('description'), str) else
-                        book_data.get('excerpts', [{}])[0].get('text', '') if book_data.get('excerpts') else ''
-                    )
-                    
-                    if description and isinstance(description, str):
-                        description = description.strip()
-                        # Limit description length
-                        if len(description) > 500:
-                            description = description[:500] + "..."
-                        return description
-            return None
-        except Exception as e:
-            print(f"Error fetching description from Open Library for ISBN {isbn}: {e}")
-            return None
+    def _request_timeout(self, deadline):
+        """Per-request timeout: the usual one, cut down to the time left before ``deadline``"""
+        if deadline is None:
+            return self.timeout
+        return max(0.1, min(self.timeout, deadline - time.monotonic()))
+
+    def _parse_google_books_volume(self, isbn, volume_info):
+        """Build book information from a Google Books volume"""
+        # Extract description and clean up HTML tags if present
+        description = volume_info.get('description', '')
+        if description:
+            description = re.sub(r'<[^>]+>', '', description)
+            description = description.strip()
+            # Limit description length
+            if len(description) > 500:
+                description = description[:500] + "..."
+
+        return {
+            'isbn': isbn,
+            'title': volume_info.get('title', f'Book {isbn}'),
+            'authors': volume_info.get('authors', []),
+            'author': ', '.join(volume_info.get('authors', ['Unknown Author'])),
+            'publisher': volume_info.get('publisher', 'Unknown Publisher'),
+            'publication_date': volume_info.get('publishedDate', ''),
+            'language': volume_info.get('language', 'en'),
+            'description': description or 'No description available',
+            'cover_url': volume_info.get('imageLinks', {}).get('thumbnail'),
+            'pages': volume_info.get('pageCount'),
+            'categories': volume_info.get('categories', []),  # Add categories field
+            'source': 'google_books_fallback'
+        }
 
-    def _get_full_book_info_from_open_library(self, isbn):
-        """Get complete book information from Open Library API as fallback"""
+    def _fetch_open_library_record(self, isbn, deadline=None):
+        """Get the book record for an ISBN from Open Library API, giving up at ``deadline`` (``time.monotonic()``)"""
         try:
             url = f"https://openlibrary.org/api/books?bibkeys=ISBN:{isbn}&format=json&jscmd=data"
-            response = self.session.get(url, timeout=self.timeout)
-            
+            response = self.session.get(url, timeout=self._request_timeout(deadline))
+
             if response.status_code == 200:
                 data = response.json()
-                book_key = f"ISBN:{isbn}"
-                
-                if book_key in data:
-                    book_data = data[book_key]
-                    
-                    # Extract title
-                    title = book_data.get('title', f'Book {isbn}')
-                    
-                    # Extract authors
-                    authors = []
-                    if 'authors' in book_data:
-                        for author in book_data['authors']:
-                            if isinstance(author, dict) and 'name' in author:
-                                authors.append(author['name'])
-                            elif isinstance(author, str):
-                                authors.append(author)
-                    
-                    # Extract publisher
-                    publisher = 'Unknown Publisher'
-                    if 'publishers' in book_data and book_data['publishers']:
-                        publisher = book_data['publishers'][0].get('name', 'Unknown Publisher')
-                    
-                    # Extract publication date
-                    pub_date = book_data.get('publish_date', '')
-                    
-                    # Extract description
-                    description = (
-                        book_data.get('description', {}).get('value') if isinstance(book_data.get('description'), dict) else
-                        book_data.get('description') if isinstance(book_data.get('description'), str) else
-                        book_data.get('excerpts', [{}])[0].get('text', '') if book_data.get('excerpts') else
-                        f'Book with ISBN {isbn} from Open Library'
-                    )
-                    
-                    if description and isinstance(description, str):
-                        description = description.strip()
-                        if len(description) > 500:
-                            description = description[:500] + "..."
-                    
-                    # Extract cover image
-                    cover_url = None
-                    if 'cover' in book_data:
-                        cover_url = book_data['cover'].get('medium') or book_data['cover'].get('small')
-                    
-                    # Extract page count
-                    pages = book_data.get('number_of_pages')
-                    
-                    return {
-                        'isbn': isbn,
-                        'title': title,
-                        'authors': authors,
-                        'author': ', '.join(authors) if authors else 'Unknown Author',
-                        'publisher': publisher,
-                        'publication_date': pub_date,
-                        'language': book_data.get('languages', [{}])[0].get('key', 'en').replace('/languages/', ''),
-                        'description': description,
-                        'cover_url': cover_url,
-                        'pages': pages,
-                        'pageCount': pages,
-                        'categories': [],  # Open Library doesn't typically have categories, so empty array
-                        'source': 'open_library_fallback'
-                    }
+                return data.get(f"ISBN:{isbn}")
             return None
         except Exception as e:
-            print(f"Error fetching full book info from Open Library for ISBN {isbn}: {e}")
+            print(f"❌ Open Library error for ISBN {isbn}: {e}")
             return None
 
+    def _open_library_description(self, book_data):
+        """Get the description from an Open Library record"""
+        # Try different description fields
+        description = (
+            book_data.get('description', {}).get('value') if isinstance(book_data.get('description'), dict) else
+            book_data.get('description') if isinstance(book_data.get('description'), str) else
+            book_data.get('excerpts', [{}])[0].get('text', '') if book_data.get('excerpts') else ''
+        )
+
+        if description and isinstance(description, str):
+            description = description.strip()
+            # Limit description length
+            if len(description) > 500:
+                description = description[:500] + "..."
+            return description
+        return None
+
+    def _parse_open_library_record(self, isbn, book_data):
+        """Build book information from an Open Library record"""
+        # Extract title
+        title = book_data.get('title', f'Book {isbn}')
+
+        # Extract authors
+        authors = []
+        if 'authors' in book_data:
+            for author in book_data['authors']:
+                if isinstance(author, dict) and 'name' in author:
+                    authors.append(author['name'])
+                elif isinstance(author, str):
+                    authors.append(author)
+
+        # Extract publisher
+        publisher = 'Unknown Publisher'
+        if 'publishers' in book_data and book_data['publishers']:
+            publisher = book_data['publishers'][0].get('name', 'Unknown Publisher')
+
+        # Extract publication date
+        pub_date = book_data.get('publish_date', '')
+
+        # Extract description
+        description = self._open_library_description(book_data)
+
+        # Extract cover image
+        cover_url = None
+        if 'cover' in book_data:
+            cover_url = book_data['cover'].get('medium') or book_data['cover'].get('small')
+
+        # Extract page count
+        pages = book_data.get('number_of_pages')
+
+        return {
+            'isbn': isbn,
+            'title': title,
+            'authors': authors,
+            'author': ', '.join(authors) if authors else 'Unknown Author',
+            'publisher': publisher,
+            'publication_date': pub_date,
+            'language': book_data.get('languages', [{}])[0].get('key', 'en').replace('/languages/', ''),
+            'description': description or f'Book with ISBN {isbn} from Open Library',
+            'cover_url': cover_url,
+            'pages': pages,
+            'pageCount': pages,
+            'categories': [],  # Open Library doesn't typically have categories, so empty array
+            'source': 'open_library_fallback'
+        }
+
     def search_books_by_isbn(self, isbn_list):
         """Search for multiple books by ISBN"""
         results = []
@@ -577,3 +674,24 @@ def create_search_variants(search_term):
         variants.append(normalized)
     
     return list(set(variants))  # Remove duplicates
+
+def canonical_isbn(value):
+    """The form ISBNs are stored and matched in: digits (and a final X) only
+
+    Anything that is not a valid ISBN is returned trimmed but otherwise as
+    given, and a blank value as None.
+    """
+    value = str(value or '').strip()
+    isbn = isbnlib.canonical(isbnlib.clean(value))
+    if isbnlib.is_isbn10(isbn) or isbnlib.is_isbn13(isbn):
+        return isbn
+    return value or None
+
+def isbn_variants(value):
+    """ISBN-13 and ISBN-10 forms (digits only) of a valid ISBN, or [] if it is not one"""
+    isbn = isbnlib.canonical(isbnlib.clean(value or ''))
+    if isbnlib.is_isbn13(isbn):
+        return [isbn] + [form for form in [isbnlib.to_isbn10(isbn)] if form]
+    if isbnlib.is_isbn10(isbn):
+        return [isbnlib.to_isbn13(isbn), isbn]
+    return []